@@ -2,8 +2,11 @@ import analogio
 import board
 import digitalio
 import os
+import time
 import adafruit_prompt_toolkit as prompt_toolkit
 
+from adafruit_circuitpyrate import instrumentation
+
 
 # __version__ = "0.0.0+auto.0"
 __version__ = "10.0.0"
@@ -19,6 +22,8 @@ MENUS
 i    \tVersion & status info
 a/A/@\tAUXPIN (low/HIGH/READ)
 d/D  \tMeasure ADC (once/CONT.)
+V X  \tMonitor supplies, X V glitches
+T+ X \tRun X on AUX rise (T- fall, T++ repeat)
 g    \tFreq Generator/PWM on AUX
 S    \tServo control on AUX
 
@@ -29,8 +34,8 @@ modes = (
     ("UART", "uart"),
     ("I2C", "i2c"),
     ("SPI", "spi"),
-    # ("2WIRE", "mode_2wire"),
-    # ("3WIRE", "mode_3wire"),
+    ("2WIRE", "mode_2wire"),
+    ("3WIRE", "mode_3wire"),
     # ("KEYB", "keyb"),
     # ("LCD", "lcd"),
     # ("PIC", "pic"),
@@ -41,6 +46,9 @@ modes = (
 class EnterBinaryMode(Exception):
     pass
 
+class EnterLogicAnalyzer(Exception):
+    pass
+
 class BinarySwitcher:
     def __init__(self, serial):
         self.serial = serial
@@ -60,6 +68,9 @@ class BinarySwitcher:
                 if null_count >= 20:
                     raise EnterBinaryMode()
                 continue
+            # SUMP clients reset with five nulls and then ask for the ID.
+            if read[0] == 0x02 and null_count >= 5:
+                raise EnterLogicAnalyzer()
             buf[read_count] = read[0]
             read_count += 1
         return buf
@@ -100,6 +111,8 @@ class Mode:
         self.macros = {}
 
         self.pull_ok = False
+        # Bit order from the l/L commands, for modes that can honor it.
+        self.lsb = False
 
     def _print(self, *pos, end="\r\n"):
         pos = list(pos)
@@ -129,6 +142,10 @@ class Mode:
                 return selection
             print("Invalid choice, try again")
 
+    def print_status(self):
+        # Modes with their own counters print them for the i command.
+        pass
+
     def run_macro(self, number):
         if number == 0:
             self._print("0. Macro menu")
@@ -239,7 +256,7 @@ def parse_bus_actions(commands):
     numeric_ok = True
     for c in commands:
         numeric = c in "0123456789xabcdefABCDEF"
-        if unparsed and (c in " ," or c in bus_sequence_chars or numeric != numeric_ok):
+        if unparsed and (c in " ," or c in bus_sequence_chars or (numeric != numeric_ok and c not in ":;")):
             action = _parse_action(unparsed)
             if action is None:
                 return []
@@ -304,6 +321,8 @@ class Pyrate:
         self.pins["clock"] = clock_pin
         self.pins["miso"] = miso_pin
         self.pins["cs"] = cs_pin
+        self.pins["aux"] = aux_pin
+        self.pins["adc"] = adc_pin
 
         if scl_pin:
             self.pins["scl"] = scl_pin
@@ -330,6 +349,8 @@ class Pyrate:
             "@": self.read_pin,
             "d": self.read_one_voltage,
             "D": self.run_voltmeter,
+            "V": self.run_power_monitor,
+            "T": self.run_triggered,
             "g": self.frequency_generator,
             "S": self.servo_position,
             "m": self.change_mode,
@@ -341,8 +362,13 @@ class Pyrate:
         }
 
         self.history = []
+        # Runs from the last T command, kept for T on its own.
+        self.trigger_results = []
+
+        self.stats = instrumentation.Stats()
 
         self.mode = None
+        self.lsb = False
         self.change_mode("1")
 
     def _print(self, *pos, end="\r\n"):
@@ -363,6 +389,9 @@ class Pyrate:
         self._print(f"Bus Pirate on {board.board_id}")
         self._print(f"Firmware v{__version__} on CircuitPython {os.uname().version}")
         self._print("https://adafruit.com")
+        for line in self.stats.format():
+            self._print(line)
+        self.mode.print_status()
 
     def change_baudrate(self, args):
         self._print("No baud rate change required for USB!")
@@ -410,9 +439,13 @@ class Pyrate:
 
     def set_msb(self, args):
         self.lsb = False
+        self.mode.lsb = False
+        self._print("MSB set: MOST sig bit first")
 
     def set_lsb(self, args):
         self.lsb = True
+        self.mode.lsb = True
+        self._print("LSB set: LEAST sig bit first")
 
     def set_pin_low(self, args):
         self.user_pin.switch_to_output(value=False)
@@ -435,11 +468,106 @@ class Pyrate:
 
     def run_voltmeter(self, args):
         self._print("VOLTMETER MODE\nAny key to exit")
-        while self.serial.in_waiting == 0:
+        while self._input.in_waiting == 0:
             self.read_one_voltage(None)
             time.sleep(0.1)
         # throw away the character
-        self.serial.read(1)
+        self._input.read(1)
+        self._print("DONE")
+
+    def run_power_monitor(self, args):
+        from . import power_monitor
+
+        tolerance = 0.25
+        args = args.strip()
+        if args:
+            try:
+                tolerance = float(args)
+            except ValueError:
+                self._print("Invalid input! " + args)
+                return
+        rails = (("3.3V", self.measure_3v), ("5.0V", self.measure_5v), ("VPU", self.vextern), ("ADC", self.adc))
+        monitor = power_monitor.PowerMonitor(rails, tolerance)
+        self._print(f"POWER MONITOR, glitches beyond {tolerance}V\nAny key to exit")
+        next_summary = time.monotonic_ns() + power_monitor.SUMMARY_NS
+        while self._input.in_waiting == 0:
+            monitor.sample()
+            if time.monotonic_ns() >= next_summary:
+                for line in monitor.summary():
+                    self._print(line)
+                next_summary += power_monitor.SUMMARY_NS
+        self._input.read(1)
+        for line in monitor.summary():
+            self._print(line)
+        self._print("DONE")
+
+    def _print_trigger_results(self):
+        if not self.trigger_results:
+            self._print("No triggered runs")
+            return
+        first = self.trigger_results[0][0]
+        for timestamp, edges, text in self.trigger_results:
+            missed = f", {edges - 1} edges missed" if edges > 1 else ""
+            self._print(f"TRIGGER +{(timestamp - first) / 1e6:.3f}ms{missed}")
+            self._print(text, end="")
+
+    def run_triggered(self, args):
+        from . import trigger
+
+        args = args.strip()
+        if not args:
+            self._print_trigger_results()
+            return
+        edge = args[0]
+        if edge not in "+-":
+            self._print("Use T+ or T- and a bus sequence")
+            return
+        repeat = args[1:2] == edge
+        # Compiled once so an edge only pays for the bus.
+        sequence = parse_bus_actions(args[2 if repeat else 1:])
+        if not sequence:
+            self._print("Use T+ or T- and a bus sequence")
+            return
+
+        recorder = trigger.Recorder()
+        mode_output = self.mode._output
+        results = []
+        dropped = 0
+        name = "rising" if edge == "+" else "falling"
+        watcher = None
+        try:
+            self.aux.deinit()
+            watcher = trigger.EdgeWatcher(self.pins["aux"], edge == "+")
+            self._print(f"ARMED on {name} AUX, {'every edge' if repeat else 'once'}\nAny key to exit")
+            self.mode._output = recorder
+            while self._input.in_waiting == 0:
+                edges = watcher.poll()
+                if not edges:
+                    continue
+                timestamp = time.monotonic_ns()
+                self.mode.run_sequence(sequence)
+                if len(results) < trigger.MAX_RESULTS:
+                    results.append((timestamp, edges, recorder.take()))
+                else:
+                    recorder.take()
+                    dropped += 1
+                if not repeat:
+                    break
+        finally:
+            self.mode._output = mode_output
+            if watcher is not None:
+                watcher.deinit()
+            user_pin_is_aux = self.user_pin is self.aux
+            self.aux = digitalio.DigitalInOut(self.pins["aux"])
+            if user_pin_is_aux:
+                self.user_pin = self.aux
+        if self._input.in_waiting:
+            # throw away the character
+            self._input.read(1)
+        self.trigger_results = results
+        self._print_trigger_results()
+        if dropped:
+            self._print(f"{dropped} more runs not kept")
         self._print("DONE")
 
     def power_on(self, args):
@@ -588,7 +716,7 @@ class Pyrate:
                 # Find the subclass of Mode
                 for attr in dir(mode_module):
                     entry = getattr(mode_module, attr)
-                    if isinstance(entry, type) and issubclass(entry, Mode):
+                    if isinstance(entry, type) and issubclass(entry, Mode) and entry is not Mode:
                         mode_class = entry
                         break
             if mode_class is None:
@@ -597,6 +725,7 @@ class Pyrate:
             else:
                 try:
                     self.mode = mode_class(self.pins, self._input, self.output)
+                    self.mode.lsb = self.lsb
                     self._print("Mode selected")
                 except BaseException as e:
                     if isinstance(e, ReloadException):
@@ -640,9 +769,13 @@ class Pyrate:
             self.mode.run_macro(m)
         else:
             # Assume bus sequence.
+            start = self.stats.begin()
             bus_sequence = parse_bus_actions(commands)
+            self.stats.end("decode", start, len(commands))
             if bus_sequence:
+                start = self.stats.begin()
                 self.mode.run_sequence(bus_sequence)
+                self.stats.end("bus", start)
 
     def soft_reset(self):
         if self.mode:
@@ -675,3 +808,21 @@ class Pyrate:
         self.cs.deinit()
         self.cs = None
         self.soft_reset()
+
+    def run_logic_analyzer(self):
+        from . import sump
+
+        # The capture reads every bus pin, so let go of them all.
+        if self.mode:
+            self.mode.deinit()
+            self.mode = None
+        if self.cs:
+            self.cs.deinit()
+            self.cs = None
+        self.aux.deinit()
+        try:
+            sump.run(self._input.serial, self.output, self)
+        finally:
+            self.aux = digitalio.DigitalInOut(self.pins["aux"])
+            self.user_pin = self.aux
+            self.soft_reset()
@@ -0,0 +1,36 @@
+import busio
+import microcontroller
+
+# Anything slower than this is almost certainly a typo.
+MIN_BAUDRATE = 110
+# Further from the request than this and the far end won't decode us.
+MAX_ERROR = 0.03
+
+
+def achievable(impl, baudrate):
+    """The rate the RP2040 will actually run at when ``baudrate`` is requested."""
+    clock = microcontroller.cpu.frequency
+    if impl is busio.UART:
+        # PL011 fractional divider, as computed by the pico-sdk uart_set_baudrate().
+        divider = (8 * clock // baudrate) + 1
+        integer = divider >> 7
+        if integer == 0:
+            integer, fraction = 1, 0
+        elif integer >= 65535:
+            integer, fraction = 65535, 0
+        else:
+            fraction = (divider & 0x7F) >> 1
+        return (4 * clock) // (64 * integer + fraction)
+    # PIO UARTs run their state machine at 8x the baudrate with a 16.8 divider.
+    divider = max(clock * 256 // (8 * baudrate), 256)
+    return clock * 256 // divider // 8
+
+
+def check(impl, baudrate):
+    """Returns the achievable rate for ``baudrate`` or None when it is unusable."""
+    if baudrate < MIN_BAUDRATE:
+        return None
+    actual = achievable(impl, baudrate)
+    if abs(actual - baudrate) > baudrate * MAX_ERROR:
+        return None
+    return actual
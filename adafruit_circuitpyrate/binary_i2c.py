@@ -1,15 +1,38 @@
 import struct
-import busio
-import bitbangio
 
-def run(serial_input, serial_output, pins):
-    serial_output.write(b"I2C1")
+from adafruit_circuitpyrate import engines, sniffer
+
+def _sniff(serial_input, serial_output, pins):
+    # Replies 0x01, sends Bus Pirate sniffer events in batches until the host
+    # sends a byte and then replies 0x01 again.
     try:
-        i2c = busio.I2C(scl=pins["scl"], sda=pins["sda"])
-    except ValueError:
-        i2c = bitbangio.I2C(scl=pins["scl"], sda=pins["sda"])
+        from adafruit_circuitpyrate import pio_i2c_sniffer
+    except ImportError:
+        serial_output.write(b"\x00")
+        return
+    spy = pio_i2c_sniffer.I2CSniffer(pins["scl"], pins["sda"])
+    frames = sniffer.FrameBuffer(sniffer.BUFFER_SIZE)
+    frame = bytearray(sniffer.BUFFER_SIZE)
+    serial_output.write(b"\x01")
+    while True:
+        spy.poll(frames)
+        while len(frames):
+            _, length = frames.pop(frame)
+            serial_output.write(memoryview(frame)[:length])
+        if serial_input.in_waiting:
+            break
+    serial_input.read(1)
+    spy.deinit()
+    serial_output.write(b"\x01")
+
+def run(serial_input, serial_output, pyrate):
+    serial_output.write(b"I2C1")
+    pins = pyrate.pins
+    i2c, _ = engines.i2c(pins["scl"], pins["sda"])
+    stats = pyrate.stats
     while True:
         command = serial_input.read(1)[0]
+        stats.command()
         if command == 0b00000000:
             i2c.deinit()
             return
@@ -18,6 +41,10 @@ def run(serial_input, serial_output, pins):
         elif command <= 0b00000111:
             # Skip the manual bit stuff
             pass
+        elif command == 0x0F:
+            i2c.deinit()
+            _sniff(serial_input, serial_output, pins)
+            i2c, _ = engines.i2c(pins["scl"], pins["sda"])
         elif command == 0x08:
             # Write then readinto.
             counts = serial_input.read(4)
@@ -28,11 +55,13 @@ def run(serial_input, serial_output, pins):
 
             if not i2c.try_lock():
                 continue
+            start = stats.begin()
             if write_count > 1 and read_buffer:
                 i2c.writeto_then_readfrom(i2c_address, write_buffer, read_buffer, out_start=1)
             elif write_count > 1:
                 i2c.writeto(i2c_address, write_buffer, start=1)
             else:
                 i2c.readfrom_into(i2c_address, read_buffer)
+            stats.end("bus", start, write_count - 1 + read_count)
             serial_output.write(read_buffer)
             i2c.unlock()
@@ -0,0 +1,104 @@
+# Documented here: http://dangerousprototypes.com/docs/1-Wire_(binary)
+import struct
+
+from adafruit_circuitpyrate import onewire_bus
+
+BULK_ACKS = memoryview(b"\x01" * 16)
+SEARCH_END = b"\xff" * 8
+
+def _read_exactly(serial, buffer):
+    received = 0
+    while received < len(buffer):
+        received += serial.readinto(buffer[received:]) or 0
+
+def run(serial_input, serial_output, pyrate):
+    serial_output.write(b"1W01")
+    bus = onewire_bus.open_bus(pyrate.pins["mosi"])
+    bulk_view = memoryview(bytearray(16))
+    scratchpad = bytearray(onewire_bus.SCRATCHPAD_SIZE)
+    # ROMs from the last ROM search, used by the convert command. Start with the
+    # devices the interactive mode saved.
+    table = onewire_bus.DeviceTable()
+    table.load()
+    roms = table.roms
+    counters = onewire_bus.Counters()
+    stats = pyrate.stats
+    while True:
+        command = serial_input.read(1)[0]
+        stats.command()
+        if command == 0b00000000:
+            bus.deinit()
+            return
+        elif command == 0b00000001:
+            serial_output.write(b"1W01")
+        elif command == 0x02:
+            # Bus reset
+            start = stats.begin()
+            bus.reset()
+            stats.end("bus", start)
+            serial_output.write(b"\x01")
+        elif command == 0x04:
+            # Read a byte
+            start = stats.begin()
+            bus.readinto(bulk_view, end=1)
+            stats.end("bus", start, 1)
+            serial_output.write(bulk_view[:1])
+        elif command == 0x08 or command == 0x09:
+            # ROM or alarm search. Every address follows the 0x01 and eight 0xff end the list.
+            search_command = onewire_bus.SEARCH_ROM if command == 0x08 else onewire_bus.ALARM_SEARCH
+            start = stats.begin()
+            found = list(onewire_bus.search(bus, search_command))
+            stats.end("bus", start, len(found) * 8)
+            serial_output.write(b"\x01")
+            for rom in found:
+                serial_output.write(rom)
+            serial_output.write(SEARCH_END)
+            if command == 0x08:
+                roms = found
+        elif command == 0x0A:
+            # Convert every thermometer at once then read each one found by the last
+            # ROM search. Our extension. Replies 0x01 then per device the ROM, the
+            # scratchpad and 0x01 for a good CRC or 0x00, ending with eight 0xff.
+            if not roms:
+                roms = list(onewire_bus.search(bus))
+            serial_output.write(b"\x01")
+            start = stats.begin()
+            onewire_bus.convert_all(bus)
+            stats.end("bus", start)
+            for rom in roms:
+                if rom[0] not in onewire_bus.THERMOMETERS:
+                    continue
+                start = stats.begin()
+                ok = onewire_bus.read_scratchpad(bus, rom, scratchpad, counters)
+                stats.end("bus", start, len(scratchpad))
+                serial_output.write(rom)
+                serial_output.write(scratchpad)
+                serial_output.write(b"\x01" if ok else b"\x00")
+            serial_output.write(SEARCH_END)
+        elif command == 0x0B:
+            # CRC counters from 0x0A reads. Our extension. Replies 0x01 then reads,
+            # CRC errors, reads recovered by a retry and reads that failed, each
+            # a big endian uint32.
+            serial_output.write(b"\x01")
+            serial_output.write(struct.pack(">IIII", counters.reads, counters.crc_errors, counters.recovered, counters.failed))
+        elif (command & 0xf0) == 0x10:
+            # Bulk write, one 0x01 per byte.
+            length = (command & 0xf) + 1
+            payload = bulk_view[:length]
+            _read_exactly(serial_input, payload)
+            start = stats.begin()
+            bus.write(payload)
+            stats.end("bus", start, length)
+            serial_output.write(BULK_ACKS[:length])
+        elif (command & 0xf0) == 0x20:
+            # Bulk read. Not in the Bus Pirate protocol, it only reads a byte at a time.
+            length = (command & 0xf) + 1
+            payload = bulk_view[:length]
+            start = stats.begin()
+            bus.readinto(payload)
+            stats.end("bus", start, length)
+            serial_output.write(payload)
+        elif pyrate.run_binary_command(command):
+            serial_output.write(b"\x01")
+        else:
+            print("unhandled 1-Wire command", hex(command))
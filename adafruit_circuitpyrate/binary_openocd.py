@@ -0,0 +1,127 @@
+# Bus Pirate OpenOCD protocol, as spoken by OpenOCD's buspirate interface driver.
+# TCK is CLK, TDI is MOSI, TDO is MISO, TMS is CS and SRST is AUX.
+import digitalio
+
+from adafruit_circuitpyrate import engines
+
+CMD_UNKNOWN = 0x00
+CMD_PORT_MODE = 0x01
+CMD_FEATURE = 0x02
+CMD_READ_ADCS = 0x03
+# 0x04 was the old TAP shift, OpenOCD no longer sends it.
+CMD_TAP_SHIFT = 0x05
+CMD_ENTER_OOCD = 0x06
+CMD_UART_SPEED = 0x07
+CMD_JTAG_SPEED = 0x08
+
+MODE_HIZ = 0
+MODE_JTAG = 1
+MODE_JTAG_OD = 2
+
+FEATURE_LED = 0x01
+FEATURE_VREG = 0x02
+FEATURE_TRST = 0x04
+FEATURE_SRST = 0x08
+FEATURE_PULLUP = 0x10
+
+# Most bits in one TAP shift.
+MAX_BITS = 0x2000
+
+def _read_exactly(serial, buffer):
+    received = 0
+    while received < len(buffer):
+        received += serial.readinto(buffer[received:]) or 0
+
+def run(serial_input, serial_output, pyrate):
+    serial_output.write(b"OCD1")
+    pins = pyrate.pins
+    # TMS is on CS so take it back from the bitbang mode while we're here.
+    pyrate.cs.deinit()
+    frequency = 1000000
+    tap, _ = engines.jtag(pins["clock"], pins["mosi"], pins["miso"], pins["cs"], frequency=frequency)
+    open_drain = False
+    # A TDI byte and a TMS byte for every 8 bits, the most the protocol allows.
+    pairs = bytearray(MAX_BITS // 4)
+    tdo = bytearray(MAX_BITS // 8)
+    header = bytearray(3)
+    header[0] = CMD_TAP_SHIFT
+    argument = bytearray(3)
+    stats = pyrate.stats
+    while True:
+        command = serial_input.read(1)[0]
+        stats.command()
+        if command == CMD_UNKNOWN:
+            if tap:
+                tap.deinit()
+            pyrate.cs = digitalio.DigitalInOut(pins["cs"])
+            return
+        elif command == CMD_ENTER_OOCD:
+            serial_output.write(b"OCD1")
+        elif command == CMD_PORT_MODE:
+            mode = serial_input.read(1)[0]
+            # The shifter always drives its pins so open drain only changes SRST.
+            open_drain = mode == MODE_JTAG_OD
+            if mode == MODE_HIZ and tap:
+                tap.deinit()
+                tap = None
+            elif mode != MODE_HIZ and not tap:
+                tap, _ = engines.jtag(pins["clock"], pins["mosi"], pins["miso"], pins["cs"], frequency=frequency)
+        elif command == CMD_FEATURE:
+            _read_exactly(serial_input, memoryview(argument)[:2])
+            feature = argument[0]
+            action = argument[1] != 0
+            if feature == FEATURE_LED:
+                pyrate.mode_led.value = action
+            elif feature == FEATURE_VREG:
+                pyrate.power_3v.value = action
+                pyrate.power_5v.value = action
+            elif feature == FEATURE_PULLUP:
+                pyrate.enable_pullups.value = action
+            elif feature == FEATURE_SRST:
+                # OpenOCD disables the feature to assert reset so action is the line level.
+                if action and open_drain:
+                    pyrate.aux.switch_to_input()
+                else:
+                    pyrate.aux.switch_to_output(value=action)
+            # There's no pin left for TRST.
+        elif command == CMD_READ_ADCS:
+            reply = bytearray(10)
+            reply[0] = CMD_READ_ADCS
+            reply[1] = 8
+            adcs = (pyrate.adc, pyrate.vextern, pyrate.measure_3v, pyrate.measure_5v)
+            for i, adc in enumerate(adcs):
+                # 10 bits like the Bus Pirate's ADC.
+                value = adc.value >> 6
+                reply[2 + 2 * i] = value >> 8
+                reply[3 + 2 * i] = value & 0xFF
+            serial_output.write(reply)
+        elif command == CMD_TAP_SHIFT:
+            _read_exactly(serial_input, memoryview(header)[1:])
+            bits = min((header[1] << 8) | header[2], MAX_BITS)
+            count = (bits + 7) // 8
+            # Take the whole vector before clocking anything so the TAP runs
+            # without waiting on USB.
+            _read_exactly(serial_input, memoryview(pairs)[:2 * count])
+            if not tap:
+                tap, _ = engines.jtag(pins["clock"], pins["mosi"], pins["miso"], pins["cs"], frequency=frequency)
+            start = stats.begin()
+            tap.shift(pairs, tdo, bits)
+            stats.end("bus", start, count)
+            header[1] = bits >> 8
+            header[2] = bits & 0xFF
+            serial_output.write(header)
+            serial_output.write(memoryview(tdo)[:count])
+        elif command == CMD_UART_SPEED:
+            # USB serial runs at whatever speed the host likes. Check bytes are ignored.
+            _read_exactly(serial_input, memoryview(argument))
+            serial_output.write(bytes((CMD_UART_SPEED, argument[0])))
+        elif command == CMD_JTAG_SPEED:
+            # Our extension, TCK in kHz big endian.
+            _read_exactly(serial_input, memoryview(argument)[:2])
+            khz = (argument[0] << 8) | argument[1]
+            if khz:
+                frequency = khz * 1000
+                if tap:
+                    tap.frequency = frequency
+        else:
+            print("unhandled OpenOCD command", hex(command))
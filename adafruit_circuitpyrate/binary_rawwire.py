@@ -0,0 +1,124 @@
+# Documented here: http://dangerousprototypes.com/docs/Raw-wire_(binary)
+import struct
+
+from adafruit_circuitpyrate import rawwire
+
+# Bit counts for the 0x0F bulk bit read, a byte of replies per 8 bits.
+BULK_CHUNK = 64
+
+def _read_exactly(serial, buffer):
+    received = 0
+    while received < len(buffer):
+        received += serial.readinto(buffer[received:]) or 0
+
+def run(serial_input, serial_output, pyrate):
+    serial_output.write(b"RAW1")
+    pins = pyrate.pins
+    # Bus Pirate defaults: open drain, 2-wire, MSB first, ~5KHz.
+    config = {"open_drain": True, "lsb": False, "speed": 0}
+    three_wire = False
+    bus = rawwire.RawWireBus(pins["clock"], pins["mosi"], **config)
+    bulk_out = bytearray(16)
+    bulk_in = bytearray(16)
+    bulk_view = memoryview(bulk_out)
+    bits_buffer = bytearray(BULK_CHUNK)
+    count_bytes = bytearray(2)
+    stats = pyrate.stats
+    while True:
+        command = serial_input.read(1)[0]
+        stats.command()
+        if command == 0b00000000:
+            bus.deinit()
+            return
+        elif command == 0b00000001:
+            serial_output.write(b"RAW1")
+        elif command == 0x02:
+            bus.start()
+            serial_output.write(b"\x01")
+        elif command == 0x03:
+            bus.stop()
+            serial_output.write(b"\x01")
+        elif command == 0x04 or command == 0x05:
+            pyrate.cs.switch_to_output(command == 0x05)
+            serial_output.write(b"\x01")
+        elif command == 0x06:
+            start = stats.begin()
+            value = bus.read_bits()
+            stats.end("bus", start, 1)
+            serial_output.write(bytes((value,)))
+        elif command == 0x07:
+            serial_output.write(bytes((bus.read_bit(),)))
+        elif command == 0x08:
+            serial_output.write(bytes((bus.read_pin(),)))
+        elif command == 0x09:
+            bus.clock_tick()
+            serial_output.write(b"\x01")
+        elif 0x0A <= command <= 0x0D:
+            if command < 0x0C:
+                bus.clock(command == 0x0B)
+            else:
+                bus.data(command == 0x0D)
+            serial_output.write(b"\x01")
+        elif command == 0x0E:
+            # Our extension: a 16 bit big endian count of clock ticks.
+            _read_exactly(serial_input, memoryview(count_bytes))
+            count = struct.unpack(">H", count_bytes)[0]
+            start = stats.begin()
+            bus.clock_tick(count)
+            stats.end("bus", start)
+            serial_output.write(b"\x01")
+        elif command == 0x0F:
+            # Our extension: read a 16 bit big endian count of bits with a clock
+            # tick each, replied packed into bytes in the bus bit order.
+            _read_exactly(serial_input, memoryview(count_bytes))
+            remaining = struct.unpack(">H", count_bytes)[0]
+            while remaining:
+                bits = min(remaining, 8 * BULK_CHUNK)
+                count = (bits + 7) // 8
+                start = stats.begin()
+                for i in range(count):
+                    bits_buffer[i] = bus.read_bits(min(8, bits - 8 * i))
+                stats.end("bus", start, count)
+                serial_output.write(memoryview(bits_buffer)[:count])
+                remaining -= bits
+        elif (command & 0xf0) == 0x10:
+            # Bulk write, replies 0x01 then what was read back for each byte.
+            length = (command & 0xf) + 1
+            _read_exactly(serial_input, bulk_view[:length])
+            start = stats.begin()
+            bus.write_readinto(bulk_out, bulk_in, length)
+            stats.end("bus", start, length)
+            serial_output.write(b"\x01")
+            serial_output.write(memoryview(bulk_in)[:length])
+        elif (command & 0xf0) == 0x20:
+            bus.clock_tick((command & 0xf) + 1)
+            serial_output.write(b"\x01")
+        elif (command & 0xf8) == 0x30:
+            # Bulk bits, the top or bottom 1-8 bits of the next byte.
+            bits = (command & 0x7) + 1
+            value = serial_input.read(1)[0]
+            if not bus.lsb:
+                value >>= 8 - bits
+            bus.write_bits(value, bits)
+            serial_output.write(b"\x01")
+        elif (command & 0xfc) == 0x60:
+            bus.speed = command & 0x3
+            serial_output.write(b"\x01")
+        elif (command & 0xf0) == 0x80:
+            open_drain = (command & 0x8) == 0
+            wants_three_wire = (command & 0x4) != 0
+            config["lsb"] = (command & 0x2) != 0
+            config["speed"] = bus.speed
+            if open_drain != config["open_drain"] or wants_three_wire != three_wire:
+                config["open_drain"] = open_drain
+                three_wire = wants_three_wire
+                bus.deinit()
+                miso = pins["miso"] if three_wire else None
+                bus = rawwire.RawWireBus(pins["clock"], pins["mosi"], miso, **config)
+            else:
+                bus.lsb = config["lsb"]
+            serial_output.write(b"\x01")
+        elif pyrate.run_binary_command(command):
+            serial_output.write(b"\x01")
+        else:
+            print("unhandled raw-wire command", hex(command))
@@ -1,17 +1,48 @@
 import struct
-import busio
-import bitbangio
 import digitalio
 
+from adafruit_circuitpyrate import engines, sniffer
+
 SPEEDS_KHZ = [30, 125, 250, 1000, 2600, 4000, 8000]
 
+def _sniff(serial_input, serial_output, pyrate, config, cs_active, counts):
+    # 0x0D-0x0F: reply 0x01 then send sniffer frames until the host sends a
+    # byte, then END. Frames are MOSI bytes followed by the MISO bytes.
+    try:
+        from adafruit_circuitpyrate import pio_spi_sniffer
+    except ImportError:
+        serial_output.write(b"\x00")
+        return
+    pins = pyrate.pins
+    pyrate.cs.deinit()
+    spy = pio_spi_sniffer.SPISniffer(
+        pins["clock"],
+        pins["mosi"],
+        pins["miso"],
+        None if cs_active is None else pins["cs"],
+        polarity=config["polarity"],
+        phase=config["phase"],
+        cs_active=cs_active or 0,
+    )
+    frames = sniffer.FrameBuffer(sniffer.BUFFER_SIZE)
+    serial_output.write(b"\x01")
+    while not serial_input.in_waiting:
+        spy.poll(frames)
+        if len(frames):
+            frames.writeto(serial_output)
+    serial_input.read(1)
+    spy.poll(frames)
+    frames.writeto(serial_output)
+    serial_output.write(sniffer.END)
+    spy.deinit()
+    pyrate.cs = digitalio.DigitalInOut(pins["cs"])
+    counts[0] = frames.frames
+    counts[1] = frames.dropped
+
 def run(serial_input, serial_output, pyrate):
     serial_output.write(b"SPI1")
     pins = pyrate.pins
-    try:
-        spi = busio.SPI(pins["clock"], pins["mosi"], pins["miso"])
-    except ValueError:
-        spi = bitbangio.SPI(pins["clock"], pins["mosi"], pins["miso"])
+    spi, _ = engines.spi(pins["clock"], pins["mosi"], pins["miso"])
 
     if not spi.try_lock():
         spi.deinit()
@@ -24,8 +55,12 @@ def run(serial_input, serial_output, pyrate):
     }
 
     spi.configure(**current_config)
+    # Frames and drops from the last sniff.
+    sniff_counts = [0, 0]
+    stats = pyrate.stats
     while True:
         command = serial_input.read(1)[0]
+        stats.command()
         if command == 0b00000000:
             spi.deinit()
             return
@@ -35,9 +70,19 @@ def run(serial_input, serial_output, pyrate):
             # Manual chip select
             pyrate.cs.switch_to_output((command & 0x1) == 0x1)
             serial_output.write(b"\x01")
-        elif (command & 0b11111100) == 0x0c:
-            # Skip the bus sniffing stuff
-            pass
+        elif 0x0D <= command <= 0x0F:
+            # Sniff all traffic, while CS is low or while CS is high. 000011XX
+            # like the Bus Pirate.
+            cs_active = (None, 0, 1)[command - 0x0D]
+            spi.deinit()
+            _sniff(serial_input, serial_output, pyrate, current_config, cs_active, sniff_counts)
+            spi, _ = engines.spi(pins["clock"], pins["mosi"], pins["miso"])
+            spi.try_lock()
+            spi.configure(**current_config)
+        elif command == 0x06:
+            # Our extension: frames captured and dropped by the last sniff.
+            serial_output.write(b"\x01")
+            serial_output.write(struct.pack(">II", *sniff_counts))
         elif (command & 0xf8) == 0x60:
             # Set speed
             i = command & 0x7
@@ -57,7 +102,9 @@ def run(serial_input, serial_output, pyrate):
             length = (command & 0xf) + 1
             out_data = serial_input.read(length)
             in_data = bytearray(length)
+            start = stats.begin()
             spi.write_readinto(out_data, in_data)
+            stats.end("bus", start, length)
             serial_output.write(in_data)
         elif command == 0x04 or command == 0x05:
             # Write then readinto.
@@ -72,12 +119,14 @@ def run(serial_input, serial_output, pyrate):
             except MemoryError:
                 serial_output.write(b"\x00")
                 continue
+            start = stats.begin()
             if command == 0x04:
                 pyrate.cs.switch_to_output(False)
             spi.write(write_buffer)
             spi.readinto(read_buffer)
             if command == 0x04:
                 pyrate.cs.switch_to_output(True)
+            stats.end("bus", start, write_count + read_count)
             serial_output.write(b"\x01")
             serial_output.write(read_buffer)
         elif pyrate.run_binary_command(command):
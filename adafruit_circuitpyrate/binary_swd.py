@@ -0,0 +1,119 @@
+# ARM Serial Wire Debug, our own binary mode. SWCLK is CLK, SWDIO is MOSI and
+# AUX can drive nRESET through the peripheral command.
+#
+# Numbers are big endian like the other binary modes, memory is the target's
+# own little endian bytes. Commands that talk to the target reply with a status
+# byte first: 1 OK, 2 WAIT, 4 FAULT, 7 no response, 8 parity error, 0x10 more
+# than MAX_WORDS words asked for.
+#
+#   0x02                              connect, replies status + DPIDR
+#   0x03 reg                          read register, replies status + value
+#   0x04 reg value                    write register, replies status
+#   0x05 count (reg value)*count      write registers, replies status + count done
+#   0x06 address words                read memory, replies status + the words
+#   0x07 address words data           write memory, replies status
+#   0x08 kHz                          SWCLK frequency, replies 0x01
+#
+# reg is APnDP in bit 0 and A[3:2] in bits 3:2.
+import struct
+
+from adafruit_circuitpyrate import engines
+from adafruit_circuitpyrate import swd
+
+# Most words in one memory command.
+MAX_WORDS = 256
+
+def _read_exactly(serial, buffer):
+    received = 0
+    while received < len(buffer):
+        received += serial.readinto(buffer[received:]) or 0
+
+def run(serial_input, serial_output, pyrate):
+    serial_output.write(b"SWD1")
+    pins = pyrate.pins
+    wire, _ = engines.swd(pins["clock"], pins["mosi"])
+    port = swd.DebugPort(wire)
+    memory = bytearray(4 * MAX_WORDS)
+    memory_view = memoryview(memory)
+    argument = bytearray(6)
+    argument_view = memoryview(argument)
+    stats = pyrate.stats
+    while True:
+        command = serial_input.read(1)[0]
+        stats.command()
+        if command == 0b00000000:
+            wire.deinit()
+            return
+        elif command == 0b00000001:
+            serial_output.write(b"SWD1")
+        elif command == 0x02:
+            start = stats.begin()
+            status, idcode = port.connect()
+            stats.end("bus", start)
+            serial_output.write(struct.pack(">BI", status, idcode))
+        elif command == 0x03:
+            reg = serial_input.read(1)[0]
+            start = stats.begin()
+            status, value = port.read(reg & 1, reg & 0xC)
+            stats.end("bus", start, 4)
+            serial_output.write(struct.pack(">BI", status, value))
+        elif command == 0x04:
+            _read_exactly(serial_input, argument_view[:5])
+            start = stats.begin()
+            status = port.write(argument[0] & 1, argument[0] & 0xC, struct.unpack_from(">I", argument, 1)[0])
+            stats.end("bus", start, 4)
+            serial_output.write(bytes((status,)))
+        elif command == 0x05:
+            # Batched register writes, queued on the wire a buffer at a time so
+            # nothing waits on USB or an ACK. Stops at the first one that fails.
+            _read_exactly(serial_input, argument_view[:2])
+            remaining = struct.unpack_from(">H", argument)[0]
+            status = swd.OK
+            done = 0
+            while remaining:
+                count = min(remaining, len(memory) // 5)
+                _read_exactly(serial_input, memory_view[:5 * count])
+                if status == swd.OK:
+                    start = stats.begin()
+                    status, written = port.write_batch(memory, count)
+                    stats.end("bus", start, 4 * written)
+                    done += written
+                remaining -= count
+            serial_output.write(struct.pack(">BH", status, done))
+        elif command == 0x06 or command == 0x07:
+            _read_exactly(serial_input, argument_view)
+            address, words = struct.unpack(">IH", argument)
+            if words > MAX_WORDS:
+                if command == 0x07:
+                    # Throw the data away so it isn't taken for commands.
+                    remaining = 4 * words
+                    while remaining:
+                        count = min(remaining, len(memory))
+                        _read_exactly(serial_input, memory_view[:count])
+                        remaining -= count
+                serial_output.write(bytes((swd.TOO_LONG,)))
+                continue
+            data = memory_view[:4 * words]
+            if command == 0x06:
+                start = stats.begin()
+                status = port.read_memory(address, memory, words)
+                stats.end("bus", start, 4 * words)
+                serial_output.write(bytes((status,)))
+                serial_output.write(data)
+            else:
+                _read_exactly(serial_input, data)
+                start = stats.begin()
+                status = port.write_memory(address, memory, words)
+                stats.end("bus", start, 4 * words)
+                serial_output.write(bytes((status,)))
+        elif command == 0x08:
+            _read_exactly(serial_input, argument_view[:2])
+            khz = struct.unpack_from(">H", argument)[0]
+            if khz:
+                wire.frequency = khz * 1000
+            serial_output.write(b"\x01")
+        elif pyrate.run_binary_command(command):
+            # Power and nRESET on AUX.
+            serial_output.write(b"\x01")
+        else:
+            print("unhandled SWD command", hex(command))
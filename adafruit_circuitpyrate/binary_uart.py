@@ -1,8 +1,36 @@
 import struct
+import time
 import busio
 import digitalio
 
-SPEEDS = (300, 1200, 2400, 4800, 9600, 19200, 31250, 38400, 57600, 115200)
+from adafruit_circuitpyrate import baudrate
+from adafruit_circuitpyrate.bridge import Bridge, IDLE_POLLS, IDLE_SLEEP
+from adafruit_circuitpyrate.ringbuffer import RingBuffer
+
+# 0x60-0x69 match the Bus Pirate. 0x6A-0x6F are our own high speed additions.
+SPEEDS = (300, 1200, 2400, 4800, 9600, 19200, 31250, 38400, 57600, 115200,
+          230400, 460800, 921600, 1000000, 2000000, 3000000)
+RECEIVER_BUFFER = 4096
+# Holds echoed RX while a command is in progress so it isn't dropped or
+# interleaved with the command's reply.
+ECHO_BUFFER = 4096
+BULK_ACKS = memoryview(b"\x01" * 16)
+
+def _read_exactly(serial, buffer, waiting=None):
+    received = 0
+    while received < len(buffer):
+        if waiting:
+            # With no timeout readinto blocks until the buffer is full, so only
+            # ask for what has arrived and keep calling waiting() until then.
+            available = serial.in_waiting
+            if not available:
+                waiting()
+                continue
+            n = serial.readinto(buffer[received:received + available])
+        else:
+            n = serial.readinto(buffer[received:])
+        if n:
+            received += n
 
 def run(serial_input, serial_output, pyrate):
     serial_output.write(b"ART1")
@@ -23,17 +51,38 @@ def run(serial_input, serial_output, pyrate):
         "baudrate": 300,
         "timeout": 0
     }
+    if impl is busio.UART:
+        kwargs["receiver_buffer_size"] = RECEIVER_BUFFER
 
     uart = impl(**kwargs)
     echo_rx = False
+    echo = RingBuffer(ECHO_BUFFER)
+    bulk_view = memoryview(bytearray(16))
+    baud_buffer = bytearray(4)
+    stats = pyrate.stats
+
+    def receive_echo():
+        if echo_rx and uart.in_waiting:
+            start = stats.begin()
+            n = echo.readfrom(uart)
+            stats.end("bus", start, n)
+
+    idle = 0
     while True:
-        if echo_rx and uart.in_waiting > 0:
-            buf = uart.read(uart.in_waiting)
-            serial_output.write(buf)
+        receive_echo()
+        if echo:
+            echo.writeto(serial_output)
+            idle = 0
 
         if serial_input.in_waiting == 0:
+            # Spin briefly so back to back commands stay fast, then sleep to let the CPU idle.
+            idle += 1
+            if idle > IDLE_POLLS:
+                time.sleep(IDLE_SLEEP)
             continue
+        idle = 0
         command = serial_input.read(1)[0]
+        stats.command()
         if command == 0b00000000:
             uart.deinit()
             return
@@ -46,25 +95,36 @@ def run(serial_input, serial_output, pyrate):
             else:
                 echo_rx = True
                 uart.reset_input_buffer()
+                echo.consume(len(echo))
+                echo.overflowed = False
             serial_output.write(b"\x01")
         elif command == 0x07:
-            # Skip the manual baudrate setting
-            serial_output.write(b"\x00")
+            # Manual baudrate. The Bus Pirate takes a PIC BRG value here, which means
+            # nothing on our clock, so take the rate itself as a big endian uint32 and
+            # reply with the rate we actually achieved.
+            _read_exactly(serial_input, memoryview(baud_buffer))
+            requested = struct.unpack(">I", baud_buffer)[0]
+            actual = baudrate.check(impl, requested)
+            if actual is None:
+                serial_output.write(b"\x00")
+                continue
+            kwargs["baudrate"] = requested
+            uart.deinit()
+            uart = impl(**kwargs)
+            serial_output.write(b"\x01" + struct.pack(">I", actual))
         elif command == 0x0f:
-            # Bridge mode
-            while True:
-                if serial_input.in_waiting:
-                    uart.write(serial_input.read(serial_input.in_waiting))
-                if uart.in_waiting:
-                    serial_output.write(uart.read(uart.in_waiting))
+            # Bridge mode. Ctrl-] three times on its own returns to UART mode.
+            Bridge(serial_input, serial_output, uart).run()
 
         elif (command & 0xf0) == 0x10:
-            # Bulk write
+            # Bulk write. The host still gets one 0x01 per byte, just in one write.
             length = (command & 0xf) + 1
-            for _ in range(length):
-                out_data = serial_input.read(1)
-                uart.write(out_data)
-                serial_output.write(b"\x01")
+            payload = bulk_view[:length]
+            _read_exactly(serial_input, payload, receive_echo)
+            start = stats.begin()
+            uart.write(payload)
+            stats.end("bus", start, length)
+            serial_output.write(BULK_ACKS[:length])
         elif (command & 0xf0) == 0x60:
             # Set UART speed
             index = (command & 0xf)
@@ -1,15 +1,177 @@
 # Documented here: http://dangerousprototypes.com/docs/Bitbang
+import analogio
+import array
+import digitalio
 import microcontroller
 
-BINARY_MODES = ["spi", "i2c", "uart", "onewire", "rawwire", "openocd"]
+from adafruit_circuitpyrate.instrumentation import InstrumentedSerial
+
+BINARY_MODES = ["spi", "i2c", "uart", "onewire", "rawwire", "openocd", "swd"]
+
+# Pin bits shared by the direction and value commands, AUX is bit 4 down to CS at bit 0.
+PIN_NAMES = ("cs", "miso", "clock", "mosi", "aux")
+POWER = 0x40
+PULLUPS = 0x20
+PIN_MASK = 0x1F
+BULK_CHUNK = 256
+# Continuous probe readings per second and per write.
+ADC_RATE = 10000
+ADC_BLOCK = 512
+
+
+class BitbangPins:
+    """The header pins as DigitalInOuts, kept for the whole bitbang session.
+
+    AUX and CS belong to the Pyrate. The bus pins are claimed on first use and
+    released before switching into another binary mode, which needs them.
+    """
+
+    def __init__(self, pyrate):
+        self._pyrate = pyrate
+        self._pins = None
+        # Everything starts as an input. 1 is input like the protocol.
+        self.directions = PIN_MASK
+        self.values = 0
+        self.power = False
+        self.pullups = False
+
+    def _claim(self):
+        if self._pins is not None:
+            return self._pins
+        pyrate = self._pyrate
+        pins = []
+        for name in PIN_NAMES:
+            if name == "cs":
+                pins.append(pyrate.cs)
+            elif name == "aux":
+                pins.append(pyrate.aux)
+            else:
+                pins.append(digitalio.DigitalInOut(pyrate.pins[name]))
+        self._pins = pins
+        self._apply_directions(PIN_MASK)
+        return pins
+
+    def release(self):
+        if self._pins is None:
+            return
+        for i, pin in enumerate(self._pins):
+            if PIN_NAMES[i] not in ("cs", "aux"):
+                pin.deinit()
+        self._pins = None
+
+    def _apply_directions(self, changed):
+        for i, pin in enumerate(self._pins):
+            bit = 1 << i
+            if not changed & bit:
+                continue
+            if self.directions & bit:
+                pin.switch_to_input()
+            else:
+                pin.switch_to_output(value=bool(self.values & bit))
+
+    def set_directions(self, directions):
+        self._claim()
+        changed = (directions ^ self.directions) & PIN_MASK
+        self.directions = directions & PIN_MASK
+        self._apply_directions(changed)
+        # Like the Bus Pirate, reply with what the pins read, not the directions.
+        return 0x40 | self.levels()
+
+    def set_values(self, values):
+        pins = self._claim()
+        power = bool(values & POWER)
+        if power != self.power:
+            self._pyrate.power_3v.value = power
+            self._pyrate.power_5v.value = power
+            self.power = power
+        pullups = bool(values & PULLUPS)
+        if pullups != self.pullups:
+            self._pyrate.enable_pullups.value = pullups
+            self.pullups = pullups
+        # Only touch outputs that changed, inputs just remember the value.
+        changed = (values ^ self.values) & PIN_MASK & ~self.directions
+        self.values = values & PIN_MASK
+        if changed:
+            for i in range(len(pins)):
+                bit = 1 << i
+                if changed & bit:
+                    pins[i].value = bool(values & bit)
+
+    def levels(self):
+        pins = self._claim()
+        state = 0
+        for i in range(len(pins)):
+            if pins[i].value:
+                state |= 1 << i
+        return state
+
+    def read(self):
+        state = 0x80 | self.levels()
+        if self.power:
+            state |= POWER
+        if self.pullups:
+            state |= PULLUPS
+        return state
+
+
+def _adc_value(adc):
+    # 10 bits like the Bus Pirate's ADC.
+    return adc.value >> 6
+
+
+def _stream_adc(serial_input, serial_output, pyrate):
+    # Big endian readings until the host sends a byte. analogbufio samples a
+    # whole block at ADC_RATE with DMA, without it we read as fast as we can.
+    try:
+        import analogbufio
+    except ImportError:
+        analogbufio = None
+    out = bytearray(2 * ADC_BLOCK)
+    if analogbufio is None:
+        adc = pyrate.adc
+        while not serial_input.in_waiting:
+            for i in range(ADC_BLOCK):
+                value = _adc_value(adc)
+                out[2 * i] = value >> 8
+                out[2 * i + 1] = value & 0xFF
+            serial_output.write(out)
+    else:
+        pin = pyrate.pins["adc"]
+        samples = array.array("H", [0] * ADC_BLOCK)
+        adc = None
+        try:
+            pyrate.adc.deinit()
+            adc = analogbufio.BufferedIn(pin, sample_rate=ADC_RATE)
+            while not serial_input.in_waiting:
+                adc.readinto(samples)
+                for i in range(ADC_BLOCK):
+                    # Raw 12 bit conversions.
+                    value = samples[i] >> 2
+                    out[2 * i] = value >> 8
+                    out[2 * i + 1] = value & 0xFF
+                serial_output.write(out)
+        finally:
+            if adc is not None:
+                adc.deinit()
+            pyrate.adc = analogio.AnalogIn(pin)
+    serial_input.read(1)
+
 
 def run(serial_input, serial_output, pyrate):
+    stats = pyrate.stats
+    serial_input = InstrumentedSerial(serial_input, stats)
+    serial_output = InstrumentedSerial(serial_output, stats)
+    pins = BitbangPins(pyrate)
+    bulk_buffer = bytearray(BULK_CHUNK)
+    bulk_view = memoryview(bulk_buffer)
     serial_output.write(b"BBIO1")
     while True:
         command = serial_input.read(1)[0]
+        stats.command()
         if command == 0b00000000:
             serial_output.write(b"BBIO1")
         elif command == 0b00001111:
+            pins.release()
             serial_output.write(b"\x01")
             return True
         elif (command & 0xf0) == 0:
@@ -27,15 +189,55 @@ def run(serial_input, serial_output, pyrate):
             except ImportError:
                 print("Failed to import", full_import_name)
                 continue
+            pins.release()
             mode_module.run(serial_input, serial_output, pyrate)
             # Back in bitbang mode so let the other side know.
             serial_output.write(b"BBIO1")
+        elif command == 0x20:
+            # Read the instrumentation counters
+            serial_output.write(stats.pack())
+        elif command == 0x21:
+            # Reset the instrumentation counters
+            stats.reset()
+            serial_output.write(b"\x01")
+        elif command == 0x14:
+            # One probe reading
+            value = _adc_value(pyrate.adc)
+            serial_output.write(bytes((value >> 8, value & 0xFF)))
+        elif command == 0x15:
+            start = stats.begin()
+            _stream_adc(serial_input, serial_output, pyrate)
+            stats.end("bus", start)
+        elif command == 0x18 or command == 0x19:
+            # Bulk pin values, our extension: a 16 bit big endian count then that many
+            # value bytes in the 1xxxxxxx format. 0x18 replies once with the final
+            # state, 0x19 replies with the state after every step.
+            count_bytes = serial_input.read(2)
+            remaining = (count_bytes[0] << 8) | count_bytes[1]
+            sample = command == 0x19
+            while remaining:
+                chunk = bulk_view[:min(remaining, BULK_CHUNK)]
+                n = serial_input.readinto(chunk)
+                if not n:
+                    continue
+                start = stats.begin()
+                for i in range(n):
+                    pins.set_values(chunk[i])
+                    if sample:
+                        chunk[i] = pins.read()
+                stats.end("bus", start, n)
+                if sample:
+                    serial_output.write(chunk[:n])
+                remaining -= n
+            if not sample:
+                serial_output.write(bytes((pins.read(),)))
         elif (command & 0xe0) == 0b01000000:
-            # Set pin direction
-            pass
+            # Set pin direction, 1 is input
+            serial_output.write(bytes((pins.set_directions(command),)))
         elif (command & 0x80) != 0:
-            # Set pin value
-            pass
+            # Set pin value and reply with what the pins read back
+            pins.set_values(command)
+            serial_output.write(bytes((pins.read(),)))
         else:
             print("unhandled binary command:", hex(command))
         serial_output.flush()
@@ -0,0 +1,106 @@
+import time
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+BRIDGE_BUFFER = 512
+# Ctrl-] three times, starting after a second of quiet, leaves the bridge. The
+# presses can arrive together or one at a time. The guard time keeps binary
+# traffic from tripping it.
+ESCAPE = b"\x1d\x1d\x1d"
+ESCAPE_GUARD_NS = 1_000_000_000
+# Yield between polls while busy, sleep once a direction has been idle a while.
+IDLE_POLLS = 16
+IDLE_SLEEP = 0.001
+
+
+class Pump:
+    """Moves whatever a stream has waiting to another stream through one preallocated buffer."""
+
+    def __init__(self, source, destination, intercept=None, size=BRIDGE_BUFFER):
+        self.source = source
+        self.destination = destination
+        self.intercept = intercept
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+    def poll(self):
+        waiting = self.source.in_waiting
+        if not waiting:
+            return 0
+        chunk = self._view[: min(waiting, len(self._view))]
+        n = self.source.readinto(chunk)
+        if not n:
+            return 0
+        chunk = chunk[:n]
+        if self.intercept and self.intercept(chunk):
+            return n
+        self.destination.write(chunk)
+        return n
+
+
+class Bridge:
+    """Transparent bridge between the host serial port and a UART.
+
+    Each direction is its own asyncio task when asyncio is available and a
+    round robin poll otherwise.
+    """
+
+    def __init__(self, host_input, host_output, uart):
+        self.to_uart = Pump(host_input, uart, intercept=self._check_escape)
+        self.to_host = Pump(uart, host_output)
+        self.done = False
+        self._last_host_ns = time.monotonic_ns()
+        # Escape bytes held back so far, they're passed on if anything else follows.
+        self._escape = 0
+
+    def _check_escape(self, chunk):
+        now = time.monotonic_ns()
+        quiet = now - self._last_host_ns >= ESCAPE_GUARD_NS
+        self._last_host_ns = now
+        if not self._escape and not quiet:
+            return False
+        length = len(chunk)
+        if self._escape + length <= len(ESCAPE) and bytes(chunk) == ESCAPE[:length]:
+            self._escape += length
+            if self._escape == len(ESCAPE):
+                self.done = True
+            return True
+        if self._escape:
+            self.to_uart.destination.write(ESCAPE[:self._escape])
+            self._escape = 0
+        return False
+
+    def run(self):
+        if asyncio is None:
+            self._run_polling()
+        else:
+            asyncio.run(self._run_tasks())
+
+    def _run_polling(self):
+        idle = 0
+        while not self.done:
+            if self.to_uart.poll() + self.to_host.poll():
+                idle = 0
+            else:
+                idle += 1
+                if idle > IDLE_POLLS:
+                    time.sleep(IDLE_SLEEP)
+
+    async def _pump_task(self, pump):
+        idle = 0
+        while not self.done:
+            if pump.poll():
+                idle = 0
+                await asyncio.sleep(0)
+            else:
+                idle += 1
+                await asyncio.sleep(IDLE_SLEEP if idle > IDLE_POLLS else 0)
+
+    async def _run_tasks(self):
+        await asyncio.gather(
+            asyncio.create_task(self._pump_task(self.to_uart)),
+            asyncio.create_task(self._pump_task(self.to_host)),
+        )
@@ -0,0 +1,74 @@
+import bitbangio
+import busio
+
+# PIO engines only exist on the RP2040.
+try:
+    from adafruit_circuitpyrate import pio_spi
+except ImportError:
+    pio_spi = None
+try:
+    from adafruit_circuitpyrate import pio_i2c
+except ImportError:
+    pio_i2c = None
+
+BUSIO = "busio"
+PIO = "PIO"
+BITBANG = "bitbangio"
+DIGITALIO = "digitalio"
+
+
+def spi(clock, mosi, miso):
+    """The fastest SPI that works on these pins and the name of its engine."""
+    try:
+        return busio.SPI(clock, mosi, miso), BUSIO
+    except ValueError:
+        pass
+    if pio_spi is not None:
+        try:
+            return pio_spi.SPI(clock, mosi, miso), PIO
+        except (ValueError, RuntimeError):
+            # Out of state machines or instruction memory.
+            pass
+    return bitbangio.SPI(clock, mosi, miso), BITBANG
+
+
+def i2c(scl, sda, frequency=100000):
+    """The fastest I2C that works on these pins and the name of its engine."""
+    try:
+        return busio.I2C(scl=scl, sda=sda, frequency=frequency), BUSIO
+    except ValueError:
+        pass
+    if pio_i2c is not None:
+        try:
+            return pio_i2c.I2C(scl=scl, sda=sda, frequency=frequency), PIO
+        except (ValueError, RuntimeError):
+            pass
+    return bitbangio.I2C(scl=scl, sda=sda, frequency=frequency), BITBANG
+
+
+def jtag(tck, tdi, tdo, tms, frequency=1000000):
+    """A JTAG shifter on these pins, PIO when we can, and the name of its engine."""
+    # Debug engines are only loaded when asked for so the bus modes don't pay
+    # for assembling their programs.
+    try:
+        from adafruit_circuitpyrate import pio_jtag
+
+        return pio_jtag.JTAG(tck, tdi, tdo, tms, frequency=frequency), PIO
+    except (ImportError, ValueError, RuntimeError):
+        pass
+    from adafruit_circuitpyrate import jtag as pin_jtag
+
+    return pin_jtag.JTAG(tck, tdi, tdo, tms, frequency=frequency), DIGITALIO
+
+
+def swd(swclk, swdio, frequency=1000000):
+    """An SWD wire on these pins, PIO when we can, and the name of its engine."""
+    try:
+        from adafruit_circuitpyrate import pio_swd
+
+        return pio_swd.Wire(swclk, swdio, frequency=frequency), PIO
+    except (ImportError, ValueError, RuntimeError):
+        pass
+    from adafruit_circuitpyrate import swd as pin_swd
+
+    return pin_swd.Wire(swclk, swdio, frequency=frequency), DIGITALIO
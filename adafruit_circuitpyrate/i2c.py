@@ -1,8 +1,10 @@
 from adafruit_circuitpyrate import Mode, BusWrite, BusRead
 import adafruit_prompt_toolkit as prompt_toolkit
 
+from adafruit_circuitpyrate import engines
+from adafruit_circuitpyrate.sniffer import FrameBuffer, BUFFER_SIZE
+
 import array
-import busio
 import bitbangio
  
 SPEEDS = (5, 50, 100, 400)
@@ -16,7 +18,7 @@ class I2C(Mode):
         scl = pins["clock"]
         sda = pins["mosi"]
         if "scl" in pins:
-            implementation = self._select_option("I2C pinout:", (f"{pins["clock"]}/{pins["mosi"]}", f"{pins["scl"]}/{pins["sda"]}"))
+            implementation = self._select_option("I2C pinout:", (f"{pins['clock']}/{pins['mosi']}", f"{pins['scl']}/{pins['sda']}"))
             if implementation == 1:
                 scl = pins["scl"]
                 sda = pins["sda"]
@@ -25,25 +27,23 @@ class I2C(Mode):
 
         speed = SPEEDS[speed] * 1000
 
-        hardware_possible = False
-        try:
-            print("native I2C")
-            self.i2c = busio.I2C(scl=scl, sda=sda, frequency=speed)
-            hardware_possible = True
-        except ValueError as e:
-            print("bitbang I2C", repr(e))
-            self.i2c = bitbangio.I2C(scl=scl, sda=sda, frequency=speed)
-        if hardware_possible:
+        self.i2c, self.engine = engines.i2c(scl, sda, frequency=speed)
+        if self.engine != engines.BITBANG:
             implementation = self._select_option("I2C mode:", ("Software", "Hardware"))
             # Switch to bitbang
             if implementation == 0:
                 self.i2c.deinit()
                 self.i2c = bitbangio.I2C(scl=scl, sda=sda, frequency=speed)
+                self.engine = engines.BITBANG
 
 
+        self.scl = scl
+        self.sda = sda
+        self.speed = speed
+
         self.macros = {
             1: ("7bit address search", self.scan),
-            # No CP API. 2: ("I2C sniffer", self.sniff)
+            2: ("I2C sniffer", self.sniff),
         }
 
         self.pull_ok = True
@@ -51,6 +51,35 @@ class I2C(Mode):
     def deinit(self):
         self.i2c.deinit()
 
+    def print_status(self):
+        self._print(f"I2C engine: {self.engine}")
+
+    def sniff(self):
+        try:
+            from adafruit_circuitpyrate import pio_i2c_sniffer
+        except ImportError:
+            self._print("No sniffer on this board")
+            return
+        # Only listen, other controllers drive the bus.
+        self.i2c.deinit()
+        sniffer = pio_i2c_sniffer.I2CSniffer(self.scl, self.sda)
+        frames = FrameBuffer(BUFFER_SIZE)
+        frame = bytearray(BUFFER_SIZE)
+        self._print("I2C bus sniffer, any key exits")
+        while not self._input.in_waiting:
+            sniffer.poll(frames)
+            while len(frames):
+                _, length = frames.pop(frame)
+                self._print(pio_i2c_sniffer.format_frame(frame, length))
+        self._input.read(1)
+        sniffer.deinit()
+        if frames.dropped:
+            self._print(f"Dropped {frames.dropped} transactions")
+        if self.engine == engines.BITBANG:
+            self.i2c = bitbangio.I2C(scl=self.scl, sda=self.sda, frequency=self.speed)
+        else:
+            self.i2c, self.engine = engines.i2c(self.scl, self.sda, frequency=self.speed)
+
     def print_pin_functions(self):
         self._print("SCL     SDA     -       -")
 
@@ -149,7 +178,7 @@ class I2C(Mode):
                     device_found = False
             else:
                 try:
-                    self.i2c.readinto(device_address, read_buffer)
+                    self.i2c.readfrom_into(device_address, read_buffer)
                 except OSError:
                     device_found = False
 
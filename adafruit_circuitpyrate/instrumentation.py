@@ -0,0 +1,140 @@
+import gc
+import struct
+import time
+
+# idle is time spent waiting for the host to send anything. It's last so the
+# stage order of 0x20 replies is unchanged for anything reading the first four.
+STAGES = ("read", "decode", "bus", "write", "idle")
+# Per stage: calls, bytes, total ns, max ns. The 32 bit fields stick at
+# UINT32_MAX rather than overflow.
+STAGE_FORMAT = ">IIQI"
+UINT32_MAX = 0xFFFFFFFF
+# Free heap at the last reset and now
+HEAP_FORMAT = ">ii"
+
+
+class Stage:
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class Stats:
+    """Hot path counters for the serial read, decode, bus and serial write stages.
+
+    Wrap a stage with ``start = stats.begin()`` and ``stats.end("bus", start, nbytes)``.
+    Binary modes call ``command()`` after reading each command byte. The time
+    since the previous command that isn't read, bus or write time is Python
+    overhead and is counted as decode.
+
+    A serial read that starts with nothing waiting is counted as idle, not
+    read, so waiting for the host's next command doesn't swamp the transfer
+    time.
+
+    Free heap is only sampled on reset and when reporting because
+    ``gc.mem_free()`` walks the heap.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        for name in STAGES:
+            self.stages[name] = Stage()
+        self._command_start = 0
+        self._command_io = 0
+        self.heap_before = gc.mem_free()
+
+    def begin(self):
+        return time.monotonic_ns()
+
+    def end(self, name, start, byte_count=0):
+        elapsed = time.monotonic_ns() - start
+        self._add(self.stages[name], elapsed, byte_count)
+
+    def _add(self, stage, elapsed, byte_count):
+        stage.count += 1
+        stage.bytes += byte_count
+        stage.total_ns += elapsed
+        if elapsed > stage.max_ns:
+            stage.max_ns = elapsed
+
+    def _io_ns(self):
+        stages = self.stages
+        return stages["read"].total_ns + stages["bus"].total_ns + stages["write"].total_ns + stages["idle"].total_ns
+
+    def command(self):
+        now = time.monotonic_ns()
+        io = self._io_ns()
+        if self._command_start:
+            overhead = now - self._command_start - (io - self._command_io)
+            self._add(self.stages["decode"], max(overhead, 0), 1)
+        self._command_start = now
+        self._command_io = io
+
+    def pack(self):
+        buf = bytearray((len(STAGES),))
+        for name in STAGES:
+            stage = self.stages[name]
+            buf.extend(
+                struct.pack(
+                    STAGE_FORMAT,
+                    min(stage.count, UINT32_MAX),
+                    min(stage.bytes, UINT32_MAX),
+                    stage.total_ns,
+                    min(stage.max_ns, UINT32_MAX),
+                )
+            )
+        buf.extend(struct.pack(HEAP_FORMAT, self.heap_before, gc.mem_free()))
+        return buf
+
+    def format(self):
+        lines = ["Stage    Calls      Bytes      Total ms   Max us"]
+        for name in STAGES:
+            stage = self.stages[name]
+            lines.append(
+                f"{name:8} {stage.count:<10} {stage.bytes:<10} {stage.total_ns / 1000000:<10.1f} {stage.max_ns // 1000}"
+            )
+        lines.append(f"Free heap {self.heap_before} at reset, {gc.mem_free()} now")
+        return lines
+
+
+class InstrumentedSerial:
+    """Counts serial reads and writes into the given Stats."""
+
+    def __init__(self, serial, stats):
+        self.serial = serial
+        self.stats = stats
+
+    @property
+    def in_waiting(self):
+        return self.serial.in_waiting
+
+    def read(self, length=1):
+        stage = "read" if self.serial.in_waiting else "idle"
+        start = self.stats.begin()
+        result = self.serial.read(length)
+        self.stats.end(stage, start, len(result) if result else 0)
+        return result
+
+    def readinto(self, buffer):
+        stage = "read" if self.serial.in_waiting else "idle"
+        start = self.stats.begin()
+        result = self.serial.readinto(buffer)
+        self.stats.end(stage, start, result or 0)
+        return result
+
+    def write(self, buffer):
+        start = self.stats.begin()
+        result = self.serial.write(buffer)
+        self.stats.end("write", start, len(buffer))
+        return result
+
+    def flush(self):
+        self.serial.flush()
+
+    def reset_input_buffer(self):
+        self.serial.reset_input_buffer()
@@ -0,0 +1,40 @@
+import digitalio
+
+
+class JTAG:
+    """Bit banged stand in for ``pio_jtag.JTAG`` when there's no PIO. Runs as
+    fast as the pins toggle so frequency is only remembered."""
+
+    def __init__(self, tck, tdi, tdo, tms, *, frequency=1000000):
+        self._tck = digitalio.DigitalInOut(tck)
+        self._tck.switch_to_output(value=False)
+        self._tdi = digitalio.DigitalInOut(tdi)
+        self._tdi.switch_to_output(value=False)
+        self._tdo = digitalio.DigitalInOut(tdo)
+        self._tdo.switch_to_input()
+        self._tms = digitalio.DigitalInOut(tms)
+        self._tms.switch_to_output(value=True)
+        self.frequency = frequency
+
+    def shift(self, pairs, tdo, bits):
+        tck = self._tck
+        tdi = self._tdi
+        tms = self._tms
+        tdo_pin = self._tdo
+        for i in range((bits + 7) // 8):
+            tdi_byte = pairs[2 * i]
+            tms_byte = pairs[2 * i + 1]
+            out = 0
+            for bit in range(min(8, bits - 8 * i)):
+                mask = 1 << bit
+                tdi.value = bool(tdi_byte & mask)
+                tms.value = bool(tms_byte & mask)
+                tck.value = True
+                if tdo_pin.value:
+                    out |= mask
+                tck.value = False
+            tdo[i] = out
+
+    def deinit(self):
+        for pin in (self._tck, self._tdi, self._tdo, self._tms):
+            pin.deinit()
@@ -0,0 +1,47 @@
+from adafruit_circuitpyrate import rawwire
+
+# ISO 7816-10 protocol types for synchronous cards.
+PROTOCOLS = {
+    8: "serial data access",
+    9: "3 wire",
+    10: "2 wire",
+}
+
+
+class TwoWire(rawwire.RawWire):
+    name = "2WIRE"
+
+    def __init__(self, pins, input, output):
+        super().__init__(pins, input, output)
+        self.atr = None
+        self.macros = {
+            1: ("ISO7816-3 ATR (RST on CS)", self.read_atr),
+            2: ("ISO7816-3 parse only", self.parse_atr),
+        }
+
+    def read_atr(self):
+        # Synchronous memory cards answer a reset pulse with 4 bytes, LSB first.
+        bus = self.bus
+        lsb = bus.lsb
+        bus.lsb = True
+        self.cs.value = True
+        bus.clock_tick()
+        self.cs.value = False
+        atr = bytearray(4)
+        for i in range(len(atr)):
+            atr[i] = bus.read_bits()
+        bus.lsb = lsb
+        self.atr = atr
+        self.parse_atr()
+
+    def parse_atr(self):
+        if self.atr is None:
+            self._print("No ATR yet, run (1) first")
+            return
+        h1, h2 = self.atr[0], self.atr[1]
+        self._print("ISO 7816-3 reply (uses LSB):", " ".join(f"0x{b:02X}" for b in self.atr))
+        self._print("Protocol:", PROTOCOLS.get(h1 >> 4, "unknown"))
+        self._print("Read type:", "defined length" if h2 & 0x80 else "to end")
+        units = (h2 >> 3) & 0xF
+        self._print("Data units:", 1 << (units + 6) if units else "no indication")
+        self._print("Data unit length (bits):", 1 << (h2 & 0x7))
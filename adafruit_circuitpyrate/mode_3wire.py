@@ -0,0 +1,6 @@
+from adafruit_circuitpyrate import rawwire
+
+
+class ThreeWire(rawwire.RawWire):
+    name = "3WIRE"
+    three_wire = True
@@ -1,8 +1,10 @@
 from adafruit_circuitpyrate import Mode, BusWrite, BusRead
 import adafruit_prompt_toolkit as prompt_toolkit
 
+from adafruit_circuitpyrate import onewire_bus
+
 import array
-import adafruit_onewire.bus
+import time
  
 KNOWN_DEVICES = {
     0x10: "DS18S20 High Prec Dig Therm",
@@ -18,18 +20,26 @@ class OneWire(Mode):
     def __init__(self, pins, input, output):
         super().__init__(input, output)
 
-        self.onewire = adafruit_onewire.bus.OneWireBus(pins["mosi"])
+        overdrive = False
+        if onewire_bus.onewire_pio is not None:
+            overdrive = self._select_option("Bus speed:", ["Standard (~15kbps) *default", "Overdrive (~125kbps)"]) == 1
+        self.onewire = onewire_bus.open_bus(pins["mosi"], overdrive=overdrive)
 
         self.macros = {
             # 1-50 are used for device rom shortcuts
             51 : ("READ ROM (0x33) *for single device bus", self.read_rom),
+            68 : ("CONVERT T (0x44) on every found thermometer and read them", self.convert_all),
             # 85 : ("MATCH ROM (0x55) *followed by 64bit address", self.match_rom),
             204: ("SKIP ROM (0xCC) *followed by command", self.skip_rom),
-            # 236: ("ALARM SEARCH (0xEC)", self.alarm_search),
+            100: ("Verify known devices, full search only if one is missing", self.rescan),
+            236: ("ALARM SEARCH (0xEC) and read flagged thermometers", self.alarm_search),
             240: ("SEARCH ROM (0xF0)", self.search_rom),
         }
 
-        self._devices = {}
+        self.counters = onewire_bus.Counters()
+        self.devices = onewire_bus.DeviceTable()
+        self.devices.load()
+        self._update_macros()
 
         self.pull_ok = True
 
@@ -42,16 +52,27 @@ class OneWire(Mode):
     def print_pin_directions(self):
         self._print("I       I       I       I")
 
+    def print_status(self):
+        speed = "overdrive" if getattr(self.onewire, "overdrive", False) else "standard speed"
+        self._print(f"1-Wire at {speed}")
+        self._print(self.counters.format())
+
     def read_rom(self):
-        self.onewire.reset()
-        self._print("BUS RESET  OK")
-        self.onewire.write(b"\x33")
         buf = bytearray(8)
-        self.onewire.readinto(buf)
-        self._print("READ ROM (0x33):", end="")
-        for b in buf:
-            self._print(f" 0x{b:02X}", end="")
-        self._print()
+        for attempt in range(1, onewire_bus.RETRIES + 2):
+            self.onewire.reset()
+            self._print("BUS RESET  OK")
+            self.onewire.write(b"\x33")
+            self.onewire.readinto(buf)
+            self._print("READ ROM (0x33):", end="")
+            for b in buf:
+                self._print(f" 0x{b:02X}", end="")
+            self._print()
+            ok = onewire_bus.check_response(onewire_bus.READ_ROM, buf)
+            if ok:
+                break
+            self._print("CRC ERROR")
+        self.counters.record(attempt, ok)
         if buf[0] in KNOWN_DEVICES:
             self._print(KNOWN_DEVICES[buf[0]])
         else:
@@ -60,36 +81,135 @@ class OneWire(Mode):
     def skip_rom(self):
         pass
 
-    def _format_rom(self, device):
+    def _format_rom(self, rom):
         formatted_rom = []
-        for b in device.rom:
+        for b in rom:
             formatted_rom.append(f"0x{b:02X}")
         return " ".join(formatted_rom)
 
-    def _address_macro(self, i):
-        device = self._devices[i]
-        self._print(f"ADDRESS MACRO {i+1}: {self._format_rom(device)}")
-        self.onewire.write(device.rom)
+    def _device_name(self, rom):
+        return KNOWN_DEVICES.get(rom[0], "Unknown device")
 
-    def search_rom(self):
+    def _address_macro(self, i):
+        rom = self.devices.roms[i]
+        self._print(f"ADDRESS MACRO {i+1}: {self._format_rom(rom)}")
+        self.onewire.write(rom)
+
+    def _update_macros(self):
+        for i, rom in enumerate(self.devices.roms[:50]):
+            self.macros[i + 1] = (self._format_rom(rom) + "\n   " + self._device_name(rom), lambda i=i: self._address_macro(i))
+
+    def _save_devices(self):
+        self._update_macros()
+        if not self.devices.save():
+            self._print("CIRCUITPY is read only, device table not saved")
+
+    def convert_all(self):
+        thermometers = []
+        for i, rom in enumerate(self.devices.roms):
+            if rom[0] in onewire_bus.THERMOMETERS:
+                thermometers.append((i, rom))
+        if not thermometers:
+            self._print("No thermometers found, run SEARCH ROM (240) first")
+            return
+
+        # Read everything before printing so the table doesn't slow the reads.
+        start = time.monotonic_ns()
+        onewire_bus.convert_all(self.onewire)
+        scratchpad = bytearray(onewire_bus.SCRATCHPAD_SIZE)
+        results = []
+        for i, rom in thermometers:
+            if onewire_bus.read_scratchpad(self.onewire, rom, scratchpad, self.counters):
+                results.append((i, rom, onewire_bus.temperature(rom, scratchpad)))
+            else:
+                results.append((i, rom, None))
+        elapsed = time.monotonic_ns() - start
+
+        self._print("SKIP ROM + CONVERT T (0xCC 0x44)")
+        self._print("Macro    Temp C    1WIRE address")
+        for i, rom, temperature in results:
+            reading = "CRC ERR" if temperature is None else f"{temperature:.4f}"
+            self._print(f" {i+1:<7} {reading:<9} {self._format_rom(rom)}")
+        self._print(f"Read {len(results)} thermometers in {elapsed // 1_000_000} ms")
+
+    def _print_devices(self, roms):
         self._print("Macro    1WIRE address")
-        for i, device in enumerate(self.onewire.scan()):
+        for rom in roms:
+            i = self.devices.roms.index(rom)
             self._print(f" {i+1}.", end="")
-            formatted_rom = self._format_rom(device)
-            self._print(formatted_rom)
-            device_name = "Unknown device"
-            if device.rom[0] in KNOWN_DEVICES:
-                device_name = KNOWN_DEVICES[device.rom[0]]
-            self._print(device_name)
-            if i < 50:
-                self._devices[i] = device
-                self.macros[i + 1] = (formatted_rom + "\n   " + device_name, lambda: self._address_macro(i))
+            self._print(self._format_rom(rom))
+            self._print(self._device_name(rom))
+
+    def search_rom(self):
+        found = []
+        changed = False
+        for rom in onewire_bus.search(self.onewire):
+            found.append(rom)
+            changed = self.devices.add(rom) or changed
+        self._print_devices(found)
+        if changed:
+            self._save_devices()
+
+    def rescan(self):
+        known = len(self.devices.roms)
+        start = time.monotonic_ns()
+        present, missing = self.devices.rescan(self.onewire)
+        elapsed = time.monotonic_ns() - start
+        self._print_devices(present)
+        for rom in missing:
+            self._print(f"Missing: {self._format_rom(rom)}")
+        self._print(f"{len(present)} present, {len(missing)} missing in {elapsed // 1_000_000} ms")
+        if len(self.devices.roms) != known:
+            self._save_devices()
+
+    def alarm_search(self):
+        flagged = list(onewire_bus.search(self.onewire, onewire_bus.ALARM_SEARCH))
+        if not flagged:
+            self._print("No devices flagged")
+            return
+        changed = False
+        for rom in flagged:
+            changed = self.devices.add(rom) or changed
+        if changed:
+            self._save_devices()
+        scratchpad = bytearray(onewire_bus.SCRATCHPAD_SIZE)
+        self._print("Macro    Temp C    1WIRE address")
+        for rom in flagged:
+            reading = "-"
+            if rom[0] in onewire_bus.THERMOMETERS:
+                if onewire_bus.read_scratchpad(self.onewire, rom, scratchpad, self.counters):
+                    reading = f"{onewire_bus.temperature(rom, scratchpad):.4f}"
+                else:
+                    reading = "CRC ERR"
+            self._print(f" {self.devices.roms.index(rom)+1:<7} {reading:<9} {self._format_rom(rom)}")
+
+    def _print_read(self, buf):
+        self._print("READ:", end="")
+        for b in buf:
+            self._print(f" 0x{b:02X}", end="")
+        self._print()
+
+    def _replay(self, segment, buf):
+        # Everything since the reset again, then the read that failed.
+        self.onewire.reset()
+        for item in segment:
+            if isinstance(item, int):
+                self.onewire.readinto(bytearray(item))
+            else:
+                self.onewire.write(item)
+        self.onewire.readinto(buf)
 
     def run_sequence(self, sequence):
+        # Writes and read lengths since the last reset so a read with a bad CRC
+        # can be retried. None until there's been a reset to replay from.
+        segment = None
+        command = None
         for action in sequence:
             if action == "START":
                 self.onewire.reset()
                 self._print("BUS RESET  OK")
+                segment = []
+                command = None
             elif isinstance(action, BusWrite):
                 buf = bytearray(action.repeat)
                 self._print(f"WRITE:", end="")
@@ -98,10 +218,24 @@ class OneWire(Mode):
                     self._print(f" 0x{buf[i]:02X}", end="")
                 self._print()
                 self.onewire.write(buf)
+                if segment is not None:
+                    segment.append(buf)
+                command = action.value
             elif isinstance(action, BusRead):
                 buf = bytearray(action.repeat)
-                self._print("READ:", end="")
                 self.onewire.readinto(buf)
-                for i in range(action.repeat):
-                    self._print(f" 0x{buf[i]:02X}", end="")
-                self._print()
+                self._print_read(buf)
+                ok = onewire_bus.check_response(command, buf)
+                if ok is not None:
+                    attempt = 1
+                    while not ok and segment is not None and attempt <= onewire_bus.RETRIES:
+                        self._print("CRC ERROR, retrying")
+                        self._replay(segment, buf)
+                        self._print_read(buf)
+                        ok = onewire_bus.check_response(command, buf)
+                        attempt += 1
+                    self.counters.record(attempt, ok)
+                    self._print("CRC OK" if ok else "CRC ERROR")
+                if segment is not None:
+                    segment.append(len(buf))
+                command = None
@@ -0,0 +1,300 @@
+import binascii
+import time
+
+import adafruit_onewire.bus
+
+from adafruit_circuitpyrate import crc
+
+try:
+    from adafruit_circuitpyrate import onewire_pio
+except ImportError:
+    # No PIO, so only the standard speed driver.
+    onewire_pio = None
+
+# ROM commands from the Maxim 1-Wire datasheets.
+READ_ROM = 0x33
+MATCH_ROM = 0x55
+SKIP_ROM = 0xCC
+ALARM_SEARCH = 0xEC
+SEARCH_ROM = 0xF0
+
+# DS18x20 function commands
+CONVERT_T = 0x44
+READ_SCRATCHPAD = 0xBE
+READ_POWER_SUPPLY = 0xB4
+# DS24xx memory commands
+READ_MEMORY_SCRATCHPAD = 0xAA
+
+# Reads we know how to check: command -> (response length, CRC type)
+CRC_CHECKS = {
+    READ_ROM: (8, 8),
+    READ_SCRATCHPAD: (9, 8),
+    # TA1, TA2, E/S, 8 bytes of data and an inverted CRC16 that covers the command too.
+    READ_MEMORY_SCRATCHPAD: (13, 16),
+}
+
+# Family codes of the thermometers that answer CONVERT T.
+THERMOMETERS = (0x10, 0x22, 0x28, 0x3B, 0x42)
+# Worst case 12 bit conversion.
+CONVERSION_TIME = 0.75
+CONVERSION_POLL = 0.005
+SCRATCHPAD_SIZE = 9
+
+# Extra attempts after a CRC mismatch before giving up on a read.
+RETRIES = 3
+
+# MATCH ROM, the ROM and a function command, reused for every addressed read.
+_match = bytearray(10)
+_match[0] = MATCH_ROM
+
+# A search can't find more devices than this before we assume the bus is noise.
+MAX_DEVICES = 128
+
+# Saved to CIRCUITPY, which is only writable when the USB drive is disabled.
+DEVICE_TABLE = "/onewire_devices.txt"
+
+
+def open_bus(pin, overdrive=False):
+    """The PIO driver where there is one, otherwise ``OneWireBus``."""
+    if onewire_pio is None:
+        if overdrive:
+            raise ValueError("Overdrive needs PIO")
+        return adafruit_onewire.bus.OneWireBus(pin)
+    return onewire_pio.OneWireBus(pin, overdrive=overdrive)
+
+
+def _bit(rom, bit):
+    return (rom[bit >> 3] >> (bit & 7)) & 1
+
+
+def _same_prefix(a, b, length):
+    # Whether the first `length` bits of two ROMs match.
+    whole = length >> 3
+    if a[:whole] != b[:whole]:
+        return False
+    mask = (1 << (length & 7)) - 1
+    return not mask or (a[whole] & mask) == (b[whole] & mask)
+
+
+def search(bus, command=SEARCH_ROM, prefix=None, fixed=0):
+    """Yields the ROM of every device answering ``command`` as 8 bytes.
+
+    This is the Maxim AN187 search. Unlike ``OneWireBus.scan`` it takes the
+    search command so alarm search works too. With ``prefix`` only devices
+    whose first ``fixed`` bits match it are searched for.
+    """
+    rom = bytearray(8) if prefix is None else bytearray(prefix)
+    last_discrepancy = 0
+    for _ in range(MAX_DEVICES):
+        # reset() returns False when nothing answered with a presence pulse.
+        if not bus.reset():
+            return
+        bus.write(bytes((command,)))
+        last_zero = 0
+        for bit in range(1, 65):
+            index = (bit - 1) >> 3
+            mask = 1 << ((bit - 1) & 7)
+            id_bit = bus._readbit()
+            complement = bus._readbit()
+            if id_bit and complement:
+                # Nobody answered, a device dropped off mid search.
+                return
+            if bit <= fixed:
+                direction = (rom[index] & mask) != 0
+                if id_bit != complement and id_bit != direction:
+                    # Nothing under the prefix.
+                    return
+            elif id_bit != complement:
+                direction = id_bit
+            elif bit < last_discrepancy:
+                direction = (rom[index] & mask) != 0
+            else:
+                direction = bit == last_discrepancy
+            if direction:
+                rom[index] |= mask
+            else:
+                rom[index] &= ~mask
+                if id_bit == complement and bit > fixed:
+                    last_zero = bit
+            bus._writebit(direction)
+        yield bytes(rom)
+        last_discrepancy = last_zero
+        if last_discrepancy == 0:
+            return
+
+
+def convert_all(bus):
+    """Starts a conversion on every thermometer at once and waits for it to finish."""
+    # Parasite powered devices pull the read slot low here and can't report
+    # when they're done, so they get the full conversion time.
+    bus.reset()
+    bus.write(bytes((SKIP_ROM, READ_POWER_SUPPLY)))
+    parasite = not bus._readbit()
+
+    bus.reset()
+    bus.write(bytes((SKIP_ROM, CONVERT_T)))
+    if parasite:
+        time.sleep(CONVERSION_TIME)
+        return
+    # Read slots return 0 until every device has finished converting.
+    deadline = time.monotonic() + CONVERSION_TIME
+    while not bus._readbit() and time.monotonic() < deadline:
+        time.sleep(CONVERSION_POLL)
+
+
+class Counters:
+    """CRC outcomes for the status output."""
+
+    def __init__(self):
+        self.reads = 0
+        self.crc_errors = 0
+        self.recovered = 0
+        self.failed = 0
+
+    def record(self, attempts, ok):
+        self.reads += 1
+        self.crc_errors += attempts - 1 if ok else attempts
+        if ok and attempts > 1:
+            self.recovered += 1
+        elif not ok:
+            self.failed += 1
+
+    def format(self):
+        return f"1-Wire reads {self.reads}, CRC errors {self.crc_errors}, recovered {self.recovered}, failed {self.failed}"
+
+
+def check_response(command, data):
+    """True or False when ``data`` is a complete response to ``command`` that has a
+    CRC, None when there's nothing to check.
+    """
+    if command not in CRC_CHECKS:
+        return None
+    length, kind = CRC_CHECKS[command]
+    if len(data) != length:
+        return None
+    if kind == 8:
+        return crc.crc8(data) == 0
+    return crc.check_crc16(data[:-2], data[-2:], crc.crc16((command,)))
+
+
+def read_scratchpad(bus, rom, buffer, counters=None):
+    """Reads ``rom``'s scratchpad into ``buffer`` and returns whether its CRC is good.
+
+    Mismatches are retried up to RETRIES times.
+    """
+    _match[1:9] = rom
+    _match[9] = READ_SCRATCHPAD
+    for attempt in range(1, RETRIES + 2):
+        bus.reset()
+        bus.write(_match)
+        bus.readinto(buffer)
+        # A missing device reads as all ones, which the CRC alone doesn't catch.
+        ok = crc.crc8(buffer) == 0 and not (buffer[0] == 0xFF and buffer[1] == 0xFF)
+        if ok:
+            break
+    if counters is not None:
+        counters.record(attempt, ok)
+    return ok
+
+
+def temperature(rom, scratchpad):
+    """Degrees C from a thermometer's scratchpad."""
+    raw = scratchpad[0] | (scratchpad[1] << 8)
+    if raw & 0x8000:
+        raw -= 0x10000
+    if rom[0] == 0x10:
+        # DS18S20 reports half degrees, COUNT REMAIN gives the rest.
+        return (raw >> 1) - 0.25 + (scratchpad[7] - scratchpad[6]) / scratchpad[7]
+    return raw / 16
+
+
+def _follow(bus, rom, known, unknown):
+    """One search pass that follows ``rom``, returning whether it's on the bus.
+
+    Wherever devices answer with the bit ``rom`` doesn't have and no ROM in
+    ``known`` shares that branch, the branch's prefix and length go on
+    ``unknown`` for a search. The pass stops as soon as ``rom`` can't be there.
+    """
+    if not bus.reset():
+        return False
+    bus.write(bytes((SEARCH_ROM,)))
+    for bit in range(64):
+        value = _bit(rom, bit)
+        id_bit = bus._readbit()
+        complement = bus._readbit()
+        if id_bit and complement:
+            return False
+        if id_bit == complement or id_bit != value:
+            # Someone has the other bit here.
+            branch = bytearray(rom)
+            branch[bit >> 3] ^= 1 << (bit & 7)
+            if not any(_same_prefix(branch, other, bit + 1) for other in known):
+                entry = (bytes(branch), bit + 1)
+                if not any(_same_prefix(branch, b, bit + 1) and n == bit + 1 for b, n in unknown):
+                    unknown.append(entry)
+            if id_bit != complement:
+                return False
+        bus._writebit(value)
+    return True
+
+
+class DeviceTable:
+    """Every ROM we've seen on the bus in the order it was first found."""
+
+    def __init__(self):
+        self.roms = []
+
+    def add(self, rom):
+        if rom in self.roms:
+            return False
+        self.roms.append(rom)
+        return True
+
+    def load(self, path=DEVICE_TABLE):
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if len(line) == 16:
+                        self.add(binascii.unhexlify(line))
+        except (OSError, ValueError):
+            pass
+
+    def save(self, path=DEVICE_TABLE):
+        """Returns False when the filesystem is read only."""
+        try:
+            with open(path, "w") as f:
+                for rom in self.roms:
+                    f.write(binascii.hexlify(rom).decode() + "\n")
+        except OSError:
+            return False
+        return True
+
+    def rescan(self, bus):
+        """Checks the known devices and finds new ones. Returns the present ROMs
+        and the missing ones.
+
+        Each known device gets one search pass that follows its ROM. Those
+        passes see every branch a device on the bus takes off the known ones,
+        so only the branches nobody known is on get searched, one pass per new
+        device. A missing device's pass stops where the bus stops matching.
+        Nothing known means a full search.
+        """
+        if not self.roms:
+            present = list(search(bus))
+            for rom in present:
+                self.add(rom)
+            return present, []
+        present = []
+        missing = []
+        unknown = []
+        for rom in self.roms:
+            if _follow(bus, rom, self.roms, unknown):
+                present.append(rom)
+            else:
+                missing.append(rom)
+        for prefix, fixed in unknown:
+            for rom in search(bus, prefix=prefix, fixed=fixed):
+                if self.add(rom):
+                    present.append(rom)
+        return present, missing
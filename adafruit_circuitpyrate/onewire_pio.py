@@ -0,0 +1,144 @@
+import adafruit_pioasm
+import rp2pio
+
+# One TX word per time slot: bit 0 is the bit to write (1 for reads) and bit 1
+# asks for a reset instead. One RX word comes back per slot with the sampled
+# line, which is the read bit or, for a reset, 0 when there was a presence pulse.
+#
+# The line is only ever driven low through pindirs. Times are in ticks, which
+# are 2us at standard speed and 0.25us at overdrive, so the same program meets
+# both sets of timings: a slot is 5 ticks low for a one, 32 for a zero, sampled
+# at 7 and 43 long. Reset is 240 low and samples presence 34 ticks after release.
+PROGRAM = adafruit_pioasm.Program(
+    """
+.program onewire
+.side_set 1 pindirs
+.wrap_target
+start:
+    out x, 1            side 0
+    out y, 1            side 0
+    jmp y-- reset       side 0
+    jmp !x zero         side 1 [4]
+    nop                 side 0 [1]
+    in pins, 1          side 0 [15]
+    nop                 side 0 [15]
+    jmp start           side 0
+zero:
+    nop                 side 1 [15]
+    nop                 side 1 [10]
+    in pins, 1          side 0 [7]
+    jmp start           side 0
+reset:
+    set x, 29           side 1
+reset_low:
+    jmp x-- reset_low   side 1 [7]
+    set x, 3            side 0 [1]
+presence_wait:
+    jmp x-- presence_wait side 0 [7]
+    in pins, 1          side 0
+    set x, 25           side 0
+reset_high:
+    jmp x-- reset_high  side 0 [7]
+.wrap
+"""
+)
+
+STANDARD_FREQUENCY = 500_000
+OVERDRIVE_FREQUENCY = 4_000_000
+OVERDRIVE_SKIP_ROM = 0x3C
+RESET_SLOT = 0x02
+# Bytes moved per write_readinto, eight slots each.
+CHUNK = 16
+
+
+class OneWireBus:
+    """Drop in for ``adafruit_onewire.bus.OneWireBus`` that runs the bit timing in
+    PIO so it can also do overdrive.
+    """
+
+    def __init__(self, pin, overdrive=False):
+        self._sm = rp2pio.StateMachine(
+            PROGRAM.assembled,
+            frequency=STANDARD_FREQUENCY,
+            first_in_pin=pin,
+            first_sideset_pin=pin,
+            initial_sideset_pin_direction=0,
+            first_set_pin=pin,
+            initial_set_pin_state=0,
+            initial_set_pin_direction=0,
+            auto_pull=True,
+            pull_threshold=2,
+            out_shift_right=True,
+            auto_push=True,
+            push_threshold=1,
+            in_shift_right=False,
+            **PROGRAM.pio_kwargs
+        )
+        self._slots_out = bytearray(CHUNK * 8)
+        self._slots_in = bytearray(CHUNK * 8)
+        self._slot = bytearray(1)
+        self._sample = bytearray(1)
+        self.overdrive = False
+        if overdrive:
+            self.enter_overdrive()
+
+    def enter_overdrive(self):
+        # Capable devices switch after an OVERDRIVE SKIP ROM at standard speed and
+        # stay there until they see a standard speed reset.
+        self.reset()
+        self.write(bytes((OVERDRIVE_SKIP_ROM,)))
+        self._sm.frequency = OVERDRIVE_FREQUENCY
+        self.overdrive = True
+
+    def _transfer(self, value):
+        self._slot[0] = value
+        self._sm.write_readinto(self._slot, self._sample)
+        return self._sample[0] & 1
+
+    def reset(self, required=False):
+        """True when a device answered with a presence pulse, like OneWireBus."""
+        presence = self._transfer(RESET_SLOT) == 0
+        if required and not presence:
+            raise RuntimeError("No presence pulse found")
+        return presence
+
+    def _readbit(self):
+        return self._transfer(1)
+
+    def _writebit(self, value):
+        self._transfer(1 if value else 0)
+
+    def write(self, buf, *, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        slots = self._slots_out
+        while start < end:
+            count = min(CHUNK, end - start)
+            for i in range(count):
+                b = buf[start + i]
+                for bit in range(8):
+                    slots[i * 8 + bit] = (b >> bit) & 1
+            length = count * 8
+            self._sm.write_readinto(memoryview(slots)[:length], memoryview(self._slots_in)[:length])
+            start += count
+
+    def readinto(self, buf, *, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        slots = self._slots_out
+        samples = self._slots_in
+        while start < end:
+            count = min(CHUNK, end - start)
+            length = count * 8
+            for i in range(length):
+                slots[i] = 1
+            self._sm.write_readinto(memoryview(slots)[:length], memoryview(samples)[:length])
+            for i in range(count):
+                b = 0
+                for bit in range(8):
+                    b |= (samples[i * 8 + bit] & 1) << bit
+                buf[start + i] = b
+            start += count
+
+    def deinit(self):
+        self._sm.deinit()
@@ -0,0 +1,213 @@
+import array
+import time
+
+import adafruit_pioasm
+import microcontroller
+import rp2pio
+
+# One sample every `delay` + 2 cycles. Samples are `bits` wide starting at the
+# lowest probe GPIO and packed into 32 bit words with the first sample in the
+# low bits. The pins are snapshotted with `mov osr, pins` like the sniffers do
+# so the state machine only needs the one input pin. A single channel trigger
+# polls its probe as the jmp pin before the first sample.
+FREE_RUNNING = """
+.program capture
+.wrap_target
+    mov osr, pins
+    in osr, {bits} [{delay}]
+.wrap
+"""
+
+TRIGGERED = """
+.program capture_triggered
+{wait}
+.wrap_target
+    mov osr, pins
+    in osr, {bits} [{delay}]
+.wrap
+"""
+
+WAIT_HIGH = """wait:
+    jmp pin sample
+    jmp wait
+sample:"""
+
+WAIT_LOW = """wait:
+    jmp pin wait"""
+
+# The slowest a state machine clock divides down to, below that every sample
+# takes SLOW_CYCLES cycles.
+MAX_DIVIDER = 65536
+FAST_CYCLES = 2
+SLOW_CYCLES = 32
+
+# WordStream buffers are filled with this first so we can tell how far one got.
+# None of the sniffers ever push it.
+EMPTY = 0x55555555
+STREAM_WORDS = 1024
+# How long a partly filled buffer can sit before it's collected anyway.
+FLUSH_NS = 20000000
+
+
+def gpio_number(pin):
+    for name in dir(microcontroller.pin):
+        if name.startswith("GPIO") and getattr(microcontroller.pin, name) is pin:
+            return int(name[4:])
+    raise ValueError("Not a GPIO")
+
+
+class Capture:
+    """Samples a set of pins into RAM at a fixed rate with a PIO state machine.
+
+    Probe pins don't have to be next to each other. Only the lowest one is
+    claimed, the rest are read through it and sorted into channel order by
+    ``channels()``.
+    """
+
+    def __init__(self, pins):
+        numbers = [gpio_number(pin) for pin in pins]
+        self._pins = pins
+        self._base = min(numbers)
+        span = max(numbers) - self._base + 1
+        self.bits = 8 if span <= 8 else (16 if span <= 16 else 32)
+        self.per_word = 32 // self.bits
+        self._first_pin = getattr(microcontroller.pin, f"GPIO{self._base}")
+        self._offsets = [number - self._base for number in numbers]
+        # Per byte of a raw sample, the channel bits each value sets.
+        self._tables = []
+        for shift in range(0, self.bits, 8):
+            table = bytearray(256)
+            used = False
+            for value in range(256):
+                channels = 0
+                for channel, offset in enumerate(self._offsets):
+                    if shift <= offset < shift + 8 and value & (1 << (offset - shift)):
+                        channels |= 1 << channel
+                        used = True
+                table[value] = channels
+            if used:
+                self._tables.append((shift, table))
+
+    def capture(self, words, frequency, trigger=None, cancel=None):
+        """Fill `words`, an array of 32 bit words, with samples taken `frequency`
+        times a second. `trigger` is (channel, level) to wait for first. `cancel`
+        is polled while capturing and stops it early when it returns True, in
+        which case this returns False."""
+        cycles = FAST_CYCLES
+        if frequency * FAST_CYCLES * MAX_DIVIDER < microcontroller.cpu.frequency:
+            cycles = SLOW_CYCLES
+        jmp_pin = None
+        if trigger is None:
+            source = FREE_RUNNING.format(bits=self.bits, delay=cycles - FAST_CYCLES)
+        else:
+            channel, level = trigger
+            jmp_pin = self._pins[channel]
+            source = TRIGGERED.format(
+                bits=self.bits, delay=cycles - FAST_CYCLES, wait=WAIT_HIGH if level else WAIT_LOW
+            )
+        program = adafruit_pioasm.Program(source)
+        sm = rp2pio.StateMachine(
+            program.assembled,
+            frequency=min(frequency * cycles, microcontroller.cpu.frequency),
+            first_in_pin=self._first_pin,
+            jmp_pin=jmp_pin,
+            auto_push=True,
+            push_threshold=32,
+            in_shift_right=True,
+            **program.pio_kwargs
+        )
+        try:
+            if cancel is None or not hasattr(sm, "background_read"):
+                sm.readinto(words)
+                return True
+            sm.background_read(once=words)
+            while sm.pending_read:
+                if cancel():
+                    return False
+            return True
+        finally:
+            sm.deinit()
+
+    def channels(self, words, index):
+        """The channel byte for sample `index`."""
+        raw = words[index // self.per_word] >> (self.bits * (index % self.per_word))
+        result = 0
+        for shift, table in self._tables:
+            result |= table[(raw >> shift) & 0xFF]
+        return result
+
+
+def sample_buffer(samples, per_word):
+    # From bytes, a list of ints would take several times the buffer's own size.
+    return array.array("L", bytes(4 * ((samples + per_word - 1) // per_word)))
+
+
+class WordStream:
+    """Hands over what a state machine pushes, in order, as it's polled.
+
+    Words are DMAed into a pair of buffers in the background where rp2pio
+    supports it so bursts aren't lost while Python is busy, and read straight
+    from the FIFO otherwise. When Python falls a whole buffer behind the DMA
+    goes round onto words that weren't collected yet. Those are given up,
+    counted in ``lost`` and reported to the poll's ``lost`` callback.
+    """
+
+    def __init__(self, sm, size=STREAM_WORDS):
+        self._sm = sm
+        self._halves = (array.array("L", [EMPTY] * size), array.array("L", [EMPTY] * size))
+        self._filling = 0
+        self.lost = 0
+        self._background = hasattr(sm, "background_read")
+        self._last_collected = time.monotonic_ns()
+        if self._background:
+            sm.background_read(loop=self._halves[0], loop2=self._halves[1])
+
+    def _collect(self, half, count, decode):
+        decode(half, count)
+        for i in range(count):
+            half[i] = EMPTY
+
+    def poll(self, decode, lost=None):
+        """Call ``decode(words, count)`` with anything that came in since last time.
+
+        ``lost(buffers)`` is called first when words were overwritten before
+        they could be collected."""
+        sm = self._sm
+        if not self._background:
+            words = self._halves[0]
+            count = min(sm.in_waiting, len(words))
+            if count:
+                sm.readinto(words, end=count)
+                decode(words, count)
+            return
+        done = sm.last_read
+        now = time.monotonic_ns()
+        half = self._halves[self._filling]
+        if len(done):
+            if done is not half:
+                # The one we were waiting for filled, then the other, and the
+                # DMA is back writing over the first.
+                self.lost += 1
+                if lost:
+                    lost(1)
+                half = done
+                self._filling = 1 - self._filling
+            self._collect(half, len(half), decode)
+            self._filling = 1 - self._filling
+            self._last_collected = now
+        elif half[0] != EMPTY and now - self._last_collected > FLUSH_NS:
+            # Quiet for a while with words waiting, stop to get at them and
+            # start again. The FIFO holds anything that comes in meanwhile.
+            sm.stop_background_read()
+            count = 0
+            while count < len(half) and half[count] != EMPTY:
+                count += 1
+            self._collect(half, count, decode)
+            self._filling = 0
+            self._last_collected = now
+            sm.background_read(loop=self._halves[0], loop2=self._halves[1])
+
+    def deinit(self):
+        if self._background:
+            self._sm.stop_background_read()
+        self._sm.deinit()
@@ -0,0 +1,202 @@
+import array
+
+import adafruit_pioasm
+import rp2pio
+
+# Based on the pico-examples PIO I2C controller. Each 16 bit TX word is either
+# a data record, | 15:10 zero | 9 unused | 8:1 SDA pindirs | 0 ACK pindir |, or
+# a header whose 15:10 holds how many of the following words to execute as
+# instructions minus one. That's how START, STOP and repeated START are slotted
+# into the stream. Each byte pushes 9 bits: the 8 data bits then the ACK bit,
+# 0 for ACK.
+#
+# We can't invert output enables from CircuitPython, so pindirs 1 drives a
+# line low and the host inverts data bits before sending them. The clock pin
+# doubles as the jmp pin so clock stretching works without SCL = SDA + 1.
+PROGRAM = adafruit_pioasm.Program(
+    """
+.program i2c
+.side_set 1 opt pindirs
+.wrap_target
+entry_point:
+    out x, 6
+    out null, 1
+    jmp !x do_byte
+    out null, 32
+do_exec:
+    out exec, 16
+    jmp x-- do_exec
+    jmp entry_point
+do_byte:
+    set x, 7
+bitloop:
+    out pindirs, 1          [7]
+    nop             side 0  [4]
+bit_stretch:
+    jmp pin bit_high
+    jmp bit_stretch
+bit_high:
+    in pins, 1              [7]
+    nop                     [1]
+    jmp x-- bitloop side 1  [7]
+    out pindirs, 1          [7]
+    nop             side 0  [4]
+ack_stretch:
+    jmp pin ack_high
+    jmp ack_stretch
+ack_high:
+    in pins, 1              [7]
+    nop                     [1]
+    nop             side 1  [7]
+.wrap
+"""
+)
+
+# Bus states, SCL and SDA. Run through out exec so only the side set config matters.
+_STATES = adafruit_pioasm.Program(
+    """
+.program states
+.side_set 1 opt pindirs
+    set pindirs, 1  side 1  [7]
+    set pindirs, 0  side 1  [7]
+    set pindirs, 1  side 0  [7]
+    set pindirs, 0  side 0  [7]
+"""
+).assembled
+SCL0_SDA0, SCL0_SDA1, SCL1_SDA0, SCL1_SDA1 = _STATES
+
+START = (SCL1_SDA0, SCL0_SDA0)
+REPEATED_START = (SCL0_SDA1, SCL1_SDA1, SCL1_SDA0, SCL0_SDA0)
+STOP = (SCL0_SDA0, SCL1_SDA0, SCL1_SDA1)
+
+CYCLES_PER_BIT = 32
+ACK_BIT = 0x1
+
+
+class I2C:
+    """``busio.I2C`` compatible controller running in a PIO state machine."""
+
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        self._sm = rp2pio.StateMachine(
+            PROGRAM.assembled,
+            frequency=frequency * CYCLES_PER_BIT,
+            first_out_pin=sda,
+            initial_out_pin_state=0,
+            initial_out_pin_direction=0,
+            first_set_pin=sda,
+            initial_set_pin_state=0,
+            initial_set_pin_direction=0,
+            first_in_pin=sda,
+            first_sideset_pin=scl,
+            initial_sideset_pin_state=0,
+            initial_sideset_pin_direction=0,
+            jmp_pin=scl,
+            auto_pull=True,
+            pull_threshold=16,
+            out_shift_right=False,
+            auto_push=True,
+            push_threshold=9,
+            in_shift_right=False,
+            **PROGRAM.pio_kwargs
+        )
+        self._locked = False
+        self._words = array.array("H")
+        self._replies = array.array("H", (0,))
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def _instructions(self, instructions):
+        self._words.append((len(instructions) - 1) << 10)
+        for instruction in instructions:
+            self._words.append(instruction)
+
+    def _byte(self, value, ack=False):
+        # Invert for pindirs. On reads we send all zeros and drive the ACK.
+        self._words.append(((~value & 0xFF) << 1) | (ACK_BIT if ack else 0))
+
+    def _run(self, reply_count):
+        if not reply_count:
+            self._sm.write(self._words)
+            self._words = array.array("H")
+            return ()
+        if len(self._replies) < reply_count:
+            self._replies = array.array("H", bytes(2 * reply_count))
+        replies = memoryview(self._replies)[:reply_count]
+        self._sm.write_readinto(self._words, replies)
+        self._words = array.array("H")
+        return replies
+
+    def _address(self, address, read, repeated=False):
+        # Address on its own so we can stop before sending data nobody asked for.
+        self._instructions(REPEATED_START if repeated else START)
+        self._byte((address << 1) | (1 if read else 0))
+        if self._run(1)[0] & ACK_BIT:
+            self._instructions(STOP)
+            self._run(0)
+            raise OSError(19)
+
+    def _write(self, buffer, start, end, stop):
+        for i in range(start, end):
+            self._byte(buffer[i])
+        if stop:
+            self._instructions(STOP)
+        replies = self._run(end - start)
+        for reply in replies:
+            if reply & ACK_BIT:
+                if not stop:
+                    self._instructions(STOP)
+                    self._run(0)
+                raise OSError(5)
+
+    def _read(self, buffer, start, end):
+        for i in range(start, end):
+            # ACK everything but the last byte.
+            self._byte(0xFF, ack=i < end - 1)
+        self._instructions(STOP)
+        replies = self._run(end - start)
+        for i, reply in enumerate(replies):
+            buffer[start + i] = (reply >> 1) & 0xFF
+
+    def scan(self):
+        found = []
+        for address in range(0x08, 0x78):
+            try:
+                self._address(address, False)
+            except OSError:
+                continue
+            self._instructions(STOP)
+            self._run(0)
+            found.append(address)
+        return found
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        self._address(address, False)
+        self._write(buffer, start, end, stop=True)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        self._address(address, True)
+        self._read(buffer, start, end)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        self._address(address, False)
+        self._write(buffer_out, out_start, out_end, stop=False)
+        self._address(address, True, repeated=True)
+        self._read(buffer_in, in_start, in_end)
+
+    def deinit(self):
+        self._sm.deinit()
@@ -0,0 +1,160 @@
+import adafruit_pioasm
+import rp2pio
+
+from adafruit_circuitpyrate.pio_capture import gpio_number, WordStream, STREAM_WORDS
+
+# Passive I2C monitor. SDA is sampled as SCL rises, then both lines are watched
+# until SCL falls: SDA falling meanwhile is a START and rising is a STOP, and
+# the bit sampled for that clock is thrown away. The bus idles with both lines
+# high so a STOP goes on to watch for the next START. Each byte pushes a 9 bit
+# word, the data from bit 8 down and the ACK bit, 0 for ACK, in bit 0.
+#
+# SDA is the jmp pin and SCL is polled through a snapshot of the pins so the
+# two lines don't have to be next to each other. Nothing waits on a GPIO
+# directly, rp2pio only allows that on pins the state machine was given.
+PROGRAM = """
+.program i2c_sniffer
+    jmp pin sda_high
+    jmp sda_low
+.wrap_target
+bit:
+    mov osr, pins
+{skip_scl}
+    out x, 1
+    jmp x-- bit
+scl_low:
+    mov osr, pins
+{skip_scl}
+    out x, 1
+    jmp !x scl_low
+    mov osr, pins
+{skip_sda}
+    in osr, 1
+    jmp pin sda_high
+sda_low:
+    mov osr, pins
+{skip_scl}
+    out x, 1
+    jmp !x bit
+    jmp pin stop
+    jmp sda_low
+stop:
+    mov isr, ~null
+    in null, 1
+    push
+sda_high:
+    mov osr, pins
+{skip_scl}
+    out x, 1
+    jmp !x bit
+    jmp pin sda_high
+    mov isr, ~null
+    push
+.wrap
+"""
+
+START = 0xFFFFFFFF
+STOP = 0xFFFFFFFE
+
+# Bus Pirate sniffer events, data bytes follow an escape.
+EVENT_START = ord("[")
+EVENT_STOP = ord("]")
+EVENT_DATA = ord("\\")
+EVENT_ACK = ord("+")
+EVENT_NACK = ord("-")
+
+
+class I2CSniffer:
+    """Decodes I2C traffic from other controllers without driving the bus.
+
+    Each transaction from START to STOP, repeated STARTs included, becomes a
+    frame of Bus Pirate sniffer events: ``[`` and ``]`` for START and STOP,
+    ``\\`` and then a byte for data and ``+`` or ``-`` for its ACK or NACK.
+    """
+
+    def __init__(self, scl, sda):
+        scl_number = gpio_number(scl)
+        sda_number = gpio_number(sda)
+        base = min(scl_number, sda_number)
+        skip_sda = sda_number - base
+        skip_scl = scl_number - base
+        source = PROGRAM.format(
+            skip_sda=f"    out null, {skip_sda}" if skip_sda else "",
+            skip_scl=f"    out null, {skip_scl}" if skip_scl else "",
+        )
+        program = adafruit_pioasm.Program(source)
+        sm = rp2pio.StateMachine(
+            program.assembled,
+            frequency=0,
+            first_in_pin=scl if scl_number < sda_number else sda,
+            jmp_pin=sda,
+            auto_push=True,
+            push_threshold=9,
+            in_shift_right=False,
+            out_shift_right=True,
+            **program.pio_kwargs
+        )
+        self._stream = WordStream(sm)
+        self._frame = bytearray(STREAM_WORDS)
+        self._length = 0
+        # Nothing counts until the first START, we may have come in mid byte.
+        self._started = False
+        self._frames = None
+
+    def _add(self, *events):
+        if self._length + len(events) > len(self._frame):
+            # Longer than we can hold, pass it on in pieces.
+            self._emit()
+        for event in events:
+            self._frame[self._length] = event
+            self._length += 1
+
+    def _emit(self):
+        if self._length:
+            self._frames.add(self._frame, self._length)
+            self._length = 0
+
+    def _decode(self, words, count):
+        for i in range(count):
+            word = words[i]
+            if word == START:
+                self._started = True
+                self._add(EVENT_START)
+            elif not self._started:
+                continue
+            elif word == STOP:
+                self._add(EVENT_STOP)
+                self._emit()
+                self._started = False
+            else:
+                self._add(EVENT_DATA, word >> 1, EVENT_NACK if word & 1 else EVENT_ACK)
+
+    def _lost(self, buffers):
+        # The transaction in progress is missing events, drop it and wait for
+        # the next START.
+        self._length = 0
+        self._started = False
+        self._frames.dropped += buffers
+
+    def poll(self, frames):
+        """Decode everything captured so far into `frames`."""
+        self._frames = frames
+        self._stream.poll(self._decode, self._lost)
+
+    def deinit(self):
+        self._stream.deinit()
+
+
+def format_frame(frame, length):
+    """The Bus Pirate terminal form of a frame, like [0xA0+0x00-]."""
+    parts = []
+    i = 0
+    while i < length:
+        event = frame[i]
+        if event == EVENT_DATA:
+            parts.append(f"0x{frame[i + 1]:02X}")
+            i += 2
+        else:
+            parts.append(chr(event))
+            i += 1
+    return "".join(parts)
@@ -0,0 +1,106 @@
+import array
+
+import adafruit_pioasm
+import microcontroller
+import rp2pio
+
+# Each 32 bit TX word clocks up to 8 TCK cycles: | 18:3 TMS/TDI pairs | 2:0 count - 1 |
+# with TDI in the even bits and TMS in the odd ones, shifted out LSB first. The
+# rest of the word is thrown away and whatever TDO bits were sampled get pushed,
+# so bit counts that aren't a multiple of 8 don't need extra clocks.
+#
+# TDI and TMS aren't next to each other on the header so TDI goes through out
+# and TMS through set. TDO is sampled on the rising edge and everything changes
+# on the falling edge.
+PROGRAM = adafruit_pioasm.Program(
+    """
+.program jtag
+.side_set 1
+.wrap_target
+    out y, 3            side 0
+bit:
+    out pins, 1         side 0
+    out x, 1            side 0
+    jmp !x tms_low      side 0
+    set pins, 1         side 0
+    jmp clock           side 0
+tms_low:
+    set pins, 0         side 0
+    nop                 side 0
+clock:
+    in pins, 1          side 1 [2]
+    jmp y-- bit         side 0
+    out null, 32        side 0
+    push                side 0
+.wrap
+"""
+)
+
+CYCLES_PER_BIT = 9
+# Most bits in one shift command of the Bus Pirate protocol.
+MAX_BITS = 0x2000
+
+
+def _spread(value):
+    # Move bit i to bit 2 * i so TDI and TMS bytes interleave with an or.
+    result = 0
+    for i in range(8):
+        if value & (1 << i):
+            result |= 1 << (2 * i)
+    return result
+
+
+SPREAD = array.array("H", (_spread(i) for i in range(256)))
+
+
+class JTAG:
+    """Shifts TDI/TMS bit vectors and captures TDO in a PIO state machine."""
+
+    def __init__(self, tck, tdi, tdo, tms, *, frequency=1000000):
+        self._sm = rp2pio.StateMachine(
+            PROGRAM.assembled,
+            frequency=self._frequency_for(frequency),
+            first_out_pin=tdi,
+            initial_out_pin_state=0,
+            initial_out_pin_direction=1,
+            first_set_pin=tms,
+            initial_set_pin_state=1,
+            initial_set_pin_direction=1,
+            first_in_pin=tdo,
+            first_sideset_pin=tck,
+            initial_sideset_pin_state=0,
+            initial_sideset_pin_direction=1,
+            auto_pull=True,
+            pull_threshold=32,
+            out_shift_right=True,
+            in_shift_right=True,
+            **PROGRAM.pio_kwargs
+        )
+        self._words = array.array("L", [0] * (MAX_BITS // 8))
+
+    def _frequency_for(self, frequency):
+        return min(frequency * CYCLES_PER_BIT, microcontroller.cpu.frequency)
+
+    @property
+    def frequency(self):
+        return self._sm.frequency // CYCLES_PER_BIT
+
+    @frequency.setter
+    def frequency(self, frequency):
+        self._sm.frequency = self._frequency_for(frequency)
+
+    def shift(self, pairs, tdo, bits):
+        """Clock `bits` cycles. `pairs` holds a TDI byte then a TMS byte for every
+        8 bits, LSB first, and TDO comes back one byte per 8 bits the same way."""
+        count = (bits + 7) // 8
+        words = self._words
+        for i in range(count):
+            n = min(8, bits - 8 * i)
+            words[i] = (n - 1) | (SPREAD[pairs[2 * i]] << 3) | (SPREAD[pairs[2 * i + 1]] << 4)
+        # With in_shift_right the byte reads take the top byte of each push.
+        self._sm.write_readinto(memoryview(words)[:count], memoryview(tdo)[:count])
+        if bits % 8:
+            tdo[count - 1] >>= 8 - bits % 8
+
+    def deinit(self):
+        self._sm.deinit()
@@ -0,0 +1,136 @@
+import adafruit_pioasm
+import microcontroller
+import rp2pio
+
+# Both programs take four cycles per bit. We can't invert the clock pin's
+# output in the IO controls from CircuitPython so polarity swaps the side set
+# values instead.
+CPHA0 = """
+.program spi_cpha0
+.side_set 1
+    out pins, 1         side {idle} [1]
+    in pins, 1          side {active} [1]
+"""
+
+CPHA1 = """
+.program spi_cpha1
+.side_set 1
+    out x, 1            side {idle}
+    mov pins, x         side {active} [1]
+    in pins, 1          side {idle}
+"""
+
+CYCLES_PER_BIT = 4
+# Bytes moved per write_readinto when we make up or throw away one side.
+SCRATCH_SIZE = 64
+
+_programs = {}
+
+
+def _program(polarity, phase):
+    key = (polarity, phase)
+    if key not in _programs:
+        source = CPHA1 if phase else CPHA0
+        _programs[key] = adafruit_pioasm.Program(source.format(idle=polarity, active=1 - polarity))
+    return _programs[key]
+
+
+class SPI:
+    """``busio.SPI`` compatible SPI controller running in a PIO state machine. 8 bit words only."""
+
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self._clock = clock
+        self._mosi = MOSI
+        self._miso = MISO
+        self._sm = None
+        self._locked = False
+        self._polarity = 0
+        self._phase = 0
+        self._baudrate = 100000
+        self._scratch_out = bytearray(SCRATCH_SIZE)
+        self._scratch_in = bytearray(SCRATCH_SIZE)
+        self._start()
+
+    def _start(self):
+        if self._sm:
+            self._sm.deinit()
+        program = _program(self._polarity, self._phase)
+        self._sm = rp2pio.StateMachine(
+            program.assembled,
+            frequency=self._frequency_for(self._baudrate),
+            first_out_pin=self._mosi,
+            first_in_pin=self._miso,
+            first_sideset_pin=self._clock,
+            initial_sideset_pin_state=self._polarity,
+            initial_sideset_pin_direction=1,
+            auto_pull=True,
+            pull_threshold=8,
+            out_shift_right=False,
+            auto_push=True,
+            push_threshold=8,
+            in_shift_right=False,
+            **program.pio_kwargs
+        )
+
+    def _frequency_for(self, baudrate):
+        return min(baudrate * CYCLES_PER_BIT, microcontroller.cpu.frequency)
+
+    @property
+    def frequency(self):
+        return self._sm.frequency // CYCLES_PER_BIT
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def configure(self, *, baudrate=100000, polarity=0, phase=0, bits=8):
+        if bits != 8:
+            raise ValueError("PIO SPI only supports 8 bit words")
+        self._baudrate = baudrate
+        if polarity != self._polarity or phase != self._phase:
+            self._polarity = polarity
+            self._phase = phase
+            self._start()
+        else:
+            self._sm.frequency = self._frequency_for(baudrate)
+
+    def write(self, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        view = memoryview(buffer)
+        scratch = memoryview(self._scratch_in)
+        while start < end:
+            count = min(SCRATCH_SIZE, end - start)
+            self._sm.write_readinto(view[start:start + count], scratch[:count])
+            start += count
+
+    def readinto(self, buffer, *, start=0, end=None, write_value=0):
+        if end is None:
+            end = len(buffer)
+        view = memoryview(buffer)
+        scratch = memoryview(self._scratch_out)
+        for i in range(min(SCRATCH_SIZE, end - start)):
+            scratch[i] = write_value
+        while start < end:
+            count = min(SCRATCH_SIZE, end - start)
+            self._sm.write_readinto(scratch[:count], view[start:start + count])
+            start += count
+
+    def write_readinto(self, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        if out_end - out_start != in_end - in_start:
+            raise ValueError("buffer slices must be of equal length")
+        self._sm.write_readinto(memoryview(buffer_out)[out_start:out_end], memoryview(buffer_in)[in_start:in_end])
+
+    def deinit(self):
+        if self._sm:
+            self._sm.deinit()
+            self._sm = None
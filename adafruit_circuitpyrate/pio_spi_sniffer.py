@@ -0,0 +1,213 @@
+import adafruit_pioasm
+import rp2pio
+
+from adafruit_circuitpyrate.pio_capture import gpio_number, WordStream, STREAM_WORDS
+
+# Passive SPI capture. Each bit snapshots every input pin at once with
+# `mov osr, pins` and shifts MOSI and MISO out of the copy, so the two lines
+# don't have to be next to each other. Each byte pushes a 16 bit word with the
+# lower numbered line's bit in front of the other's, 7 first.
+#
+# The clock is the jmp pin and CS is read from the same snapshot as the data,
+# nothing waits on a GPIO directly since rp2pio only allows that on pins the
+# state machine was given. Framed capture polls the clock so CS can be checked
+# while the clock is idle, which is the only time it changes. A frame end
+# pushes END, dropping a partial byte. Capture of all traffic only follows
+# the clock.
+FRAMED = """
+.program spi_sniffer
+idle:
+    mov osr, pins
+{skip_cs}
+    out x, 1
+    jmp {cs_still_active} idle
+frame:
+    mov osr, pins
+{skip_cs}
+    out x, 1
+    jmp {cs_still_inactive} frame
+    mov isr, null
+.wrap_target
+{leading_wait}
+poll:
+{poll}
+    mov osr, pins
+{skip_cs}
+    out x, 1
+    jmp {cs_still_active} poll
+    mov isr, ~null
+    push
+    jmp frame
+sample:
+{trailing_wait}
+{sample}
+.wrap
+"""
+
+ALL_TRAFFIC = """
+.program spi_sniffer_all
+.wrap_target
+{first_wait}
+{second_wait}
+{sample}
+.wrap
+"""
+
+END = 0xFFFFFFFF
+
+
+def _spread(bits):
+    # The four bits at 7, 5, 3 and 1 of each byte as a nibble.
+    table = bytearray(256)
+    for value in range(256):
+        nibble = 0
+        for i, bit in enumerate(bits):
+            if value & (1 << bit):
+                nibble |= 8 >> i
+        table[value] = nibble
+    return table
+
+
+FIRST = _spread((7, 5, 3, 1))
+SECOND = _spread((6, 4, 2, 0))
+
+
+def _wait_clock(label, level):
+    # Loops on the jmp pin until the clock is at `level`.
+    if level:
+        return f"{label}:\n    jmp pin {label}_done\n    jmp {label}\n{label}_done:"
+    return f"{label}:\n    jmp pin {label}"
+
+
+def _sample(offsets):
+    lines = ["    mov osr, pins"]
+    position = 0
+    for offset in offsets:
+        if offset > position:
+            lines.append(f"    out null, {offset - position}")
+        lines.append("    in osr, 1")
+        position = offset
+    return "\n".join(lines)
+
+
+class SPISniffer:
+    """Captures SPI traffic without driving anything, frames by CS when given one.
+
+    ``poll()`` decodes what came in to a FrameBuffer with the time it was
+    collected.
+    """
+
+    def __init__(self, clock, mosi, miso, cs=None, *, polarity=0, phase=0, cs_active=0):
+        numbers = {"mosi": gpio_number(mosi), "miso": gpio_number(miso)}
+        lines = sorted(numbers, key=numbers.get)
+        self._mosi_first = lines[0] == "mosi"
+        base = numbers[lines[0]]
+        first_in_pin = mosi if self._mosi_first else miso
+        idle = polarity
+        active = 1 - polarity
+        if cs is not None:
+            cs_number = gpio_number(cs)
+            if cs_number < base:
+                base = cs_number
+                first_in_pin = cs
+            sample = _sample([numbers[line] - base for line in lines])
+            if polarity:
+                poll = "    jmp pin check\n    jmp sample\ncheck:"
+            else:
+                poll = "    jmp pin sample"
+            skip_cs = f"    out null, {cs_number - base}" if cs_number > base else ""
+            source = FRAMED.format(
+                leading_wait="" if phase else _wait_clock("leading", idle),
+                trailing_wait=_wait_clock("trailing", idle) if phase else "",
+                poll=poll,
+                skip_cs=skip_cs,
+                cs_still_active="x--" if cs_active else "!x",
+                cs_still_inactive="!x" if cs_active else "x--",
+                sample=sample,
+            )
+        else:
+            sample = _sample([numbers[line] - base for line in lines])
+            source = ALL_TRAFFIC.format(
+                first_wait=_wait_clock("first", active if phase else idle),
+                second_wait=_wait_clock("second", idle if phase else active),
+                sample=sample,
+            )
+        self.framed = cs is not None
+        program = adafruit_pioasm.Program(source)
+        sm = rp2pio.StateMachine(
+            program.assembled,
+            frequency=0,
+            first_in_pin=first_in_pin,
+            jmp_pin=clock,
+            auto_push=True,
+            push_threshold=16,
+            in_shift_right=False,
+            out_shift_right=True,
+            **program.pio_kwargs
+        )
+        self._stream = WordStream(sm)
+        # The frame so far, MOSI then MISO.
+        self._mosi = bytearray(STREAM_WORDS)
+        self._miso = bytearray(STREAM_WORDS)
+        self._record = bytearray(2 * STREAM_WORDS)
+        self._length = 0
+        self._frames = None
+        # After lost words the rest of that frame is skipped up to its END.
+        self._skipping = False
+
+    def _emit(self, frames):
+        length = self._length
+        if not length:
+            return
+        record = self._record
+        record[:length] = memoryview(self._mosi)[:length]
+        record[length:2 * length] = memoryview(self._miso)[:length]
+        frames.add(record, 2 * length)
+        self._length = 0
+
+    def _decode(self, words, count):
+        frames = self._frames
+        mosi = self._mosi
+        miso = self._miso
+        mosi_first = self._mosi_first
+        for i in range(count):
+            word = words[i]
+            if word == END:
+                if self._skipping:
+                    self._skipping = False
+                else:
+                    self._emit(frames)
+                continue
+            if self._skipping:
+                continue
+            high = word >> 8
+            low = word & 0xFF
+            first = (FIRST[high] << 4) | FIRST[low]
+            second = (SECOND[high] << 4) | SECOND[low]
+            if self._length == len(mosi):
+                # Longer than we can hold, pass it on in pieces.
+                self._emit(frames)
+            if mosi_first:
+                mosi[self._length] = first
+                miso[self._length] = second
+            else:
+                mosi[self._length] = second
+                miso[self._length] = first
+            self._length += 1
+
+    def _lost(self, buffers):
+        # The frame in progress is missing bytes, drop it with the lost words.
+        self._length = 0
+        self._skipping = self.framed
+        self._frames.dropped += buffers
+
+    def poll(self, frames):
+        """Decode everything captured so far into `frames`."""
+        self._frames = frames
+        self._stream.poll(self._decode, self._lost)
+        if not self.framed:
+            # Nothing ends a frame so each collection is one.
+            self._emit(frames)
+
+    def deinit(self):
+        self._stream.deinit()
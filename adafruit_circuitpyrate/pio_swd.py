@@ -0,0 +1,98 @@
+import array
+
+import adafruit_pioasm
+import microcontroller
+import rp2pio
+
+# Work comes as a header word then, for writes, a data word. The header is
+# | 31:2 bit count - 1 | 1 write | 0 SWDIO pindir | and up to 32 bits are shifted
+# LSB first. Writes change SWDIO with the clock low and the target samples on the
+# rising edge. Reads sample on the rising edge and push whatever they got, so a
+# read of n bits comes back in the top n bits.
+PROGRAM = adafruit_pioasm.Program(
+    """
+.program swd
+.side_set 1 opt
+top:
+    pull                side 0
+    out pindirs, 1
+    out y, 1
+    out x, 30
+    jmp !y read_bit
+    pull
+write_bit:
+    out pins, 1         side 0
+    jmp x-- write_bit   side 1
+    jmp top
+read_bit:
+    in pins, 1          side 1
+    jmp x-- read_bit    side 0
+    push
+    jmp top
+"""
+)
+
+CYCLES_PER_BIT = 2
+WRITE = 0b11
+
+
+class Wire:
+    """Queues SWD bit runs and clocks them all in one go in a PIO state machine."""
+
+    def __init__(self, swclk, swdio, *, frequency=1000000):
+        self._sm = rp2pio.StateMachine(
+            PROGRAM.assembled,
+            frequency=self._frequency_for(frequency),
+            first_out_pin=swdio,
+            initial_out_pin_state=1,
+            initial_out_pin_direction=1,
+            first_in_pin=swdio,
+            first_sideset_pin=swclk,
+            initial_sideset_pin_state=0,
+            initial_sideset_pin_direction=1,
+            out_shift_right=True,
+            in_shift_right=True,
+            **PROGRAM.pio_kwargs
+        )
+        self._words = array.array("L")
+        self._shifts = bytearray()
+        self._replies = array.array("L", [0] * 64)
+
+    def _frequency_for(self, frequency):
+        return min(frequency * CYCLES_PER_BIT, microcontroller.cpu.frequency)
+
+    @property
+    def frequency(self):
+        return self._sm.frequency // CYCLES_PER_BIT
+
+    @frequency.setter
+    def frequency(self, frequency):
+        self._sm.frequency = self._frequency_for(frequency)
+
+    def write(self, value, bits):
+        self._words.append(((bits - 1) << 2) | WRITE)
+        self._words.append(value)
+
+    def read(self, bits):
+        self._words.append((bits - 1) << 2)
+        self._shifts.append(32 - bits)
+
+    def run(self):
+        """Clock everything queued and return what each read saw, right aligned."""
+        count = len(self._shifts)
+        if not count:
+            self._sm.write(self._words)
+            self._words = array.array("L")
+            return ()
+        if len(self._replies) < count:
+            self._replies = array.array("L", [0] * count)
+        replies = memoryview(self._replies)[:count]
+        self._sm.write_readinto(self._words, replies)
+        for i in range(count):
+            replies[i] >>= self._shifts[i]
+        self._words = array.array("L")
+        self._shifts = bytearray()
+        return replies
+
+    def deinit(self):
+        self._sm.deinit()
@@ -0,0 +1,89 @@
+import time
+
+# Readings per rail averaged for the level glitches are measured from.
+BASELINE_SAMPLES = 16
+# Glitches kept between summaries, the rest are only counted.
+MAX_EVENTS = 16
+SUMMARY_NS = 1000000000
+
+
+class Rail:
+    """Running statistics for one supply, kept in raw ADC counts."""
+
+    def __init__(self, name, adc):
+        self.name = name
+        self.adc = adc
+        # The Pyrate measures every rail through a halving divider.
+        self.scale = adc.reference_voltage * 2 / 65535
+        self.minimum = 65535
+        self.maximum = 0
+        self.total = 0
+        self.count = 0
+        self.glitches = 0
+        self.baseline = 0
+        self.window = 0
+
+    def volts(self, value):
+        return value * self.scale
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+
+class PowerMonitor:
+    """Samples rails round-robin as fast as AnalogIn allows.
+
+    Each reading updates its rail's min, max and mean. A reading further than
+    `tolerance` volts from where the rail sat when monitoring started is a
+    glitch and is kept with the time it happened.
+    """
+
+    def __init__(self, rails, tolerance):
+        self.rails = [Rail(name, adc) for name, adc in rails]
+        self.events = []
+        self.missed = 0
+        self.start = time.monotonic_ns()
+        for rail in self.rails:
+            total = 0
+            for _ in range(BASELINE_SAMPLES):
+                total += rail.adc.value
+            rail.baseline = total // BASELINE_SAMPLES
+            rail.window = int(tolerance / rail.scale)
+
+    def sample(self, rounds=64):
+        for _ in range(rounds):
+            for rail in self.rails:
+                value = rail.adc.value
+                if value < rail.minimum:
+                    rail.minimum = value
+                if value > rail.maximum:
+                    rail.maximum = value
+                rail.total += value
+                rail.count += 1
+                if abs(value - rail.baseline) > rail.window:
+                    rail.glitches += 1
+                    if len(self.events) < MAX_EVENTS:
+                        self.events.append((time.monotonic_ns(), rail, value))
+                    else:
+                        self.missed += 1
+
+    def summary(self):
+        """Lines describing every rail so far and the glitches since last time."""
+        elapsed = (time.monotonic_ns() - self.start) / 1e9
+        samples = sum(rail.count for rail in self.rails)
+        lines = [f"{elapsed:.1f}s, {samples / elapsed if elapsed else 0:.0f} samples/s"]
+        for rail in self.rails:
+            if not rail.count:
+                lines.append(f"{rail.name:5} no readings")
+                continue
+            lines.append(
+                f"{rail.name:5} min {rail.volts(rail.minimum):1.3f}V  max {rail.volts(rail.maximum):1.3f}V  "
+                f"mean {rail.volts(rail.mean()):1.3f}V  glitches {rail.glitches}"
+            )
+        for timestamp, rail, value in self.events:
+            lines.append(f"  {(timestamp - self.start) / 1e9:.6f}s {rail.name} {rail.volts(value):1.3f}V")
+        if self.missed:
+            lines.append(f"  and {self.missed} more")
+        self.events = []
+        self.missed = 0
+        return lines
@@ -0,0 +1,246 @@
+from adafruit_circuitpyrate import Mode, BusWrite, BusRead, BusClockTick, BusBitRead
+
+import digitalio
+import microcontroller
+
+SPEEDS = ("~5KHz", "~50KHz", "~100KHz", "~400KHz")
+# Half clock periods in microseconds. The fastest just runs as fast as the pins toggle.
+HALF_PERIODS_US = (100, 10, 5, 0)
+
+
+class RawWireBus:
+    """Bit banged raw 2-wire or 3-wire bus. Data is MOSI, and with a MISO pin
+    reads come from there instead of the data line."""
+
+    def __init__(self, clock, data, miso=None, *, open_drain=True, lsb=False, speed=len(SPEEDS) - 1):
+        self._clock = digitalio.DigitalInOut(clock)
+        self._data = digitalio.DigitalInOut(data)
+        self._miso = None
+        if miso is not None:
+            self._miso = digitalio.DigitalInOut(miso)
+            self._miso.switch_to_input()
+        self.open_drain = open_drain
+        self.lsb = lsb
+        self.speed = speed
+        self._set(self._clock, False)
+        self._set(self._data, False)
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed):
+        self._speed = speed
+        self._delay = HALF_PERIODS_US[speed]
+
+    def _set(self, pin, value):
+        # Open drain lets the line float high on the pull-ups.
+        if value and self.open_drain:
+            pin.switch_to_input()
+        else:
+            pin.switch_to_output(value=value)
+
+    def _wait(self):
+        if self._delay:
+            microcontroller.delay_us(self._delay)
+
+    def _release(self):
+        # Let the other side drive the data line before a 2-wire read.
+        if self._miso is None:
+            self._data.switch_to_input()
+
+    def _input(self):
+        return (self._miso or self._data).value
+
+    def clock(self, value):
+        self._set(self._clock, value)
+
+    def data(self, value):
+        self._set(self._data, value)
+
+    def read_pin(self):
+        self._release()
+        return 1 if self._input() else 0
+
+    def clock_tick(self, count=1):
+        clock = self._clock
+        for _ in range(count):
+            self._set(clock, True)
+            self._wait()
+            self._set(clock, False)
+            self._wait()
+
+    def read_bit(self):
+        self._release()
+        self._set(self._clock, True)
+        self._wait()
+        bit = 1 if self._input() else 0
+        self._set(self._clock, False)
+        self._wait()
+        return bit
+
+    def start(self):
+        # I2C style, data falls while the clock is high.
+        self._set(self._data, True)
+        self._set(self._clock, True)
+        self._wait()
+        self._set(self._data, False)
+        self._wait()
+        self._set(self._clock, False)
+        self._wait()
+
+    def stop(self):
+        self._set(self._data, False)
+        self._set(self._clock, True)
+        self._wait()
+        self._set(self._data, True)
+        self._wait()
+
+    def write_bits(self, value, bits=8):
+        """Clock out the low `bits` of value in the bus bit order and return what
+        was read back at the same time."""
+        clock = self._clock
+        data = self._data
+        result = 0
+        for i in range(bits):
+            shift = i if self.lsb else bits - 1 - i
+            self._set(data, (value >> shift) & 1)
+            self._set(clock, True)
+            self._wait()
+            if self._input():
+                result |= 1 << shift
+            self._set(clock, False)
+            self._wait()
+        return result
+
+    def read_bits(self, bits=8):
+        clock = self._clock
+        self._release()
+        result = 0
+        for i in range(bits):
+            shift = i if self.lsb else bits - 1 - i
+            self._set(clock, True)
+            self._wait()
+            if self._input():
+                result |= 1 << shift
+            self._set(clock, False)
+            self._wait()
+        return result
+
+    def write_readinto(self, buffer_out, buffer_in, count):
+        for i in range(count):
+            buffer_in[i] = self.write_bits(buffer_out[i])
+
+    def deinit(self):
+        self._clock.deinit()
+        self._data.deinit()
+        if self._miso is not None:
+            self._miso.deinit()
+
+
+class RawWire(Mode):
+    """Shared interactive raw-wire mode, see mode_2wire and mode_3wire."""
+
+    three_wire = False
+
+    def __init__(self, pins, input, output):
+        super().__init__(input, output)
+
+        speed = self._select_option("Set speed:", SPEEDS)
+        open_drain = self._select_option("Select output type:", ["Open drain (H=Hi-Z, L=GND) *default", "Normal (H=3.3V, L=GND)"]) == 0
+
+        miso = pins["miso"] if self.three_wire else None
+        self.bus = RawWireBus(pins["clock"], pins["mosi"], miso, open_drain=open_drain, speed=speed)
+        # CS selects on 3-wire buses, active low, and is RST for smart cards on 2-wire.
+        self.cs = digitalio.DigitalInOut(pins["cs"])
+        self.cs.switch_to_output(self.three_wire)
+
+        self.pull_ok = open_drain
+
+    @property
+    def lsb(self):
+        return self.bus.lsb if hasattr(self, "bus") else False
+
+    @lsb.setter
+    def lsb(self, lsb):
+        if hasattr(self, "bus"):
+            self.bus.lsb = lsb
+
+    def deinit(self):
+        self.bus.deinit()
+        self.cs.deinit()
+
+    def print_status(self):
+        order = "LSB" if self.bus.lsb else "MSB"
+        output = "open drain" if self.bus.open_drain else "normal"
+        self._print(f"Raw {self.name} at {SPEEDS[self.bus.speed]}, {output} outputs, {order} first")
+
+    def print_pin_functions(self):
+        if self.three_wire:
+            self._print("CLK     MOSI    CS      MISO")
+        else:
+            self._print("CLK     SDA     RST     -")
+
+    def print_pin_directions(self):
+        self._print("O       O       O       I")
+
+    def _start(self):
+        if self.three_wire:
+            self.cs.value = False
+            self._print("CS ENABLED")
+        else:
+            self.bus.start()
+            self._print("I2C START BIT")
+
+    def _stop(self):
+        if self.three_wire:
+            self.cs.value = True
+            self._print("CS DISABLED")
+        else:
+            self.bus.stop()
+            self._print("I2C STOP BIT")
+
+    def run_sequence(self, sequence):
+        bus = self.bus
+        for action in sequence:
+            if action == "START":
+                self._start()
+            elif action == "STOP":
+                self._stop()
+            elif isinstance(action, BusWrite):
+                read_back = []
+                self._print("WRITE:", end="")
+                for _ in range(action.repeat):
+                    read_back.append(bus.write_bits(action.value, action.bits))
+                    self._print(f" 0x{action.value:02X}", end="")
+                self._print()
+                if self.three_wire:
+                    self._print("READ:", " ".join(f"0x{b:02X}" for b in read_back))
+            elif isinstance(action, BusRead):
+                self._print("READ:", end="")
+                for _ in range(action.repeat):
+                    self._print(f" 0x{bus.read_bits(action.bits):02X}", end="")
+                self._print()
+            elif isinstance(action, BusClockTick):
+                bus.clock_tick(action.repeat)
+                self._print(f"CLOCK TICKS: 0x{action.repeat:02X}")
+            elif isinstance(action, BusBitRead):
+                self._print("READ BIT:", end="")
+                for _ in range(action.repeat):
+                    self._print(f" {bus.read_bit()}", end="")
+                self._print()
+            elif action == "CLOCK_HIGH":
+                bus.clock(True)
+                self._print("CLOCK, 1")
+            elif action == "CLOCK_LOW":
+                bus.clock(False)
+                self._print("CLOCK, 0")
+            elif action == "DATA_HIGH":
+                bus.data(True)
+                self._print("DATA OUTPUT, 1")
+            elif action == "DATA_LOW":
+                bus.data(False)
+                self._print("DATA OUTPUT, 0")
+            elif action == "READ_PIN":
+                self._print(f"DATA INPUT, STATE: {bus.read_pin()}")
@@ -0,0 +1,80 @@
+class RingBuffer:
+    """Fixed size byte FIFO that streams read into and write out of without copying.
+
+    Bytes that don't fit are dropped and ``overflowed`` is set so callers can
+    report the loss instead of silently reordering or truncating.
+    """
+
+    def __init__(self, size):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._size = size
+        self._start = 0
+        self._count = 0
+        self.overflowed = False
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def free(self):
+        return self._size - self._count
+
+    def _free_region(self):
+        if self._count == 0:
+            self._start = 0
+        end = self._start + self._count
+        if end >= self._size:
+            return self._view[end - self._size:self._start]
+        return self._view[end:]
+
+    def readfrom(self, stream):
+        """Read as much as ``stream.readinto`` has available. Returns the byte count."""
+        total = 0
+        while self._count < self._size:
+            region = self._free_region()
+            n = stream.readinto(region)
+            if not n:
+                break
+            self._count += n
+            total += n
+            if n < len(region):
+                break
+        return total
+
+    def write(self, data):
+        n = len(data)
+        if n > self.free:
+            self.overflowed = True
+            n = self.free
+        written = 0
+        while written < n:
+            region = self._free_region()
+            chunk = min(len(region), n - written)
+            region[:chunk] = data[written:written + chunk]
+            self._count += chunk
+            written += chunk
+        return n
+
+    def chunks(self, n=None):
+        """The first ``n`` (default all) buffered bytes as at most two memoryviews."""
+        if n is None or n > self._count:
+            n = self._count
+        first = min(n, self._size - self._start)
+        if first == n:
+            return (self._view[self._start:self._start + n],)
+        return (self._view[self._start:], self._view[:n - first])
+
+    def consume(self, n):
+        n = min(n, self._count)
+        self._start = (self._start + n) % self._size
+        self._count -= n
+
+    def writeto(self, stream, n=None):
+        """Write the first ``n`` (default all) buffered bytes to ``stream`` and drop them."""
+        total = 0
+        for chunk in self.chunks(n):
+            stream.write(chunk)
+            total += len(chunk)
+        self.consume(total)
+        return total
@@ -0,0 +1,66 @@
+import struct
+import time
+
+from adafruit_circuitpyrate.ringbuffer import RingBuffer
+
+# Every frame is stored as a big endian microsecond timestamp, a length and then
+# its bytes. Binary modes send frames exactly like this.
+HEADER = ">IH"
+HEADER_SIZE = 6
+# Sent after the last frame when a binary sniffer stops.
+END = b"\xff" * HEADER_SIZE
+BUFFER_SIZE = 8192
+
+
+def timestamp_us():
+    return (time.monotonic_ns() // 1000) & 0xFFFFFFFF
+
+
+class FrameBuffer:
+    """Sniffed frames kept in a RingBuffer until they're printed or sent.
+
+    A frame that doesn't fit is dropped whole and counted in ``dropped`` so
+    slow output never leaves a partial frame behind.
+    """
+
+    def __init__(self, size):
+        self._ring = RingBuffer(size)
+        self._header = bytearray(HEADER_SIZE)
+        self.frames = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._ring)
+
+    def add(self, data, length, timestamp=None):
+        if HEADER_SIZE + length > self._ring.free:
+            self.dropped += 1
+            return False
+        if timestamp is None:
+            timestamp = timestamp_us()
+        struct.pack_into(HEADER, self._header, 0, timestamp, length)
+        self._ring.write(self._header)
+        self._ring.write(memoryview(data)[:length])
+        self.frames += 1
+        return True
+
+    def _take(self, destination, count):
+        copied = 0
+        for chunk in self._ring.chunks(count):
+            destination[copied:copied + len(chunk)] = chunk
+            copied += len(chunk)
+        self._ring.consume(count)
+
+    def pop(self, into):
+        """Move the oldest frame's bytes into `into` and return its timestamp and
+        length, or None when there aren't any."""
+        if not len(self._ring):
+            return None
+        self._take(self._header, HEADER_SIZE)
+        timestamp, length = struct.unpack(HEADER, self._header)
+        self._take(memoryview(into), length)
+        return timestamp, length
+
+    def writeto(self, stream):
+        """Send every buffered frame, headers and all."""
+        return self._ring.writeto(stream)
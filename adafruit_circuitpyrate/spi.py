@@ -1,9 +1,10 @@
 from adafruit_circuitpyrate import Mode, BusWrite, BusRead
 import adafruit_prompt_toolkit as prompt_toolkit
 
+from adafruit_circuitpyrate import engines
+from adafruit_circuitpyrate.sniffer import FrameBuffer, BUFFER_SIZE
+
 import array
-import busio
-import bitbangio
 import digitalio
  
 SPEEDS = (30, 125, 250, 1000)
@@ -23,27 +24,72 @@ class SPI(Mode):
         self.cs_idle = self._select_option("CS:", ["CS", "/CS *default"], default=1) == 1
         # No support for open drain SPI.
 
-        try:
-            print("native SPI")
-            self.spi = busio.SPI(pins["clock"], pins["mosi"], pins["miso"])
-        except ValueError as e:
-            print("bitbang SPI", repr(e))
-            self.spi = bitbangio.SPI(pins["clock"], pins["mosi"], pins["miso"])
-
-        self.cs = digitalio.DigitalInOut(pins["cs"])
-        self.cs.switch_to_output(self.cs_idle)
+        self.pins = pins
+        self._claim_bus()
 
         self.macros = {
-            # No CP API. 1: ("Sniff CS low", self.sniff)
-            # No CP API. 2: ("Sniff all traffic", self.sniff)
+            1: ("Sniff CS low", self.sniff_cs),
+            2: ("Sniff all traffic", self.sniff_all),
         }
 
         self.pull_ok = True
 
+    def _claim_bus(self):
+        pins = self.pins
+        self.spi, self.engine = engines.spi(pins["clock"], pins["mosi"], pins["miso"])
+
+        self.cs = digitalio.DigitalInOut(pins["cs"])
+        self.cs.switch_to_output(self.cs_idle)
+
     def deinit(self):
         self.spi.deinit()
         self.cs.deinit()
 
+    def sniff_cs(self):
+        self._sniff(framed=True)
+
+    def sniff_all(self):
+        self._sniff(framed=False)
+
+    def _sniff(self, framed):
+        try:
+            from adafruit_circuitpyrate import pio_spi_sniffer
+        except ImportError:
+            self._print("No sniffer on this board")
+            return
+        # Only listen, someone else drives the bus.
+        self.deinit()
+        pins = self.pins
+        sniffer = pio_spi_sniffer.SPISniffer(
+            pins["clock"],
+            pins["mosi"],
+            pins["miso"],
+            pins["cs"] if framed else None,
+            polarity=self.polarity,
+            phase=self.phase,
+            cs_active=0 if self.cs_idle else 1,
+        )
+        frames = FrameBuffer(BUFFER_SIZE)
+        frame = bytearray(BUFFER_SIZE)
+        self._print("SPI bus sniffer, any key exits")
+        while not self._input.in_waiting:
+            sniffer.poll(frames)
+            while len(frames):
+                _, length = frames.pop(frame)
+                count = length // 2
+                pairs = "".join(f"0x{frame[i]:02X}(0x{frame[count + i]:02X})" for i in range(count))
+                if framed:
+                    pairs = "[" + pairs + "]"
+                self._print(pairs)
+        self._input.read(1)
+        sniffer.deinit()
+        if frames.dropped:
+            self._print(f"Dropped {frames.dropped} frames")
+        self._claim_bus()
+
+    def print_status(self):
+        self._print(f"SPI engine: {self.engine}")
+
     def print_pin_functions(self):
         self._print("CLK     MOSI    CS      MISO")
 
@@ -0,0 +1,156 @@
+# SUMP logic analyzer protocol with the Openbench Logic Sniffer extensions,
+# which sigrok's "ols" driver and PulseView speak. Documented here:
+# http://dangerousprototypes.com/docs/The_Logic_Sniffer%27s_extended_SUMP_protocol
+import struct
+
+import microcontroller
+
+from adafruit_circuitpyrate import pio_capture
+
+# Channel order matches the bitbang pin bits.
+CHANNELS = ("cs", "miso", "clock", "mosi", "aux")
+
+# Dividers are relative to the original SUMP's 100MHz clock.
+CLOCK = 100000000
+MAX_SAMPLES = 16384
+# When a trigger has to be searched for after the fact, up to twice the samples
+# asked for are captured but in no more than this many words. At 32 bit
+# samples that leaves no room for extra and only the requested window is searched.
+SEARCH_WORDS = 8192
+
+CMD_RESET = 0x00
+CMD_RUN = 0x01
+CMD_ID = 0x02
+CMD_METADATA = 0x04
+CMD_XON = 0x11
+CMD_XOFF = 0x13
+CMD_DIVIDER = 0x80
+CMD_COUNTS = 0x81
+CMD_FLAGS = 0x82
+CMD_TRIGGER_MASK = 0xC0
+CMD_TRIGGER_VALUE = 0xC1
+
+# Channel group disables, one per byte of a sample.
+FLAG_GROUPS = 0x3C
+
+def _max_rate():
+    return microcontroller.cpu.frequency // 2
+
+def _metadata():
+    out = bytearray()
+    for key, value in ((0x01, "Pyrate"), (0x02, "1.0")):
+        out.append(key)
+        out.extend(value.encode())
+        out.append(0)
+    out.extend(struct.pack(">BI", 0x21, MAX_SAMPLES))
+    out.extend(struct.pack(">BI", 0x23, _max_rate()))
+    out.extend(bytes((0x40, len(CHANNELS), 0x41, 2, 0x00)))
+    return out
+
+def _find_trigger(capture, words, first, last, mask, value):
+    for index in range(first, last):
+        if capture.channels(words, index) & mask == value:
+            return index
+    return None
+
+def _send(serial_output, capture, words, start, count, groups):
+    # Newest sample first, one byte per enabled group. Only the first group has
+    # channels in it.
+    chunk = bytearray(256 * groups)
+    used = 0
+    for index in range(start + count - 1, start - 1, -1):
+        chunk[used] = capture.channels(words, index)
+        used += groups
+        if used == len(chunk):
+            serial_output.write(chunk)
+            used = 0
+    if used:
+        serial_output.write(memoryview(chunk)[:used])
+
+def _run_capture(serial_input, serial_output, capture, settings):
+    frequency = min(CLOCK // (settings["divider"] + 1), _max_rate())
+    read_count = min(settings["read_count"], MAX_SAMPLES)
+    after = min(settings["delay_count"], read_count)
+    before = read_count - after
+    mask = settings["mask"] & ((1 << len(CHANNELS)) - 1)
+    value = settings["value"] & mask
+    groups = max(1, 4 - bin(settings["flags"] & FLAG_GROUPS).count("1"))
+    cancel = lambda: serial_input.in_waiting > 0
+
+    if mask and before == 0 and mask & (mask - 1) == 0:
+        # One channel and nothing from before it, the state machine waits.
+        channel = 0
+        while mask >> channel != 1:
+            channel += 1
+        words = pio_capture.sample_buffer(read_count, capture.per_word)
+        if not capture.capture(words, frequency, (channel, 1 if value else 0), cancel):
+            return
+        start = 0
+    elif mask:
+        # Capture extra and look for the trigger afterwards. Without a match
+        # it's treated as having fired at the first sample it could.
+        total = max(read_count, min(2 * read_count, SEARCH_WORDS * capture.per_word))
+        words = pio_capture.sample_buffer(total, capture.per_word)
+        if not capture.capture(words, frequency, cancel=cancel):
+            return
+        found = _find_trigger(capture, words, before, total - after + 1, mask, value)
+        start = (before if found is None else found) - before
+    else:
+        words = pio_capture.sample_buffer(read_count, capture.per_word)
+        if not capture.capture(words, frequency, cancel=cancel):
+            return
+        start = 0
+    _send(serial_output, capture, words, start, read_count, groups)
+
+def run(serial_input, serial_output, pyrate):
+    serial_output.write(b"1ALS")
+    pins = pyrate.pins
+    capture = pio_capture.Capture([pins[name] for name in CHANNELS])
+    settings = {
+        "divider": 0,
+        "read_count": MAX_SAMPLES,
+        "delay_count": MAX_SAMPLES,
+        "flags": 0,
+        "mask": 0,
+        "value": 0,
+    }
+    data = bytearray(4)
+    stats = pyrate.stats
+    while True:
+        command = serial_input.read(1)[0]
+        stats.command()
+        if command & 0x80:
+            received = 0
+            while received < len(data):
+                received += serial_input.readinto(memoryview(data)[received:]) or 0
+            argument = struct.unpack("<I", data)[0]
+            if command == CMD_DIVIDER:
+                settings["divider"] = argument & 0xFFFFFF
+            elif command == CMD_COUNTS:
+                settings["read_count"] = ((argument & 0xFFFF) + 1) * 4
+                settings["delay_count"] = ((argument >> 16) + 1) * 4
+            elif command == CMD_FLAGS:
+                settings["flags"] = argument
+            elif command == CMD_TRIGGER_MASK:
+                settings["mask"] = argument
+            elif command == CMD_TRIGGER_VALUE:
+                settings["value"] = argument
+            # Other long commands are trigger stages 1-3 and the stage 0
+            # config, which only ever starts the capture here.
+        elif command == CMD_RESET or command == CMD_XON or command == CMD_XOFF:
+            pass
+        elif command == CMD_RUN:
+            start = stats.begin()
+            try:
+                _run_capture(serial_input, serial_output, capture, settings)
+            except (MemoryError, RuntimeError, ValueError) as e:
+                # SUMP has no way to report an error, the client times out.
+                print("Capture failed:", e)
+            stats.end("bus", start, settings["read_count"])
+        elif command == CMD_ID:
+            serial_output.write(b"1ALS")
+        elif command == CMD_METADATA:
+            serial_output.write(_metadata())
+        else:
+            # Anything else came from a terminal, go back to it.
+            return
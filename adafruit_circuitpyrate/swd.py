@@ -0,0 +1,356 @@
+import struct
+
+import digitalio
+
+# ACKs as the target sends them plus our own codes for what went wrong on our side.
+OK = 0x1
+WAIT = 0x2
+FAULT = 0x4
+NO_RESPONSE = 0x7
+PARITY_ERROR = 0x8
+# A memory command asked for more words than binary mode buffers.
+TOO_LONG = 0x10
+
+# Debug port registers, by A[3:2].
+DPIDR = 0x0
+ABORT = 0x0
+CTRL_STAT = 0x4
+SELECT = 0x8
+RDBUFF = 0xC
+
+# MEM-AP registers in bank 0.
+CSW = 0x0
+TAR = 0x4
+DRW = 0xC
+
+CSYSPWRUPACK = 1 << 31
+CSYSPWRUPREQ = 1 << 30
+CDBGPWRUPACK = 1 << 29
+CDBGPWRUPREQ = 1 << 28
+STICKYERR = 1 << 5
+STICKYORUN = 1 << 1
+ORUNDETECT = 1 << 0
+ORUNERRCLR = 1 << 4
+CLEAR_ERRORS = 0x1E
+
+# 32 bit accesses that increment the address, privileged data.
+CSW_WORD = 0x23000012
+# TAR only has to increment within a 1 KB block.
+TAR_WRAP = 1024
+# Bounds on how many transfers get queued before looking at the ACKs.
+MIN_BURST = 4
+MAX_BURST = TAR_WRAP // 4
+
+RETRIES = 100
+JTAG_TO_SWD = 0xE79E
+
+
+def _parity(value):
+    value ^= value >> 16
+    value ^= value >> 8
+    value ^= value >> 4
+    return (0x6996 >> (value & 0xF)) & 1
+
+
+def _request(ap, read, address):
+    bits = ap | (read << 1) | (address & 0xC)
+    # Start, the fields, their parity, stop and park.
+    return 0x81 | (bits << 1) | (_parity(bits) << 5)
+
+
+# Every request byte by APnDP | RnW << 1 | A[3:2].
+REQUESTS = bytes(_request(i & 1, (i >> 1) & 1, i & 0xC) for i in range(16))
+DRW_WRITE = REQUESTS[1 | DRW]
+DRW_READ = REQUESTS[1 | 2 | DRW]
+RDBUFF_READ = REQUESTS[2 | RDBUFF]
+
+
+def _word(buffer, offset):
+    return buffer[offset] | (buffer[offset + 1] << 8) | (buffer[offset + 2] << 16) | (buffer[offset + 3] << 24)
+
+
+def _store(buffer, offset, value):
+    buffer[offset] = value & 0xFF
+    buffer[offset + 1] = (value >> 8) & 0xFF
+    buffer[offset + 2] = (value >> 16) & 0xFF
+    buffer[offset + 3] = value >> 24
+
+
+class Wire:
+    """Bit banged stand in for ``pio_swd.Wire``. Runs bits as they're queued."""
+
+    def __init__(self, swclk, swdio, *, frequency=1000000):
+        self._swclk = digitalio.DigitalInOut(swclk)
+        self._swclk.switch_to_output(value=False)
+        self._swdio = digitalio.DigitalInOut(swdio)
+        self._swdio.switch_to_output(value=True)
+        self._replies = []
+        self.frequency = frequency
+
+    def write(self, value, bits):
+        swclk = self._swclk
+        swdio = self._swdio
+        swdio.switch_to_output(value=bool(value & 1))
+        for i in range(bits):
+            swdio.value = bool((value >> i) & 1)
+            swclk.value = True
+            swclk.value = False
+
+    def read(self, bits):
+        swclk = self._swclk
+        swdio = self._swdio
+        swdio.switch_to_input()
+        value = 0
+        for i in range(bits):
+            if swdio.value:
+                value |= 1 << i
+            swclk.value = True
+            swclk.value = False
+        self._replies.append(value)
+
+    def run(self):
+        replies = self._replies
+        self._replies = []
+        return replies
+
+    def deinit(self):
+        self._swclk.deinit()
+        self._swdio.deinit()
+
+
+class DebugPort:
+    """ARM SWD debug port and MEM-AP 0 on top of a wire.
+
+    Single register accesses wait for each ACK. Memory blocks are queued whole
+    with overrun detection on, so the target always clocks a data phase and a
+    WAIT or FAULT part way through gets sorted out after the run.
+    """
+
+    def __init__(self, wire):
+        self.wire = wire
+        self._overrun_detect = False
+        self._select = None
+        self._csw = None
+        self._burst = MAX_BURST
+
+    def connect(self):
+        """Switch the target from JTAG to SWD, read DPIDR and power up debug."""
+        wire = self.wire
+        self._overrun_detect = False
+        self._select = None
+        self._csw = None
+        for _ in range(2):
+            wire.write(0xFFFFFFFF, 32)
+        wire.write(JTAG_TO_SWD, 16)
+        for _ in range(2):
+            wire.write(0xFFFFFFFF, 32)
+        wire.write(0, 8)
+        wire.run()
+        status, idcode = self.read(0, DPIDR)
+        if status != OK:
+            return status, 0
+        self.write(0, ABORT, CLEAR_ERRORS)
+        status = self.write(0, CTRL_STAT, CSYSPWRUPREQ | CDBGPWRUPREQ | ORUNDETECT)
+        if status != OK:
+            return status, idcode
+        self._overrun_detect = True
+        for _ in range(RETRIES):
+            status, value = self.read(0, CTRL_STAT)
+            if status != OK or (value & (CSYSPWRUPACK | CDBGPWRUPACK)) == CSYSPWRUPACK | CDBGPWRUPACK:
+                break
+        return status, idcode
+
+    def _transfer(self, request, value=0):
+        wire = self.wire
+        read = request & 0x04
+        for _ in range(RETRIES):
+            wire.write(request, 8)
+            # Turnaround and ACK, plus the turnaround back for writes.
+            wire.read(4 if read else 5)
+            ack = (wire.run()[0] >> 1) & 0x7
+            if ack == OK:
+                break
+            # With overrun detection the data phase happens regardless.
+            if self._overrun_detect:
+                if read:
+                    wire.read(32)
+                    wire.read(2)
+                else:
+                    wire.write(0, 32)
+                    wire.write(0, 1)
+            elif read:
+                wire.read(1)
+            wire.run()
+            if ack != WAIT:
+                return ack, 0
+            if self._overrun_detect:
+                # The WAIT set STICKYORUN and everything would FAULT until it's cleared.
+                self._transfer(REQUESTS[ABORT], ORUNERRCLR)
+        else:
+            return WAIT, 0
+        if read:
+            wire.read(32)
+            wire.read(2)
+            replies = wire.run()
+            value = replies[0]
+            if (replies[1] & 1) != _parity(value):
+                return PARITY_ERROR, 0
+            return OK, value
+        wire.write(value, 32)
+        wire.write(_parity(value), 1)
+        wire.run()
+        return OK, 0
+
+    def read(self, ap, address):
+        """Read a DP or AP register. AP reads are posted so this also reads RDBUFF."""
+        status, value = self._transfer(REQUESTS[ap | 2 | (address & 0xC)])
+        if status != OK or not ap:
+            return status, value
+        return self._transfer(RDBUFF_READ)
+
+    def write(self, ap, address, value):
+        if not ap and address == SELECT:
+            self._select = value
+        elif ap and address == CSW:
+            # Could be any AP bank so just set it again before the next block.
+            self._csw = None
+        status, _ = self._transfer(REQUESTS[ap | (address & 0xC)], value)
+        if status != OK and not ap and address == SELECT:
+            self._select = None
+        return status
+
+    def _mem_ap(self):
+        if self._select != 0:
+            status = self.write(0, SELECT, 0)
+            if status != OK:
+                return status
+        if self._csw != CSW_WORD:
+            status = self.write(1, CSW, CSW_WORD)
+            if status != OK:
+                return status
+            self._csw = CSW_WORD
+        return OK
+
+    def _recover(self):
+        # Find out why a queued run stopped, clear it and say whether to carry on.
+        status, value = self._transfer(REQUESTS[2 | CTRL_STAT])
+        if status != OK:
+            return status
+        self._transfer(REQUESTS[ABORT], CLEAR_ERRORS)
+        if value & STICKYERR:
+            return FAULT
+        return OK
+
+    def _settle(self, queued, accepted):
+        # Queue about as much as the target keeps up with: back off to what got
+        # through when it WAITs and grow again while it doesn't.
+        if accepted < queued:
+            self._burst = max(MIN_BURST, accepted)
+        else:
+            self._burst = min(MAX_BURST, 2 * self._burst)
+
+    def write_batch(self, buffer, count):
+        """Write `count` registers from `buffer`, five bytes each: the APnDP | A[3:2]
+        byte then a big endian value. Returns the status and how many were written."""
+        if not self._overrun_detect:
+            for i in range(count):
+                reg = buffer[5 * i]
+                status = self.write(reg & 1, reg & 0xC, struct.unpack_from(">I", buffer, 5 * i + 1)[0])
+                if status != OK:
+                    return status, i
+            return OK, count
+        # Any of them could move SELECT or CSW.
+        self._select = None
+        self._csw = None
+        wire = self.wire
+        status = OK
+        done = 0
+        attempts = 0
+        while status == OK and done < count:
+            queued = min(count - done, self._burst)
+            for i in range(done, done + queued):
+                reg = buffer[5 * i]
+                value = struct.unpack_from(">I", buffer, 5 * i + 1)[0]
+                wire.write(REQUESTS[reg & 0xD], 8)
+                wire.read(5)
+                wire.write(value, 32)
+                wire.write(_parity(value), 1)
+            replies = wire.run()
+            accepted = 0
+            while accepted < queued and (replies[accepted] >> 1) & 0x7 == OK:
+                accepted += 1
+            done += accepted
+            self._settle(queued, accepted)
+            if accepted < queued:
+                attempts = 0 if accepted else attempts + 1
+                status = self._recover() if attempts < RETRIES else WAIT
+        wire.write(0, 8)
+        wire.run()
+        return status, done
+
+    def write_memory(self, address, buffer, count):
+        """Write `count` little endian words from `buffer` starting at `address`."""
+        status = self._mem_ap()
+        wire = self.wire
+        done = 0
+        attempts = 0
+        while status == OK and done < count:
+            start = address + 4 * done
+            words = min(count - done, (TAR_WRAP - start % TAR_WRAP) // 4, self._burst)
+            status = self.write(1, TAR, start)
+            if status != OK:
+                break
+            for i in range(done, done + words):
+                value = _word(buffer, 4 * i)
+                wire.write(DRW_WRITE, 8)
+                wire.read(5)
+                wire.write(value, 32)
+                wire.write(_parity(value), 1)
+            replies = wire.run()
+            accepted = 0
+            while accepted < words and (replies[accepted] >> 1) & 0x7 == OK:
+                accepted += 1
+            done += accepted
+            self._settle(words, accepted)
+            if accepted < words:
+                attempts = 0 if accepted else attempts + 1
+                status = self._recover() if attempts < RETRIES else WAIT
+        # Idle cycles so the last write goes through before the clock stops.
+        wire.write(0, 8)
+        wire.run()
+        return status
+
+    def read_memory(self, address, buffer, count):
+        """Read `count` words starting at `address` into `buffer`, little endian."""
+        status = self._mem_ap()
+        wire = self.wire
+        done = 0
+        attempts = 0
+        while status == OK and done < count:
+            start = address + 4 * done
+            words = min(count - done, (TAR_WRAP - start % TAR_WRAP) // 4, self._burst)
+            status = self.write(1, TAR, start)
+            if status != OK:
+                break
+            # Each DRW read returns the word before, RDBUFF has the last one.
+            for i in range(words + 1):
+                wire.write(DRW_READ if i < words else RDBUFF_READ, 8)
+                wire.read(4)
+                wire.read(32)
+                wire.read(2)
+            replies = wire.run()
+            good = 0
+            for i in range(words + 1):
+                ack = (replies[3 * i] >> 1) & 0x7
+                value = replies[3 * i + 1]
+                if ack != OK or (i and (replies[3 * i + 2] & 1) != _parity(value)):
+                    break
+                if i:
+                    _store(buffer, 4 * (done + good), value)
+                    good += 1
+            done += good
+            self._settle(words, good)
+            if good < words:
+                attempts = 0 if good else attempts + 1
+                status = self._recover() if attempts < RETRIES else WAIT
+        return status
@@ -0,0 +1,69 @@
+import digitalio
+
+try:
+    import countio
+except ImportError:
+    countio = None
+
+# Triggered runs kept from one arming, the rest are only counted.
+MAX_RESULTS = 64
+
+
+class EdgeWatcher:
+    """Notices rising or falling edges on a pin.
+
+    countio counts them in hardware so edges that come while a sequence is
+    running are still seen. Without it, or on a pin it can't count on, the pin
+    is polled and only the level change since the last poll counts.
+    """
+
+    def __init__(self, pin, rising):
+        self._counter = None
+        self._pin = None
+        if countio is not None:
+            edge = countio.Edge.RISE if rising else countio.Edge.FALL
+            try:
+                self._counter = countio.Counter(pin, edge=edge)
+            except ValueError:
+                pass
+            self._seen = 0
+        if self._counter is None:
+            self._pin = digitalio.DigitalInOut(pin)
+            self._pin.switch_to_input()
+            self._rising = rising
+            self._last = self._pin.value
+
+    def poll(self):
+        """How many edges there have been since the last poll."""
+        if self._counter is not None:
+            # Never reset, an edge between reading and resetting would be lost.
+            count = self._counter.count
+            edges = count - self._seen
+            self._seen = count
+            return edges
+        value = self._pin.value
+        edge = value != self._last and value == self._rising
+        self._last = value
+        return 1 if edge else 0
+
+    def deinit(self):
+        if self._counter is not None:
+            self._counter.deinit()
+        else:
+            self._pin.deinit()
+
+
+class Recorder:
+    """Stands in for a mode's output so a triggered run isn't slowed by USB."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, text):
+        self._parts.append(text)
+        return len(text)
+
+    def take(self):
+        text = "".join(self._parts)
+        self._parts = []
+        return text
@@ -1,17 +1,84 @@
 from adafruit_circuitpyrate import Mode, BusWrite, BusRead
 import adafruit_prompt_toolkit as prompt_toolkit
 
+from adafruit_circuitpyrate import baudrate
+from adafruit_circuitpyrate.bridge import Bridge, Pump
+from adafruit_circuitpyrate.ringbuffer import RingBuffer
+
 import array
+import binascii
 import busio
 import digitalio
+import struct
+import time
  
-SPEEDS = (300, 1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 31250)
+SPEEDS = (300, 1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 31250,
+          230400, 460800, 921600, 1000000, 2000000, 3000000)
+
+# Enough to ride out a millisecond of bridge idle sleep at 3 Mbaud.
+RECEIVER_BUFFER = 4096
+SNIFF_RECEIVER_BUFFER = 4096
+SNIFF_BUFFER = 8192
+SNIFF_OUTPUT_BUFFER = 16384
+# Frames longer than this are split so a busy line can't fill the buffer.
+SNIFF_FRAME_LIMIT = 2048
+SNIFF_BATCH = 1024
+SNIFF_MIN_GAP_NS = 1_000_000
+# Binary record header: direction (0 TX, 1 RX, bit 7 set after an overflow),
+# monotonic_ns of the first byte and frame length. The frame follows.
+SNIFF_RECORD = "<BQH"
+SNIFF_NAMES = ("TX", "RX")
+
+
+class _SniffDirection:
+    def __init__(self, direction, uart):
+        self.direction = direction
+        self.uart = uart
+        self.ring = RingBuffer(SNIFF_BUFFER)
+        self.start_ns = 0
+        self.last_ns = 0
+        # Frames thrown away because the output couldn't take them whole.
+        self.dropped = 0
+        self._lost = False
+
+    def emit(self, out, binary):
+        length = len(self.ring)
+        # A frame lost here or to a full ring flags the next one that gets out.
+        overflowed = self.ring.overflowed or self._lost
+        if binary:
+            flags = self.direction
+            if overflowed:
+                flags |= 0x80
+            header = struct.pack(SNIFF_RECORD, flags, self.start_ns, length)
+            size = len(header) + length
+        else:
+            header = f"{SNIFF_NAMES[self.direction]} {self.start_ns}{' OVERFLOW' if overflowed else ''} ".encode()
+            size = len(header) + 2 * length + 2
+        self.ring.overflowed = False
+        if size > out.free:
+            # Only whole records or lines go out so the framing survives.
+            self.ring.consume(length)
+            self.dropped += 1
+            self._lost = True
+            return
+        self._lost = False
+        out.write(header)
+        if binary:
+            for chunk in self.ring.chunks():
+                out.write(chunk)
+        else:
+            for chunk in self.ring.chunks():
+                out.write(binascii.hexlify(chunk))
+            out.write(b"\r\n")
+        self.ring.consume(length)
+
 
 class UART(Mode):
     name = "UART"
 
     def __init__(self, pins, input, output):
         super().__init__(input, output)
+        self._pins = pins
 
         # Determine if we can use busio.UART or have to use pio.
         try:
@@ -22,7 +89,11 @@ class UART(Mode):
             import adafruit_pio_uart
             self.impl = adafruit_pio_uart.UART
 
-        speed = self._select_option("Set serial port speed: (bps)", [str(x) for x in SPEEDS])
+        speed = self._select_option("Set serial port speed: (bps)", [str(x) for x in SPEEDS] + ["Custom"])
+        if speed < len(SPEEDS):
+            speed = SPEEDS[speed]
+        else:
+            speed = self._custom_baudrate()
 
         bits_parity = self._select_option("Data bits and parity:", ["8, NONE *default", "8, EVEN", "8, ODD", "9, NONE"])
         bits = 9 if bits_parity == 3 else 8
@@ -40,18 +111,19 @@ class UART(Mode):
             "rx": pins["miso"],
             "parity": parity,
             "stop": stop_bits + 1,
-            "baudrate": SPEEDS[speed],
+            "baudrate": speed,
             "timeout": 1
         }
+        self.kwargs.update(self._receiver_kwargs(RECEIVER_BUFFER))
 
         self.uart = self.impl(**self.kwargs)
 
         self.macros = {
             1: ("Transparent bridge", self.bridge),
             2: ("Live monitor", self.monitor),
-            3: ("Bridge with flow control", self.bridge),
+            3: ("Bridge with flow control", self.flow_control_bridge),
             # 4: ("Auto Baud Detection (Activity Needed)", self.detect_baudrate)
-            5: ("Live monitor both RX and TX", self.dual_monitor),
+            5: ("Sniff both RX and TX", self.sniffer),
         }
 
         self.pull_ok = True
@@ -65,57 +137,107 @@ class UART(Mode):
     def print_pin_directions(self):
         self._print("I       O       I       I")
 
-    def dual_monitor(self):
-        self._print("Dual UART input. May be reordered between TX and RX within groups.")
+    def _custom_baudrate(self):
+        while True:
+            try:
+                requested = int(self._prompt("Baud rate: "))
+            except ValueError:
+                self._print("Not a number")
+                continue
+            actual = baudrate.check(self.impl, requested)
+            if actual is None:
+                self._print(f"{requested} bps isn't achievable within {baudrate.MAX_ERROR:.0%}")
+                continue
+            self._print(f"Actual rate {actual} bps ({(actual - requested) * 100 / requested:+.2f}%)")
+            return requested
+
+    def _receiver_kwargs(self, size):
+        # Only the native UART lets us size its receive buffer.
+        if self.impl is busio.UART:
+            return {"receiver_buffer_size": size}
+        return {}
+
+    def sniffer(self):
+        binary = self._select_option("Output format:", ["Batched hex lines *default", "Binary records"]) == 1
+        self._print("Sniffing TX and RX, frames split on idle gaps")
         self._print("Any key to exit")
         self.uart.deinit()
-        tx = self.impl(rx=self.kwargs["tx"], parity=self.kwargs["parity"], stop=self.kwargs["stop"], baudrate=self.kwargs["baudrate"])
-        rx = self.impl(rx=self.kwargs["rx"], parity=self.kwargs["parity"], stop=self.kwargs["stop"], baudrate=self.kwargs["baudrate"])
-        both = (("TX", tx), ("RX", rx))
-        buf = bytearray(32)
-        mv = memoryview(buf)
-        waiting_last = 0
+        baudrate = self.kwargs["baudrate"]
+        # Two character times of silence end a frame, but no less than the loop can see.
+        gap_ns = max(SNIFF_MIN_GAP_NS, 20 * 1_000_000_000 // baudrate)
+        directions = []
+        for direction, pin in enumerate((self.kwargs["tx"], self.kwargs["rx"])):
+            uart = self.impl(
+                rx=pin,
+                parity=self.kwargs["parity"],
+                stop=self.kwargs["stop"],
+                baudrate=baudrate,
+                timeout=0,
+                **self._receiver_kwargs(SNIFF_RECEIVER_BUFFER)
+            )
+            directions.append(_SniffDirection(direction, uart))
+        out = RingBuffer(SNIFF_OUTPUT_BUFFER)
+
         while not self._input.in_waiting:
-            total_waiting = 0
-            for name, serial in both:
-                waiting = min(len(mv), serial.in_waiting)
-                if waiting == 0:
+            now = time.monotonic_ns()
+            pending = False
+            for sniff in directions:
+                if sniff.uart.in_waiting:
+                    if not sniff.ring:
+                        sniff.start_ns = now
+                    sniff.ring.readfrom(sniff.uart)
+                    sniff.last_ns = now
+                if not sniff.ring:
                     continue
-                total_waiting += waiting
-                serial.readinto(mv[:waiting])
-                self._print(name, end="")
-                for i in range(waiting):
-                    self._print(f" 0x{buf[i]:02X}", end="")
-                self._print()
-            if total_waiting == 0 and waiting_last > 0:
-                self._print()
-            waiting_last = total_waiting
+                if now - sniff.last_ns >= gap_ns or len(sniff.ring) >= SNIFF_FRAME_LIMIT:
+                    sniff.emit(out, binary)
+                    # Anything after a split frame starts where this one stopped.
+                    sniff.start_ns = now
+                else:
+                    pending = True
+            if len(out) >= SNIFF_BATCH or (out and not pending):
+                out.writeto(self._output)
 
-        tx.deinit()
-        rx.deinit()
+        for sniff in directions:
+            if sniff.ring:
+                out.writeto(self._output)
+                sniff.emit(out, binary)
+            sniff.uart.deinit()
+        out.writeto(self._output)
+        dropped = sum(sniff.dropped for sniff in directions)
+        if dropped:
+            self._print(f"\nOutput overflowed, {dropped} frames were dropped")
 
         # Recreate the uart class
         self.uart = self.impl(**self.kwargs)
 
-
     def monitor(self):
         self._print("Raw UART input")
         self._print("Any key to exit")
+        pump = Pump(self.uart, self._output)
         while not self._input.in_waiting:
-            if self.uart.in_waiting:
-                self._output.write(self.uart.read(self.uart.in_waiting))
+            pump.poll()
 
     def bridge(self):
         self._print("UART bridge")
-        self._print("Reset to exit")
+        self._print("Send Ctrl-] three times after a second of quiet to exit")
         yn = self._prompt("Are you sure? ")
         if yn != "y":
             return
-        while True:
-            if self._input.in_waiting:
-                self.uart.write(self._input.read(self._input.in_waiting))
-            if self.uart.in_waiting:
-                self._output.write(self.uart.read(self.uart.in_waiting))
+        # Bypass the binary mode switcher so NULs in the data pass through.
+        host = getattr(self._input, "serial", self._input)
+        Bridge(host, self._output, self.uart).run()
+        self._print("\nBridge closed")
+
+    def flow_control_bridge(self):
+        # RTS on CS and CTS on CLK while bridging.
+        self.uart.deinit()
+        self.uart = self.impl(rts=self._pins["cs"], cts=self._pins["clock"], **self.kwargs)
+        try:
+            self.bridge()
+        finally:
+            self.uart.deinit()
+            self.uart = self.impl(**self.kwargs)
 
     def run_sequence(self, sequence):
 
@@ -0,0 +1,248 @@
+"""Protocol benchmarks for the Pyrate firmware under CPython.
+
+The real binary mode run() loops and interactive run_sequence() calls are
+driven by scripted host traffic against the emulated boards in emulated.py.
+No hardware is needed. Absolute numbers are CPython numbers; compare them
+between revisions rather than against a board.
+
+    python benchmarks/bench.py                    # run, save results/<rev>.json
+    python benchmarks/bench.py --only flashrom    # run a subset
+    python benchmarks/bench.py --compare results/a.json results/b.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import emulated
+
+board = emulated.install()
+
+import adafruit_circuitpyrate
+
+clock = time.perf_counter_ns
+
+
+@contextlib.contextmanager
+def quiet():
+    # The firmware prints debug output to the REPL, keep it out of the report.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_pyrate(commands):
+    serial = emulated.Serial(commands, clock)
+    with quiet():
+        pyrate = adafruit_circuitpyrate.Pyrate(
+            adafruit_circuitpyrate.BinarySwitcher(serial),
+            serial,
+            aux_pin=board.AUX,
+            adc_pin=board.ADC,
+            miso_pin=board.MISO,
+            cs_pin=board.CS,
+            clock_pin=board.CLK,
+            mosi_pin=board.MOSI,
+            enable_5v_pin=board.ENABLE_5V,
+            enable_3v_pin=board.ENABLE_3V3,
+            measure_5v_pin=board.MEASURE_5V,
+            measure_3v_pin=board.MEASURE_3V3,
+            vextern_pin=board.VEXTERN,
+            enable_pullups_pin=board.ENABLE_PULLUPS,
+            mode_led_pin=board.MODE_LED,
+            scl_pin=board.STEMMA_SCL,
+            sda_pin=board.STEMMA_SDA,
+        )
+    return pyrate, serial
+
+
+def summarize(count, elapsed_ns, byte_count, latencies):
+    latencies = sorted(latencies) or [elapsed_ns / max(count, 1)]
+    seconds = elapsed_ns / 1e9
+    return {
+        "commands": count,
+        "bytes": byte_count,
+        "seconds": seconds,
+        "commands_per_s": count / seconds,
+        "bytes_per_s": byte_count / seconds,
+        "latency_us_mean": elapsed_ns / count / 1000,
+        "latency_us_p50": latencies[len(latencies) // 2] / 1000,
+        "latency_us_p99": latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] / 1000,
+        "latency_us_max": latencies[-1] / 1000,
+    }
+
+
+def run_binary(enter, workload, setup=()):
+    """Run `workload` host commands through bitbang mode and one binary mode."""
+    commands = [enter, *setup, *workload, b"\x00", b"\x0f"]
+    pyrate, serial = make_pyrate(commands)
+    with quiet():
+        pyrate.run_binary_mode()
+    times = serial.command_times
+    first = 1 + len(setup)
+    last = first + len(workload)
+    # The exit command's read time closes the last workload command.
+    latencies = [times[i + 1] - times[i] for i in range(first, last)]
+    elapsed = times[last] - times[first]
+    return summarize(len(workload), elapsed, serial.bytes_in + serial.bytes_out, latencies)
+
+
+def flashrom(count=64, chunk=4096):
+    # JEDEC id then 4 KB reads with the SPI write-then-read command, as flashrom does.
+    workload = [b"\x04" + struct.pack(">HH", 1, 3) + b"\x9f"]
+    for i in range(count):
+        address = i * chunk
+        workload.append(b"\x04" + struct.pack(">HH", 4, chunk) + b"\x03" + address.to_bytes(3, "big"))
+    return run_binary(b"\x01", workload, setup=(b"\x63", b"\x8a"))
+
+
+def avrdude(count=2000):
+    # avrdude programs AVRs with one 4 byte ISP instruction per bulk SPI transfer.
+    workload = []
+    for i in range(count):
+        workload.append(b"\x13" + bytes((0x20 | ((i & 1) << 3), (i >> 9) & 0xFF, (i >> 1) & 0xFF, 0x00)))
+    return run_binary(b"\x01", workload, setup=(b"\x61", b"\x8a"))
+
+
+def eeprom(count=512, page=32):
+    # Alternate 32 byte page reads and page writes on a 24-series EEPROM.
+    workload = []
+    for i in range(count):
+        offset = (i // 2) * page
+        header = struct.pack(">BH", 0xA0, offset)
+        if i % 2:
+            data = bytes((offset + j) & 0xFF for j in range(page))
+            workload.append(b"\x08" + struct.pack(">HH", len(header) + page, 0) + header + data)
+        else:
+            workload.append(b"\x08" + struct.pack(">HH", len(header), page) + header)
+    return run_binary(b"\x02", workload)
+
+
+def uart_bulk(count=1000):
+    # 16 byte bulk writes, the path STM32 bootloader block writes take.
+    workload = [b"\x1f" + bytes(range(16)) for _ in range(count)]
+    return run_binary(b"\x03", workload, setup=(b"\x69",))
+
+
+def onewire_search(count=200):
+    # Full ROM searches of the emulated bus, checked against what's on it first.
+    from adafruit_circuitpyrate import onewire_bus
+
+    found = list(onewire_bus.search(emulated.OneWireBus(None)))
+    if sorted(found) != sorted(emulated.OneWireBus.ROMS):
+        raise RuntimeError(f"ROM search found {[rom.hex() for rom in found]}")
+    return run_binary(b"\x04", [b"\x08"] * count)
+
+
+def run_interactive(mode_number, sequence, count):
+    commands = [sequence] * count
+    pyrate, serial = make_pyrate([])
+    with quiet():
+        pyrate.change_mode(mode_number)
+        latencies = []
+        start = clock()
+        for command in commands:
+            command_start = clock()
+            pyrate.run_commands(command)
+            latencies.append(clock() - command_start)
+        elapsed = clock() - start
+    return summarize(count, elapsed, serial.bytes_out, latencies)
+
+
+def parse(count=2000):
+    sequences = ("[0xA0 0 0 [0xA1 r:32]", "{0xcc 0x44 {0xcc 0xbe r:9", "[0x03 0 0x10 0 r:64]", "0x55:16 r:4 ^:8 /\\-_!.")
+    latencies = []
+    with quiet():
+        start = clock()
+        for i in range(count):
+            command_start = clock()
+            adafruit_circuitpyrate.parse_bus_actions(sequences[i % len(sequences)])
+            latencies.append(clock() - command_start)
+        elapsed = clock() - start
+    byte_count = sum(len(sequences[i % len(sequences)]) for i in range(count))
+    return summarize(count, elapsed, byte_count, latencies)
+
+
+WORKLOADS = {
+    "flashrom": flashrom,
+    "avrdude": avrdude,
+    "eeprom": eeprom,
+    "uart_bulk": uart_bulk,
+    "onewire_search": onewire_search,
+    "parse": parse,
+    "seq_onewire": lambda: run_interactive("2", "{0xcc 0x44 {0xcc 0xbe r:9", 500),
+    "seq_uart": lambda: run_interactive("3", "[0x7f r 0x02 0xfd r:3]", 500),
+    "seq_i2c": lambda: run_interactive("4", "[0xA0 0 0 [0xA1 r:32]", 500),
+    "seq_spi": lambda: run_interactive("5", "[0x03 0 0x10 0 r:64]", 500),
+}
+
+
+def revision():
+    try:
+        rev = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "../adafruit_circuitpyrate"], cwd=HERE)
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(names, repeat):
+    results = {}
+    for name in names:
+        best = None
+        for _ in range(repeat):
+            result = WORKLOADS[name]()
+            if best is None or result["seconds"] < best["seconds"]:
+                best = result
+        results[name] = best
+        print(f"{name:12} {best['commands_per_s']:10.0f} cmd/s {best['bytes_per_s'] / 1024:10.1f} KiB/s "
+              f"p50 {best['latency_us_p50']:8.1f} us  p99 {best['latency_us_p99']:8.1f} us")
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'':12} {old['revision']:>14} {new['revision']:>14}   change")
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]["commands_per_s"]
+        after = result["commands_per_s"]
+        print(f"{name:12} {before:10.0f} cmd/s {after:10.0f} cmd/s {100 * (after - before) / before:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", action="append", choices=sorted(WORKLOADS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Result file, defaults to results/<revision>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    rev = revision()
+    results = run(args.only or list(WORKLOADS), args.repeat)
+    path = args.output or os.path.join(HERE, "results", rev + ".json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"revision": rev, "python": platform.python_version(), "results": results}, f, indent=2)
+    print("saved", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""Stand-ins for the CircuitPython modules the Pyrate firmware imports.
+
+install() puts the fake modules into sys.modules so the real firmware modules
+import and run unmodified under CPython. The bus objects are backed by small
+device models (a SPI flash, a 24-series EEPROM, a UART target and a DS18B20)
+so reads return plausible data and writes land somewhere.
+"""
+
+import gc
+import sys
+import types
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+BOARD_PINS = (
+    "AUX", "ADC", "MISO", "CS", "CLK", "MOSI", "ENABLE_5V", "ENABLE_3V3",
+    "MEASURE_5V", "MEASURE_3V3", "VEXTERN", "ENABLE_PULLUPS", "MODE_LED",
+    "STEMMA_SCL", "STEMMA_SDA", "TX_LED", "RX_LED", "MODE_SWITCH",
+)
+
+
+class Direction:
+    INPUT = 0
+    OUTPUT = 1
+
+
+class Pull:
+    UP = 1
+    DOWN = 2
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self.value = False
+
+    def switch_to_output(self, value=False, drive_mode=None):
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def deinit(self):
+        pass
+
+
+class AnalogIn:
+    reference_voltage = 3.3
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = 0x8000
+
+    def deinit(self):
+        pass
+
+
+class SPIFlash:
+    """Answers JEDEC id and read commands, everything else is a sink."""
+
+    def __init__(self, size=1 << 20):
+        self.memory = bytes(i & 0xFF for i in range(size))
+        self.pending = b""
+
+    def transfer(self, out_data):
+        if out_data and out_data[0] == 0x9F:
+            self.pending = b"\xEF\x40\x14"
+        elif len(out_data) >= 4 and out_data[0] == 0x03:
+            address = (out_data[1] << 16) | (out_data[2] << 8) | out_data[3]
+            self.pending = self.memory[address:]
+        return bytes(len(out_data))
+
+    def read(self, length):
+        data = self.pending[:length]
+        self.pending = self.pending[length:]
+        return data + b"\xff" * (length - len(data))
+
+
+class SPI:
+    device = None
+
+    def __init__(self, clock, MOSI=None, MISO=None):
+        if SPI.device is None:
+            SPI.device = SPIFlash()
+        self._locked = False
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def configure(self, *, baudrate=100000, polarity=0, phase=0, bits=8):
+        self.frequency = baudrate
+
+    def write(self, buffer, *, start=0, end=None):
+        SPI.device.transfer(bytes(buffer[start:end]))
+
+    def readinto(self, buffer, *, start=0, end=None, write_value=0):
+        if end is None:
+            end = len(buffer)
+        buffer[start:end] = SPI.device.read(end - start)
+
+    def write_readinto(self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        out_data = bytes(out_buffer[out_start:out_end])
+        SPI.device.transfer(out_data)
+        if in_end is None:
+            in_end = len(in_buffer)
+        in_buffer[in_start:in_end] = SPI.device.read(in_end - in_start)
+
+    def deinit(self):
+        pass
+
+
+class EEPROM:
+    def __init__(self, size=32768):
+        self.memory = bytearray(i & 0xFF for i in range(size))
+        self.pointer = 0
+
+    def write(self, data):
+        if len(data) >= 2:
+            self.pointer = ((data[0] << 8) | data[1]) % len(self.memory)
+            for b in data[2:]:
+                self.memory[self.pointer] = b
+                self.pointer = (self.pointer + 1) % len(self.memory)
+
+    def read(self, length):
+        data = bytearray()
+        for _ in range(length):
+            data.append(self.memory[self.pointer])
+            self.pointer = (self.pointer + 1) % len(self.memory)
+        return data
+
+
+class I2C:
+    devices = None
+
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        if I2C.devices is None:
+            I2C.devices = {0x50: EEPROM()}
+        self._locked = False
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def scan(self):
+        return sorted(I2C.devices)
+
+    def _device(self, address):
+        if address not in I2C.devices:
+            raise OSError(19)
+        return I2C.devices[address]
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self._device(address).write(bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        buffer[start:end] = self._device(address).read(end - start)
+
+    def writeto_then_readfrom(self, address, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        self.writeto(address, out_buffer, start=out_start, end=out_end)
+        self.readfrom_into(address, in_buffer, start=in_start, end=in_end)
+
+    def deinit(self):
+        pass
+
+
+class UART:
+    class Parity:
+        EVEN = 1
+        ODD = 2
+
+    def __init__(self, tx=None, rx=None, *, baudrate=9600, bits=8, parity=None, stop=1,
+                 timeout=1, receiver_buffer_size=64, rts=None, cts=None):
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self._rx = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def write(self, buffer):
+        # The target acknowledges every write like an STM32 bootloader.
+        self._rx.append(0x79)
+        return len(buffer)
+
+    def read(self, nbytes=None):
+        if nbytes is None:
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data or None
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        if not data:
+            return None
+        buffer[:len(data)] = data
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._rx = bytearray()
+
+    def deinit(self):
+        pass
+
+
+class OneWireAddress:
+    def __init__(self, rom):
+        self._rom = rom
+
+    @property
+    def rom(self):
+        return self._rom
+
+
+class OneWireBus:
+    # A DS18B20 reading 25.0625C. Addressed commands all get its answers.
+    ROM = bytes((0x28, 0xFF, 0x4C, 0x60, 0x91, 0x16, 0x04, 0xB4))
+    SCRATCHPAD = bytes((0x91, 0x01, 0x4B, 0x46, 0x7F, 0xFF, 0x0F, 0x10, 0x25))
+    # Every device a ROM search finds. The second one makes the search take the
+    # discrepancy branch.
+    ROMS = (ROM, bytes((0x28, 0x61, 0x64, 0x12, 0x3C, 0x7D, 0x2E, 0x9E)))
+
+    def __init__(self, pin):
+        self._pending = b""
+        # Devices still taking part in a ROM search and the bit they're on.
+        self._searching = []
+        self._bit = 0
+        self._complement = False
+
+    def reset(self, required=False):
+        # True when a device answered with a presence pulse, like the real driver.
+        self._searching = []
+        return True
+
+    def write(self, buf, *, start=0, end=None):
+        data = bytes(buf[start:end])
+        if data[:1] == b"\x33":
+            self._pending = self.ROM
+        elif data[:1] in (b"\xf0", b"\xec"):
+            # Nobody is alarming, so alarm search only finds nothing.
+            self._searching = list(self.ROMS) if data[:1] == b"\xf0" else []
+            self._bit = 0
+            self._complement = False
+        elif data[-1:] == b"\xbe":
+            self._pending = self.SCRATCHPAD
+
+    def _rom_bit(self, rom):
+        return (rom[self._bit >> 3] >> (self._bit & 7)) & 1
+
+    def _readbit(self):
+        # The bus is wired AND, any device sending a 0 wins.
+        if not self._searching:
+            return 1
+        bits = [self._rom_bit(rom) for rom in self._searching]
+        if self._complement:
+            bits = [1 - bit for bit in bits]
+        self._complement = not self._complement
+        return min(bits)
+
+    def _writebit(self, value):
+        if not self._searching:
+            return
+        self._searching = [rom for rom in self._searching if self._rom_bit(rom) == value]
+        self._bit += 1
+        self._complement = False
+        if self._bit == 64:
+            self._searching = []
+
+    def readinto(self, buf, *, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        length = end - start
+        data = self._pending[:length]
+        self._pending = self._pending[length:]
+        buf[start:end] = data + b"\xff" * (length - len(data))
+
+    def scan(self):
+        return [OneWireAddress(bytearray(self.ROM))]
+
+    def deinit(self):
+        pass
+
+    @staticmethod
+    def crc8(data):
+        crc = 0
+        for byte in data:
+            crc ^= byte
+            for _ in range(8):
+                if crc & 0x01:
+                    crc = (crc >> 1) ^ 0x8C
+                else:
+                    crc >>= 1
+        return crc
+
+
+class Serial:
+    """The USB CDC side. Replays scripted host commands and records replies.
+
+    `commands` is a list of byte strings, one per host command. The time each
+    command's first byte is read is recorded so per-command latency can be
+    worked out afterwards.
+    """
+
+    def __init__(self, commands, clock):
+        self._data = b"".join(commands)
+        self._starts = []
+        offset = 0
+        for command in commands:
+            self._starts.append(offset)
+            offset += len(command)
+        self._next_start = 0
+        self._position = 0
+        self._clock = clock
+        self.command_times = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def in_waiting(self):
+        return len(self._data) - self._position
+
+    def _advance(self, length):
+        while self._next_start < len(self._starts) and self._starts[self._next_start] < self._position + length:
+            self.command_times.append(self._clock())
+            self._next_start += 1
+        data = self._data[self._position:self._position + length]
+        if not data and length:
+            raise EOFError("Host script exhausted")
+        self._position += len(data)
+        self.bytes_in += len(data)
+        return data
+
+    def read(self, length=1):
+        return self._advance(length)
+
+    def readinto(self, buffer):
+        data = self._advance(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def write(self, buffer):
+        self.bytes_out += len(buffer)
+        return len(buffer)
+
+    def flush(self):
+        pass
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    for key, value in attributes.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    if not hasattr(gc, "mem_free"):
+        gc.mem_free = lambda: 0
+
+    board = _module("board", board_id="emulated_pyrate")
+    for name in BOARD_PINS:
+        setattr(board, name, Pin(name))
+
+    _module("digitalio", DigitalInOut=DigitalInOut, Direction=Direction, Pull=Pull)
+    _module("analogio", AnalogIn=AnalogIn)
+    _module("busio", SPI=SPI, I2C=I2C, UART=UART)
+    _module("bitbangio", SPI=SPI, I2C=I2C)
+    _module("microcontroller", delay_us=lambda us: None)
+    _module("adafruit_prompt_toolkit", prompt=lambda message, input=None, output=None: "")
+    onewire = _module("adafruit_onewire")
+    onewire.bus = _module("adafruit_onewire.bus", OneWireBus=OneWireBus, OneWireAddress=OneWireAddress)
+    return board
@@ -13,3 +13,5 @@ programmable = mode_switch.value
 usb_cdc.enable(console=programmable, data=True)    # Enable console and data
 if not programmable:
     storage.disable_usb_drive()
+    # The host can't see CIRCUITPY so we can write to it, e.g. the 1-Wire device table.
+    storage.remount("/", readonly=False)
@@ -40,5 +40,9 @@ while True:
     except adafruit_circuitpyrate.EnterBinaryMode:
         # This doesn't return until binary mode is exited.
         pyrate.run_binary_mode()
+        continue
+    except adafruit_circuitpyrate.EnterLogicAnalyzer:
+        pyrate.run_logic_analyzer()
+        continue
     print("->", commands)
     pyrate.run_commands(commands)
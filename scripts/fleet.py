@@ -0,0 +1,154 @@
+"""Run one job per connected Pyrate in parallel.
+
+    python fleet.py dump
+    python fleet.py dump poll chipid
+    python fleet.py --port /dev/ttyACM3 --port /dev/ttyACM5 poll
+    python fleet.py --image firmware.bin program
+
+Every data port found is given a job. A single job is run on every board,
+several jobs are handed out to the boards round robin in port order.
+"""
+
+import argparse
+import concurrent.futures
+import struct
+import time
+
+import pyrate_host
+import uart_stm32bl
+
+
+def dump_eeprom(serial, size=4096, address=0x50, chunk=32):
+    """Read a 24-series EEPROM over binary I2C. Addresses are 7 bit."""
+    pyrate_host.enter_mode(serial, 0x02, b"I2C1")
+    data = bytearray()
+    in_buffer = bytearray(chunk)
+    for offset in range(0, size, chunk):
+        out_buffer = struct.pack(">BH", address << 1, offset)
+        pyrate_host.write_then_readinto(serial, out_buffer, in_buffer)
+        data.extend(in_buffer)
+    return len(data), data
+
+
+def poll_sensor(serial, duration=5.0, address=0x70, register=0x00, length=2):
+    """Repeatedly read a register block from an I2C sensor. Addresses are 7 bit."""
+    pyrate_host.enter_mode(serial, 0x02, b"I2C1")
+    in_buffer = bytearray(length)
+    samples = []
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        pyrate_host.write_then_readinto(serial, bytes((address << 1, register)), in_buffer)
+        samples.append(bytes(in_buffer))
+    return len(samples) * length, samples
+
+
+def stm32_chip_id(serial):
+    """Power cycle an STM32 target and read its id from the system bootloader."""
+    uart_stm32bl.start_bootloader(serial, 115200, boot0_aux=False)
+    bootloader = uart_stm32bl.Bootloader(serial)
+    bootloader.sync()
+    return 2, hex(bootloader.get_id())
+
+
+def stm32_program(serial, image=None, address=0x08000000):
+    """Erase, write and verify an STM32 through its system bootloader."""
+    if image is None:
+        raise ValueError("program needs --image")
+    uart_stm32bl.start_bootloader(serial, 115200, boot0_aux=False)
+    bootloader = uart_stm32bl.Bootloader(serial)
+    bootloader.sync()
+    bootloader.erase_all()
+    uart_stm32bl.program(bootloader, image, address)
+    return len(image), hex(address)
+
+
+JOBS = {
+    "dump": dump_eeprom,
+    "poll": poll_sensor,
+    "chipid": stm32_chip_id,
+    "program": stm32_program,
+}
+
+
+def run_job(device, job_name, options=None):
+    job = JOBS[job_name]
+    start = time.monotonic()
+    try:
+        connection = pyrate_host.connect(device)
+    except Exception as e:
+        return {"device": device, "job": job_name, "error": repr(e), "bytes": 0, "seconds": 0}
+    try:
+        pyrate_host.enter_bitbang(connection)
+        byte_count, result = job(connection, **(options or {}))
+        error = None
+    except Exception as e:
+        byte_count, result = 0, None
+        error = repr(e)
+    finally:
+        connection.close()
+    return {
+        "device": device,
+        "job": job_name,
+        "bytes": byte_count,
+        "seconds": time.monotonic() - start,
+        "result": result,
+        "error": error,
+    }
+
+
+def run_fleet(assignments, options=None):
+    # One worker per board. Each board has its own USB endpoint so the jobs
+    # spend their time blocked in serial I/O and threads scale with boards.
+    # options maps a job name to extra keyword arguments for it.
+    if not assignments:
+        return [], 0
+    options = options or {}
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(assignments)) as pool:
+        futures = [pool.submit(run_job, device, job, options.get(job)) for device, job in assignments]
+        results = [future.result() for future in futures]
+    return results, time.monotonic() - start
+
+
+def print_report(results, wall_time):
+    if not results:
+        print("No boards")
+        return
+    total = 0
+    for result in results:
+        rate = result["bytes"] / result["seconds"] if result["seconds"] else 0
+        status = "ok" if not result["error"] else result["error"]
+        print(f"{result['device']:20} {result['job']:8} {result['bytes']:8} bytes "
+              f"{result['seconds']:7.2f} s {rate:10.1f} B/s  {status}")
+        total += result["bytes"]
+    ok = sum(1 for result in results if not result["error"])
+    print(f"{ok}/{len(results)} boards ok, {total} bytes in {wall_time:.2f} s "
+          f"= {total / wall_time if wall_time else 0:.1f} B/s aggregate")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", nargs="+", choices=sorted(JOBS))
+    parser.add_argument("--port", action="append", help="Only use these ports instead of every board found")
+    parser.add_argument("--image", help="Raw binary for the program job")
+    parser.add_argument("--address", type=lambda x: int(x, 0), default=0x08000000)
+    args = parser.parse_args()
+
+    options = {}
+    if "program" in args.jobs:
+        if not args.image:
+            parser.error("program needs --image")
+        with open(args.image, "rb") as f:
+            options["program"] = {"image": f.read(), "address": args.address}
+    try:
+        devices = args.port or pyrate_host.data_ports()
+    except Exception:
+        # data_ports() raises when nothing is plugged in.
+        devices = []
+    assignments = [(device, args.jobs[i % len(args.jobs)]) for i, device in enumerate(devices)]
+    results, wall_time = run_fleet(assignments, options)
+    print_report(results, wall_time)
+
+
+if __name__ == "__main__":
+    main()
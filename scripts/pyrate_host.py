@@ -0,0 +1,79 @@
+import adafruit_board_toolkit.circuitpython_serial
+import serial
+import struct
+import time
+
+# How long older firmware gets to refuse 0x07 before the rate is sent.
+BAUDRATE_PROBE_TIMEOUT = 0.25
+
+
+def data_ports():
+    comports = adafruit_board_toolkit.circuitpython_serial.data_comports()
+    if not comports:
+        raise Exception("No CircuitPython boards found")
+    return [comport.device for comport in comports]
+
+
+def connect(device):
+    return serial.Serial(device)
+
+
+def enter_bitbang(serial):
+    # Twenty nulls switch the prompt into binary mode, after which every null
+    # is answered with BBIO1.
+    for i in range(21):
+        serial.write(b"\x00")
+        time.sleep(0.1)
+        if serial.in_waiting >= 5:
+            response = serial.read(5)
+            assert response == b"BBIO1"
+            serial.reset_input_buffer()
+            return
+    raise Exception("No response from " + serial.port)
+
+
+def enter_mode(serial, command, version):
+    serial.write(bytes((command,)))
+    response = serial.read(len(version))
+    assert response == version, response
+
+
+def write_then_readinto(serial, out_buffer, in_buffer):
+    serial.write(b"\x08")
+    serial.write(struct.pack(">HH", len(out_buffer), len(in_buffer)))
+    serial.write(out_buffer)
+    if in_buffer:
+        serial.readinto(in_buffer)
+
+
+def uart_bulk_write(serial, data):
+    # One 0x1x command per 16 bytes, all sent before reading any of the acks
+    # so the Pyrate never waits on a USB round trip mid block.
+    commands = bytearray()
+    for offset in range(0, len(data), 16):
+        chunk = data[offset:offset + 16]
+        commands.append(0x10 | (len(chunk) - 1))
+        commands.extend(chunk)
+    serial.write(commands)
+    acks = serial.read(len(data))
+    assert acks == b"\x01" * len(data), acks
+
+
+def uart_set_baudrate(serial, baudrate):
+    """Returns the rate the Pyrate achieved or None if it refused.
+
+    Firmware without custom rates answers 0x07 with 0x00 straight away and would
+    run the rate bytes as commands, so they're only sent once the Pyrate has
+    stayed quiet long enough to show it's waiting for them.
+    """
+    serial.write(b"\x07")
+    timeout = serial.timeout
+    serial.timeout = BAUDRATE_PROBE_TIMEOUT
+    refused = serial.read(1)
+    serial.timeout = timeout
+    if refused:
+        return None
+    serial.write(struct.pack(">I", baudrate))
+    if serial.read(1) != b"\x01":
+        return None
+    return struct.unpack(">I", serial.read(4))[0]
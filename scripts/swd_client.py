@@ -0,0 +1,201 @@
+"""Debug an ARM Cortex-M part over SWD with a Pyrate.
+
+    python swd_client.py                                  # print DPIDR and CPUID
+    python swd_client.py --read 0x20000000 1024 --output ram.bin
+    python swd_client.py --halt --write 0x20000000 loader.bin
+    python swd_client.py --port /dev/ttyACM3 --khz 4000 --power --reset
+
+Wire SWCLK to CLK, SWDIO to MOSI and optionally nRESET to AUX. --write loads
+and verifies RAM, or flash on parts whose flash accepts plain word writes once
+unlocked. Everything else needs a part specific flash loader, which is what
+--write to RAM followed by register writes is for.
+"""
+
+import argparse
+import struct
+import sys
+import time
+
+import pyrate_host
+
+OK = 0x01
+STATUS_NAMES = {0x01: "OK", 0x02: "WAIT", 0x04: "FAULT", 0x07: "no response", 0x08: "parity error", 0x10: "too many words"}
+
+DP = 0
+AP = 1
+MAX_WORDS = 256
+
+CPUID = 0xE000ED00
+DHCSR = 0xE000EDF0
+AIRCR = 0xE000ED0C
+DBGKEY = 0xA05F0000
+C_DEBUGEN = 1 << 0
+C_HALT = 1 << 1
+S_HALT = 1 << 17
+VECTKEY_SYSRESETREQ = 0x05FA0004
+
+
+class SWDError(Exception):
+    pass
+
+
+def _check(status, what):
+    if status != OK:
+        raise SWDError(f"{what} failed: {STATUS_NAMES.get(status, hex(status))}")
+
+
+class SWD:
+    """Client for the Pyrate's binary SWD mode."""
+
+    def __init__(self, serial):
+        self.serial = serial
+
+    def _read(self, length):
+        data = self.serial.read(length)
+        if len(data) != length:
+            raise SWDError(f"Timed out waiting for {length} bytes, got {data!r}")
+        return data
+
+    def connect(self):
+        self.serial.write(b"\x02")
+        status, idcode = struct.unpack(">BI", self._read(5))
+        _check(status, "Connect")
+        return idcode
+
+    def set_frequency(self, khz):
+        self.serial.write(b"\x08" + struct.pack(">H", khz))
+        assert self._read(1) == b"\x01"
+
+    def peripherals(self, power=False, aux_high=True):
+        # AUX is nRESET so keep it high unless asked.
+        self.serial.write(bytes((0x40 | (0x08 if power else 0) | (0x02 if aux_high else 0),)))
+        assert self._read(1) == b"\x01"
+
+    def read_register(self, ap, address):
+        self.serial.write(bytes((0x03, ap | address)))
+        status, value = struct.unpack(">BI", self._read(5))
+        _check(status, f"{'AP' if ap else 'DP'} read 0x{address:x}")
+        return value
+
+    def write_register(self, ap, address, value):
+        self.serial.write(struct.pack(">BBI", 0x04, ap | address, value))
+        _check(self._read(1)[0], f"{'AP' if ap else 'DP'} write 0x{address:x}")
+
+    def write_registers(self, writes):
+        """Write a list of (ap, address, value) in one command."""
+        command = bytearray(struct.pack(">BH", 0x05, len(writes)))
+        for ap, address, value in writes:
+            command.extend(struct.pack(">BI", ap | address, value))
+        self.serial.write(command)
+        status, done = struct.unpack(">BH", self._read(3))
+        _check(status, f"Register write {done + 1} of {len(writes)}")
+
+    def read_memory(self, address, length):
+        """Read `length` bytes, a multiple of 4, from word aligned `address`."""
+        # Send every block before reading any so USB round trips overlap.
+        blocks = []
+        for offset in range(0, length, 4 * MAX_WORDS):
+            words = min(MAX_WORDS, (length - offset) // 4)
+            self.serial.write(struct.pack(">BIH", 0x06, address + offset, words))
+            blocks.append((offset, words))
+        data = bytearray()
+        for offset, words in blocks:
+            reply = self._read(1 + 4 * words)
+            _check(reply[0], f"Read at 0x{address + offset:08x}")
+            data.extend(reply[1:])
+        return bytes(data)
+
+    def write_memory(self, address, data):
+        if len(data) % 4:
+            data = data + b"\xff" * (4 - len(data) % 4)
+        count = 0
+        for offset in range(0, len(data), 4 * MAX_WORDS):
+            chunk = data[offset:offset + 4 * MAX_WORDS]
+            self.serial.write(struct.pack(">BIH", 0x07, address + offset, len(chunk) // 4) + chunk)
+            count += 1
+        statuses = self._read(count)
+        for i, status in enumerate(statuses):
+            _check(status, f"Write at 0x{address + i * 4 * MAX_WORDS:08x}")
+
+    def read_word(self, address):
+        return struct.unpack("<I", self.read_memory(address, 4))[0]
+
+    def write_word(self, address, value):
+        self.write_memory(address, struct.pack("<I", value))
+
+    def halt(self):
+        self.write_word(DHCSR, DBGKEY | C_HALT | C_DEBUGEN)
+        for _ in range(100):
+            if self.read_word(DHCSR) & S_HALT:
+                return
+        raise SWDError("Core didn't halt")
+
+    def reset(self):
+        # Through the core so it works without nRESET wired up.
+        self.write_word(AIRCR, VECTKEY_SYSRESETREQ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", help="Pyrate data port, defaults to the first one found")
+    parser.add_argument("--khz", type=int, default=1000, help="SWCLK frequency")
+    parser.add_argument("--power", action="store_true", help="Power the target from the Pyrate")
+    parser.add_argument("--halt", action="store_true")
+    parser.add_argument("--read", nargs=2, metavar=("ADDRESS", "LENGTH"), type=lambda x: int(x, 0))
+    parser.add_argument("--output", help="File for --read, hex dump if left out")
+    parser.add_argument("--write", nargs=2, metavar=("ADDRESS", "FILE"))
+    parser.add_argument("--no-verify", action="store_true")
+    parser.add_argument("--reset", action="store_true", help="Reset the core when done")
+    args = parser.parse_args()
+
+    device = args.port or pyrate_host.data_ports()[0]
+    print("Connecting to", device)
+    serial = pyrate_host.connect(device)
+    serial.timeout = 5
+    pyrate_host.enter_bitbang(serial)
+    pyrate_host.enter_mode(serial, 0x07, b"SWD1")
+    swd = SWD(serial)
+    try:
+        if args.power:
+            swd.peripherals(power=True)
+            time.sleep(0.1)
+        swd.set_frequency(args.khz)
+        print(f"DPIDR: 0x{swd.connect():08x}")
+        print(f"CPUID: 0x{swd.read_word(CPUID):08x}")
+        if args.halt:
+            swd.halt()
+            print("Halted")
+        if args.write:
+            address = int(args.write[0], 0)
+            with open(args.write[1], "rb") as f:
+                image = f.read()
+            start = time.monotonic()
+            swd.write_memory(address, image)
+            elapsed = max(time.monotonic() - start, 0.001)
+            print(f"Wrote {len(image)} bytes in {elapsed:.2f} s ({len(image) / elapsed / 1024:.1f} KiB/s)")
+            if not args.no_verify:
+                padded = len(image) + (-len(image) % 4)
+                readback = swd.read_memory(address, padded)[:len(image)]
+                if readback != image:
+                    offset = next(i for i in range(len(image)) if readback[i] != image[i])
+                    raise SWDError(f"Verify failed at 0x{address + offset:08x}")
+                print("Verified")
+        if args.read:
+            address, length = args.read
+            data = swd.read_memory(address, length + (-length % 4))[:length]
+            if args.output:
+                with open(args.output, "wb") as f:
+                    f.write(data)
+            else:
+                for offset in range(0, len(data), 16):
+                    print(f"{address + offset:08x}: {data[offset:offset + 16].hex(' ')}")
+        if args.reset:
+            swd.reset()
+            print("Reset")
+    except SWDError as e:
+        print("Error:", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,219 @@
-import adafruit_board_toolkit.circuitpython_serial
-import serial
+"""Program an STM32 through its UART system bootloader with a Pyrate.
+
+    python uart_stm32bl.py                      # print the chip id
+    python uart_stm32bl.py firmware.bin --go
+    python uart_stm32bl.py --port /dev/ttyACM3 --baud 115200 --boot0-aux firmware.bin
+
+Wire the target's USART1 RX to MOSI and TX to MISO. The target is powered from
+the Pyrate's supply and power cycled to start the bootloader. Tie BOOT0 high
+or pass --boot0-aux to drive it from AUX.
+"""
+
+import argparse
 import struct
 import sys
 import time
-import datetime
 
-if len(sys.argv) == 1:
-    comports = adafruit_board_toolkit.circuitpython_serial.data_comports()
-    if not comports:
-        raise Exception("No CircuitPython boards found")
+import pyrate_host
+
+ACK = 0x79
+NACK = 0x1F
+BLOCK_SIZE = 256
+
+GET = 0x00
+GET_ID = 0x02
+READ_MEMORY = 0x11
+GO = 0x21
+WRITE_MEMORY = 0x31
+ERASE = 0x43
+EXTENDED_ERASE = 0x44
+
+
+class BootloaderError(Exception):
+    pass
+
+
+def _checksum(data):
+    result = 0
+    for b in data:
+        result ^= b
+    return result
+
+
+class Bootloader:
+    """AN3155 bootloader client speaking through the Pyrate's binary UART mode.
+
+    Every phase of a command is sent as pipelined 0x1x bulk writes and the
+    target's reply comes back through RX echo. The bootloader has a single
+    byte receive register, so we still wait for each ACK before the next phase.
+    """
 
-    device = comports[0].device
-else:
-    device = sys.argv[-1]
+    def __init__(self, serial):
+        self.serial = serial
+        self.commands = ()
 
+    def _read(self, length, timeout=1.0):
+        self.serial.timeout = timeout
+        data = self.serial.read(length)
+        if len(data) != length:
+            raise BootloaderError(f"Timed out waiting for {length} bytes, got {data!r}")
+        return data
 
-print("Connecting to", device)
-serial = serial.Serial(device)
+    def _ack(self, what, timeout=1.0):
+        response = self._read(1, timeout)[0]
+        if response == NACK:
+            raise BootloaderError(f"{what} was refused")
+        if response != ACK:
+            raise BootloaderError(f"Unexpected 0x{response:02x} after {what}")
 
-# Enter raw mode
-for i in range(21):
-    serial.write(b"\x00")
+    def _command(self, command):
+        pyrate_host.uart_bulk_write(self.serial, bytes((command, command ^ 0xFF)))
+        self._ack(f"command 0x{command:02x}")
+
+    def _address(self, address):
+        data = struct.pack(">I", address)
+        pyrate_host.uart_bulk_write(self.serial, data + bytes((_checksum(data),)))
+        self._ack(f"address 0x{address:08x}")
+
+    def sync(self):
+        pyrate_host.uart_bulk_write(self.serial, b"\x7f")
+        self._ack("sync")
+        self._command(GET)
+        count = self._read(1)[0] + 1
+        response = self._read(count)
+        self._ack("get")
+        self.version = response[0]
+        self.commands = response[1:]
+
+    def get_id(self):
+        self._command(GET_ID)
+        count = self._read(1)[0] + 1
+        pid = self._read(count)
+        self._ack("get id")
+        return int.from_bytes(pid, "big")
+
+    def erase_all(self):
+        # Mass erase can take tens of seconds on large parts.
+        if EXTENDED_ERASE in self.commands:
+            self._command(EXTENDED_ERASE)
+            pyrate_host.uart_bulk_write(self.serial, b"\xff\xff\x00")
+        else:
+            self._command(ERASE)
+            pyrate_host.uart_bulk_write(self.serial, b"\xff\x00")
+        self._ack("erase", timeout=60.0)
+
+    def write_memory(self, address, data):
+        if len(data) % 4:
+            data = data + b"\xff" * (4 - len(data) % 4)
+        self._command(WRITE_MEMORY)
+        self._address(address)
+        block = bytes((len(data) - 1,)) + data
+        pyrate_host.uart_bulk_write(self.serial, block + bytes((_checksum(block),)))
+        self._ack(f"write at 0x{address:08x}")
+
+    def read_memory(self, address, length):
+        self._command(READ_MEMORY)
+        self._address(address)
+        pyrate_host.uart_bulk_write(self.serial, bytes((length - 1, (length - 1) ^ 0xFF)))
+        self._ack("read length")
+        return self._read(length)
+
+    def go(self, address):
+        self._command(GO)
+        self._address(address)
+
+
+def start_bootloader(serial, baudrate, boot0_aux):
+    pyrate_host.enter_mode(serial, 0x03, b"ART1")
+    # 8E1, which is what the bootloader expects.
+    serial.write(b"\x94")
+    assert serial.read(1) == b"\x01"
+    # The bootloader autobauds on the first 0x7F and can't change rate after
+    # that, so pick the fast rate before syncing.
+    actual = pyrate_host.uart_set_baudrate(serial, baudrate)
+    if actual is None:
+        print(f"Pyrate can't do {baudrate} baud, falling back to 9600")
+        serial.write(b"\x64")
+        assert serial.read(1) == b"\x01"
+        actual = 9600
+
+    # Power cycle the target, optionally holding BOOT0 high on AUX.
+    aux = 0x02 if boot0_aux else 0x00
+    serial.write(bytes((0x40 | aux,)))
+    assert serial.read(1) == b"\x01"
+    time.sleep(0.1)
+    serial.write(bytes((0x48 | aux,)))
+    assert serial.read(1) == b"\x01"
     time.sleep(0.1)
-    if serial.in_waiting >= 5:
-        response = serial.read(5)
-        assert response == b"BBIO1"
-        serial.reset_input_buffer()
-        break
 
-# Switch to UART mode
-serial.write(b"\x03")
-response = serial.read(4)
-assert b"ART1" == response
+    # Enable RX echo so the target's replies come back to us.
+    serial.write(b"\x02")
+    assert serial.read(1) == b"\x01"
+    return actual
+
 
-# Setup 8E1 mode and set speed to 9600
-serial.write(b"\x94")
-assert serial.read(1) == b"\x01"
+def program(bootloader, image, address, verify=True):
+    start = time.monotonic()
+    for offset in range(0, len(image), BLOCK_SIZE):
+        bootloader.write_memory(address + offset, image[offset:offset + BLOCK_SIZE])
+        print(f"\rWrote {min(offset + BLOCK_SIZE, len(image))}/{len(image)}", end="")
+    elapsed = max(time.monotonic() - start, 0.001)
+    print(f"\rWrote {len(image)} bytes in {elapsed:.1f} s ({len(image) / elapsed / 1024:.1f} KiB/s)")
 
-serial.write(b"\x64")
-assert serial.read(1) == b"\x01"
+    if not verify:
+        return
+    start = time.monotonic()
+    for offset in range(0, len(image), BLOCK_SIZE):
+        expected = image[offset:offset + BLOCK_SIZE]
+        actual = bootloader.read_memory(address + offset, len(expected))
+        if actual != expected:
+            for i, (a, b) in enumerate(zip(actual, expected)):
+                if a != b:
+                    raise BootloaderError(f"Verify failed at 0x{address + offset + i:08x}: read 0x{a:02x}, expected 0x{b:02x}")
+        print(f"\rVerified {offset + len(expected)}/{len(image)}", end="")
+    print(f"\rVerified {len(image)} bytes in {time.monotonic() - start:.1f} s")
 
-# Toggle power to the device
-serial.write(b"\x40")
-assert serial.read(1) == b"\x01"
 
-serial.write(b"\x48")
-assert serial.read(1) == b"\x01"
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", nargs="?", help="Raw binary to write")
+    parser.add_argument("--port", help="Pyrate data port, defaults to the first one found")
+    parser.add_argument("--address", type=lambda x: int(x, 0), default=0x08000000)
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--boot0-aux", action="store_true", help="Hold BOOT0 high from AUX while powering up")
+    parser.add_argument("--no-erase", action="store_true")
+    parser.add_argument("--no-verify", action="store_true")
+    parser.add_argument("--go", action="store_true", help="Start the image once written")
+    args = parser.parse_args()
 
-time.sleep(0.1)
+    device = args.port or pyrate_host.data_ports()[0]
+    print("Connecting to", device)
+    serial = pyrate_host.connect(device)
+    pyrate_host.enter_bitbang(serial)
+    baudrate = start_bootloader(serial, args.baud, args.boot0_aux)
 
-# Enable RX echo
-serial.write(b"\x02")
-assert serial.read(1) == b"\x01"
+    bootloader = Bootloader(serial)
+    bootloader.sync()
+    print(f"Bootloader v{bootloader.version >> 4}.{bootloader.version & 0xf} at {baudrate} baud")
+    print("Chip id:", hex(bootloader.get_id()))
+    if not args.image:
+        return
 
-# Send the init code to the bootloader
-serial.write(b"\x10\x7f")
-assert serial.read(2) == b"\x01\x79"
+    with open(args.image, "rb") as f:
+        image = f.read()
+    try:
+        if not args.no_erase:
+            print("Erasing")
+            bootloader.erase_all()
+        program(bootloader, image, args.address, verify=not args.no_verify)
+        if args.go:
+            bootloader.go(args.address)
+            print(f"Started at 0x{args.address:08x}")
+    except BootloaderError as e:
+        print()
+        print("Error:", e)
+        sys.exit(1)
 
-# Read the chip id
-serial.write(b"\x11\x02\xfd")
-assert serial.read(2) == b"\x01\x01"
 
-pid = serial.read(5)[2:4]
-pid = struct.unpack(">H", pid)[0]
-print("Chip id:", hex(pid))
+if __name__ == "__main__":
+    main()